@@ -0,0 +1,240 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from modules import figures
+from modules.holdings import HoldingsStore
+from modules.panel_store import PanelStore
+from modules.portfolio_risk import PortfolioRisk, RiskModel, with_risk_share
+from modules.range_index import RangeIndex
+from modules.screen import METRICS, screen_frame, screen_png
+from modules.screen_expr import compile_filter
+
+from .synthetic import NAN_DENSITY, SIZES, parse_size, synthetic_compact
+
+# Server-side latency benchmarks on synthetic panels, no browser involved.
+# Each case calls the same module-level function as the reactive calc or
+# render it is named after (modules/screen.py, HoldingsStore, the portfolio
+# risk model, figures), with result and figure caches bypassed, on inputs drawn from a
+# seeded generator (random windows, metrics, holdings). Per case the suite
+# records latency percentiles over the timed runs and the peak traced
+# allocation of one extra run, writes everything as JSON, and compares it with
+# a stored baseline, failing when a case got slower or bigger than allowed.
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+SCREEN_METRICS = tuple(METRICS)
+PLOT_SIZE = (1000, 400)
+PERCENTILES = (50, 90, 99)
+
+
+class Context:
+    def __init__(self, panel, seed):
+        start = time.perf_counter()
+        self.index = RangeIndex(panel, panel.stock_cols)
+        self.build_seconds = time.perf_counter() - start
+        self.store = PanelStore(self.index)
+        self.holdings = HoldingsStore(self.index.stock_ids)
+        # Shared by every session for a data version in the app
+        self.risk_model = RiskModel(self.index)
+        self.rng = np.random.default_rng(seed)
+        self.load_book(min(20, len(self.index.stock_ids)))
+
+    def window(self):
+        times = self.index.times
+        a, b = np.sort(self.rng.integers(0, len(times), 2))
+        return int(times[a]), int(times[b])
+
+    def load_book(self, n_holdings):
+        stocks = self.rng.choice(self.index.stock_ids, n_holdings, replace=False)
+        book = pd.DataFrame({
+            'stock_id': stocks,
+            'volume': self.rng.integers(1, 1000, n_holdings).astype(float),
+            'price': self.rng.uniform(5, 500, n_holdings),
+        })
+        self.holdings.load(book, replace=True)
+
+
+# Cases: name -> function(ctx) running one request's worth of work
+def _filtered_data(ctx, screen=None):
+    start_time, end_time = ctx.window()
+    metric = SCREEN_METRICS[ctx.rng.integers(len(SCREEN_METRICS))]
+    top_n = int(ctx.rng.integers(1, 51))
+    return screen_frame(ctx.index, metric, start_time, end_time, top_n, screen=screen)
+
+
+def case_filtered_data(ctx):
+    return _filtered_data(ctx)
+
+
+def case_filtered_data_expr(ctx):
+    return _filtered_data(ctx, compile_filter('mean_rv > 0.0025 and max_rv < 0.05'))
+
+
+def case_df_portfolio(ctx):
+    return ctx.holdings.to_frame()
+
+
+def case_pt_table(ctx):
+    return with_risk_share(ctx.holdings.to_frame(), PortfolioRisk(ctx.risk_model).sync(ctx.holdings))
+
+
+def case_holdings_upload(ctx):
+    ctx.load_book(min(500, len(ctx.index.stock_ids)))
+    return ctx.holdings.to_frame()
+
+
+def case_pt_ts_plot(ctx):
+    stock = ctx.rng.choice(ctx.index.stock_ids)
+    times, rv = ctx.store.series(stock)
+    return figures.ts_png(times, rv, stock, *PLOT_SIZE)
+
+
+def case_scr_plot(ctx):
+    return screen_png(_filtered_data(ctx), *PLOT_SIZE)
+
+
+CASES = {
+    'filtered_data': case_filtered_data,
+    'filtered_data_expr': case_filtered_data_expr,
+    'df_portfolio': case_df_portfolio,
+    'pt_table': case_pt_table,
+    'holdings_upload': case_holdings_upload,
+    'pt_ts_plot': case_pt_ts_plot,
+    'scr_plot': case_scr_plot,
+}
+
+
+def time_case(ctx, case, repeat, seed=0, warmup=1):
+    # Every case sees the same input sequence on every run of the suite
+    ctx.rng = np.random.default_rng([seed, 2])
+    for _ in range(warmup):
+        case(ctx)
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        case(ctx)
+        samples.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        case(ctx)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    samples = np.array(samples) * 1e3
+    result = {f'p{q}_ms': float(np.percentile(samples, q)) for q in PERCENTILES}
+    result.update({
+        'mean_ms': float(samples.mean()),
+        'max_ms': float(samples.max()),
+        'runs': repeat,
+        'peak_mib': peak / 2**20,
+    })
+    return result
+
+
+def run_suite(sizes, cases=None, repeat=20, nan_density=NAN_DENSITY, seed=0, log=None):
+    """{'meta': ..., 'results': {size: {'panel': ..., 'cases': {case: stats}}}}."""
+    results = {}
+    for size in sizes:
+        n_stocks, n_times = parse_size(size)
+        panel = synthetic_compact(n_stocks, n_times, nan_density, seed)
+        ctx = Context(panel, seed)
+        del panel
+        entry = {
+            'panel': {
+                'stocks': n_stocks, 'time_ids': n_times, 'nan_density': nan_density,
+                'index_build_s': ctx.build_seconds,
+                'panel_mib': ctx.index.panel.nbytes / 2**20,
+                'index_mib': ctx.index.nbytes / 2**20,
+            },
+            'cases': {},
+        }
+        for name in cases or CASES:
+            entry['cases'][name] = time_case(ctx, CASES[name], repeat, seed)
+            if log:
+                stats = entry['cases'][name]
+                log(f"{size:>10} {name:<20} p50 {stats['p50_ms']:9.2f} ms  p99 {stats['p99_ms']:9.2f} ms"
+                    f"  peak {stats['peak_mib']:8.1f} MiB")
+        results[size] = entry
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+            'seed': seed,
+            'max_rss_mib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10,
+        },
+        'results': results,
+    }
+
+
+def regressions(report, baseline, tolerance=0.25, min_ms=1.0):
+    """Descriptions of cases whose p50 latency or peak memory exceeds the
+    baseline's by more than `tolerance` (relative). Values under min_ms (or
+    1 MiB) in both runs are too noisy to judge and are skipped."""
+    found = []
+    for size, entry in report['results'].items():
+        base_cases = baseline.get('results', {}).get(size, {}).get('cases', {})
+        for name, stats in entry['cases'].items():
+            base = base_cases.get(name)
+            if base is None:
+                continue
+            for key, floor in (('p50_ms', min_ms), ('peak_mib', 1.0)):
+                limit = base[key] * (1 + tolerance)
+                if stats[key] > limit and max(stats[key], base[key]) >= floor:
+                    found.append(f"{size}/{name}: {key} {stats[key]:.2f} > {limit:.2f} (baseline {base[key]:.2f})")
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.suite',
+        description='Benchmark the server-side computations on synthetic panels.',
+    )
+    parser.add_argument('--size', action='append',
+                        help=f"{', '.join(SIZES)} or STOCKSxTIMES, repeatable (default: current)")
+    parser.add_argument('--case', action='append', choices=list(CASES), help='repeatable (default: all)')
+    parser.add_argument('--repeat', type=int, default=20, help='timed runs per case (default: %(default)s)')
+    parser.add_argument('--nan-density', type=float, default=NAN_DENSITY)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the JSON report here')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='baseline JSON (default: %(default)s)')
+    parser.add_argument('--save-baseline', action='store_true', help='store this run as the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed relative slowdown or memory growth (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    report = run_suite(
+        args.size or ['current'], args.case, args.repeat, args.nan_density, args.seed,
+        log=lambda line: print(line, file=sys.stderr),
+    )
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as fh:
+            fh.write(text)
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as fh:
+            fh.write(text)
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f'no baseline at {args.baseline}, skipping the regression check', file=sys.stderr)
+        return 0
+    with open(args.baseline) as fh:
+        found = regressions(report, json.load(fh), args.tolerance)
+    for line in found:
+        print(f'REGRESSION {line}', file=sys.stderr)
+    return 1 if found else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,105 @@
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from modules.panel import PANEL_DTYPE, Panel
+
+# Seeded synthetic realized volatility panels in the layout of data/vol_df.csv
+# (time_id plus one column per stock). Log RV follows a per-stock AR(1) around
+# a stock-specific level, driven by a shared market factor and idiosyncratic
+# noise, so series cluster and co-move like the real data; a share of cells is
+# blanked out as missing. Rows are generated in blocks, so the temporaries
+# stay small however many time_ids are requested.
+# The panel and its RangeIndex take about 27 bytes per cell and building the
+# index peaks at about 1.7 times that: 'large' is about 2 GiB of index and
+# 3.5 GiB peak, the most a typical CI runner holds. 'production' is the
+# 10k stocks x 100k time_ids the app is sized for, about 27 GiB of index and
+# 45 GiB peak, so it only runs on a large machine.
+SIZES = {
+    'current': (112, 3830),
+    'medium': (1000, 20000),
+    'large': (2000, 40000),
+    'production': (10000, 100000),
+}
+NAN_DENSITY = 0.02
+PERSISTENCE = 0.95
+MARKET_LOADING = 0.5
+BLOCK_ROWS = 4096
+
+
+def parse_size(text):
+    """(n_stocks, n_times) from a preset name or 'STOCKSxTIMES'."""
+    if text in SIZES:
+        return SIZES[text]
+    try:
+        n_stocks, n_times = (int(part) for part in text.lower().split('x'))
+    except ValueError:
+        raise ValueError(f"Unknown size {text!r}: use {', '.join(SIZES)} or STOCKSxTIMES") from None
+    return n_stocks, n_times
+
+
+def synthetic_values(n_stocks, n_times, nan_density=NAN_DENSITY, seed=0, dtype=np.float64):
+    """(n_times, n_stocks) array of synthetic RV with NaN for missing cells."""
+    rng = np.random.default_rng(seed)
+    level = np.log(0.003) + 0.35 * rng.standard_normal(n_stocks)
+    vol_of_vol = 0.15 + 0.1 * rng.random(n_stocks)
+    values = np.empty((n_times, n_stocks), dtype=dtype)
+    state = np.zeros(n_stocks)
+    for start in range(0, n_times, BLOCK_ROWS):
+        rows = min(BLOCK_ROWS, n_times - start)
+        market = rng.standard_normal(rows)
+        noise = rng.standard_normal((rows, n_stocks))
+        shocks = vol_of_vol * (MARKET_LOADING * market[:, None] + np.sqrt(1 - MARKET_LOADING ** 2) * noise)
+        block = np.empty((rows, n_stocks))
+        for t in range(rows):
+            state = PERSISTENCE * state + shocks[t]
+            block[t] = state
+        block = np.exp(level + block)
+        block[rng.random((rows, n_stocks)) < nan_density] = np.nan
+        values[start:start + rows] = block
+    return values
+
+
+def synthetic_times(n_times, seed=0):
+    """Sorted, gapped int32 time_ids like the real panel's."""
+    rng = np.random.default_rng([seed, 1])
+    return np.cumsum(rng.integers(1, 4, n_times)).astype(np.int32) + 4
+
+
+def synthetic_panel(n_stocks, n_times, nan_density=NAN_DENSITY, seed=0):
+    """Wide DataFrame: time_id then stock columns '0', '1', ... (as strings)."""
+    values = synthetic_values(n_stocks, n_times, nan_density, seed)
+    df = pd.DataFrame(values, columns=[str(s) for s in range(n_stocks)], copy=False)
+    df.insert(0, 'time_id', synthetic_times(n_times, seed))
+    return df
+
+
+def synthetic_compact(n_stocks, n_times, nan_density=NAN_DENSITY, seed=0):
+    """The same panel as a Panel, generated straight into the storage dtype."""
+    values = synthetic_values(n_stocks, n_times, nan_density, seed, dtype=PANEL_DTYPE)
+    return Panel(synthetic_times(n_times, seed), values, np.arange(n_stocks))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.synthetic',
+        description='Write a seeded synthetic volatility panel CSV.',
+    )
+    parser.add_argument('size', help=f"{', '.join(SIZES)} or STOCKSxTIMES")
+    parser.add_argument('--nan-density', type=float, default=NAN_DENSITY,
+                        help='share of missing cells (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the CSV here instead of stdout')
+    args = parser.parse_args(argv)
+
+    n_stocks, n_times = parse_size(args.size)
+    synthetic_panel(n_stocks, n_times, args.nan_density, args.seed).to_csv(
+        args.output or sys.stdout, index=False
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
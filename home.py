@@ -2,8 +2,12 @@ import os
 from shiny import App, ui, render, reactive
 from shinyswatch import theme
 from faicons import icon_svg
-from modules.screener import ui_screener, server_screener
-from modules.portfolio_tracker import ui_portfolio_tracker, server_portfolio_tracker
+from modules.instrumentation import instrument, mount
+from modules.startup import loading_page, mount_ready, startup, warm_up
+
+# The panel modules (pandas, matplotlib, the data itself) load in a background
+# warm-up; until it is done pages get a loading state (see modules/startup.py)
+startup.start(warm_up)
 
 
 css = """
@@ -360,168 +364,202 @@ css = """
   border-radius: 12px;
   padding: 1rem;
 }
+
+.stat-grid {
+  display: grid;
+  grid-template-columns: repeat(auto-fit, minmax(180px, 1fr));
+  gap: 1rem;
+  width: 100%;
+}
+
+.stat-tile {
+  background: #f3e5f5;
+  border-radius: 12px;
+  padding: 1rem;
+  text-align: center;
+}
+
+.stat-label {
+  color: #6a1b9a;
+  font-size: 0.9rem;
+  font-weight: 600;
+}
+
+.stat-value {
+  font-size: 1.5rem;
+  font-weight: 800;
+}
 """
 
-app_ui = ui.TagList(
-    ui.tags.head(
-        ui.tags.style(css)
-    ),
+def full_ui():
+    from modules.client_plots import head_deps
+    from modules.portfolio_tracker import ui_portfolio_tracker
+    from modules.screener import ui_screener
+    from modules.stock_analysis import ui_stock_analysis
+    from modules.stock_comparison import ui_stock_comparison
+
+    return ui.TagList(
+        ui.tags.head(
+            ui.tags.style(css),
+            *head_deps()
+        ),
 
-    ui.page_navbar(
-        ui.nav_spacer(),
+        ui.page_navbar(
+            ui.nav_spacer(),
 
-        ui.nav_panel(
-            "Home",
-            ui.tags.div(
+            ui.nav_panel(
+                "Home",
                 ui.tags.div(
-                    ui.h1("Welcome to Volatility Explorer", class_="display-4"),
-                    ui.p(
-                        "Your comprehensive platform for market risk analysis and portfolio optimization. "
-                        "Powered by real-time data and advanced analytics.",
-                        class_="lead"
+                    ui.tags.div(
+                        ui.h1("Welcome to Volatility Explorer", class_="display-4"),
+                        ui.p(
+                            "Your comprehensive platform for market risk analysis and portfolio optimization. "
+                            "Powered by real-time data and advanced analytics.",
+                            class_="lead"
+                        ),
+                        class_="welcome-section"
                     ),
-                    class_="welcome-section"
-                ),
                 
-                ui.tags.div(
-                    ui.h2("Key Features", class_="text-center mb-4"),
-                    ui.tags.ul(
-                        ui.tags.li(
-                            ui.tags.div(
+                    ui.tags.div(
+                        ui.h2("Key Features", class_="text-center mb-4"),
+                        ui.tags.ul(
+                            ui.tags.li(
                                 ui.tags.div(
-                                    ui.tags.strong("Volatility Screener", style="color:#ff6d00;"),
-                                    ui.tags.p("Filter and rank stocks by volatility metrics with customizable parameters."),
+                                    ui.tags.div(
+                                        ui.tags.strong("Volatility Screener", style="color:#ff6d00;"),
+                                        ui.tags.p("Filter and rank stocks by volatility metrics with customizable parameters."),
+                                    ),
+                                    class_="feature-card"
                                 ),
                                 class_="feature-card"
                             ),
-                            class_="feature-card"
-                        ),
-                        ui.tags.li(
-                            ui.tags.div(
+                            ui.tags.li(
                                 ui.tags.div(
-                                    ui.tags.strong("Individual Stock Analysis", style="color:#ff6d00;"),
-                                    ui.tags.p("Deep dive into single ticker analysis with comprehensive volatility metrics and charts."),
+                                    ui.tags.div(
+                                        ui.tags.strong("Individual Stock Analysis", style="color:#ff6d00;"),
+                                        ui.tags.p("Deep dive into single ticker analysis with comprehensive volatility metrics and charts."),
+                                    ),
+                                    class_="feature-card"
                                 ),
                                 class_="feature-card"
                             ),
-                            class_="feature-card"
-                        ),
-                        ui.tags.li(
-                            ui.tags.div(
+                            ui.tags.li(
                                 ui.tags.div(
-                                    ui.tags.strong("Stock Comparison", style="color:#ff6d00;"),
-                                    ui.tags.p("Compare multiple equities side-by-side with advanced benchmarking tools."),
+                                    ui.tags.div(
+                                        ui.tags.strong("Stock Comparison", style="color:#ff6d00;"),
+                                        ui.tags.p("Compare multiple equities side-by-side with advanced benchmarking tools."),
+                                    ),
+                                    class_="feature-card"
                                 ),
                                 class_="feature-card"
                             ),
-                            class_="feature-card"
-                        ),
-                        ui.tags.li(
-                            ui.tags.div(
+                            ui.tags.li(
                                 ui.tags.div(
-                                    ui.tags.strong("Portfolio Tracker", style="color:#ff6d00;"),
-                                    ui.tags.p("Monitor and optimize your portfolio's risk profile in real-time."),
+                                    ui.tags.div(
+                                        ui.tags.strong("Portfolio Tracker", style="color:#ff6d00;"),
+                                        ui.tags.p("Monitor and optimize your portfolio's risk profile in real-time."),
+                                    ),
+                                    class_="feature-card"
                                 ),
                                 class_="feature-card"
                             ),
-                            class_="feature-card"
+                            class_="feature-list"
                         ),
-                        class_="feature-list"
                     ),
-                ),
 
-                ui.tags.div(
-                    ui.input_action_button(
-                        "go_screener", 
-                        ui.tags.span(icon_svg("magnifying-glass"), " Volatility Screener"), 
-                        class_="btn-cta"
-                    ),
-                    ui.input_action_button(
-                        "go_individual", 
-                        ui.tags.span(icon_svg("chart-line"), " Stock Analysis"), 
-                        class_="btn-cta"
-                    ),
-                    ui.input_action_button(
-                        "go_compare", 
-                        ui.tags.span(icon_svg("scale-balanced"), " Compare Stocks"), 
-                        class_="btn-cta"
-                    ),
-                    ui.input_action_button(
-                        "go_portfolio", 
-                        ui.tags.span(icon_svg("wallet"), " Portfolio Tracker"), 
-                        class_="btn-cta"
+                    ui.tags.div(
+                        ui.input_action_button(
+                            "go_screener", 
+                            ui.tags.span(icon_svg("magnifying-glass"), " Volatility Screener"), 
+                            class_="btn-cta"
+                        ),
+                        ui.input_action_button(
+                            "go_individual", 
+                            ui.tags.span(icon_svg("chart-line"), " Stock Analysis"), 
+                            class_="btn-cta"
+                        ),
+                        ui.input_action_button(
+                            "go_compare", 
+                            ui.tags.span(icon_svg("scale-balanced"), " Compare Stocks"), 
+                            class_="btn-cta"
+                        ),
+                        ui.input_action_button(
+                            "go_portfolio", 
+                            ui.tags.span(icon_svg("wallet"), " Portfolio Tracker"), 
+                            class_="btn-cta"
+                        ),
+                        class_="action-buttons"
                     ),
-                    class_="action-buttons"
+                    class_="main-content"
                 ),
-                class_="main-content"
+                icon=icon_svg("house-chimney"),
             ),
-            icon=icon_svg("house-chimney"),
-        ),
 
-        ui_screener(),
+            ui_screener(),
 
 
-        ui.nav_panel(
-            "Individual Stock Analysis",
-            ui.tags.div(
-                ui.h2("Individual Stock Analysis"),
-                ui.p("Detailed analysis of individual stock volatility."),
-                class_="main-content"
-            ),
-            icon=icon_svg("chart-line"),
-            value="individual",
-        ),
+            ui_stock_analysis(),
 
-        ui.nav_panel(
-            "Stock Comparison",
-            ui.tags.div(
-                ui.h2("Stock Comparison"),
-                ui.p("Compare volatility metrics across multiple stocks."),
-                class_="main-content"
-            ),
-            icon=icon_svg("scale-balanced"),
-            value="compare",
-        ),
+            ui_stock_comparison(),
 
-        ui_portfolio_tracker(),
+            ui_portfolio_tracker(),
         
-        title=ui.tags.a(
-            ui.tags.img(
-                src="https://cdn.jsdelivr.net/npm/bootstrap-icons@1.10.5/icons/graph-up.svg",
-                height="30px",
-                style="margin-right:8px;"
+            title=ui.tags.a(
+                ui.tags.img(
+                    src="https://cdn.jsdelivr.net/npm/bootstrap-icons@1.10.5/icons/graph-up.svg",
+                    height="30px",
+                    style="margin-right:8px;"
+                ),
+                "Volatility Explorer",
+                style="display:flex;align-items:center;color:white;text-decoration:none;"
             ),
-            "Volatility Explorer",
-            style="display:flex;align-items:center;color:white;text-decoration:none;"
-        ),
-        theme=theme.cosmo,
-        id="main_nav",
+            theme=theme.cosmo,
+            id="main_nav",
+        )
     )
-)
 
-def server(input, output, session):
-    @reactive.Effect
-    @reactive.event(input.go_screener)
-    def _():
-        ui.update_navs("main_nav", selected="screener")
 
-    @reactive.Effect
-    @reactive.event(input.go_individual)
-    def _():
-        ui.update_navs("main_nav", selected="individual")
+def app_ui(request):
+    # Built per request, so sliders and choices reflect the live panel
+    if not startup.ready():
+        return loading_page(ui.tags.style(css))
+    return full_ui()
 
-    @reactive.Effect
-    @reactive.event(input.go_compare)
-    def _():
-        ui.update_navs("main_nav", selected="compare")
 
-    @reactive.Effect
-    @reactive.event(input.go_portfolio)
-    def _():
-        ui.update_navs("main_nav", selected="portfolio")
-
-    server_screener(input, output, session)
-    server_portfolio_tracker(input, output, session)
+def server(input, output, session):
+    if not startup.ready():
+        # A loading page; it reloads itself once the app is warm
+        return
+    from modules.portfolio_tracker import server_portfolio_tracker
+    from modules.screener import server_screener
+    from modules.stock_analysis import server_stock_analysis
+    from modules.stock_comparison import server_stock_comparison
+
+    with instrument(session):
+        @reactive.Effect
+        @reactive.event(input.go_screener)
+        def _go_screener():
+            ui.update_navs("main_nav", selected="screener")
+
+        @reactive.Effect
+        @reactive.event(input.go_individual)
+        def _go_individual():
+            ui.update_navs("main_nav", selected="individual")
+
+        @reactive.Effect
+        @reactive.event(input.go_compare)
+        def _go_compare():
+            ui.update_navs("main_nav", selected="compare")
+
+        @reactive.Effect
+        @reactive.event(input.go_portfolio)
+        def _go_portfolio():
+            ui.update_navs("main_nav", selected="portfolio")
+
+        server_screener(input, output, session)
+        server_stock_analysis(input, output, session)
+        server_stock_comparison(input, output, session)
+        server_portfolio_tracker(input, output, session)
 
 here = os.path.dirname(__file__)
 www_path = os.path.join(here, "www")
@@ -530,6 +568,9 @@ app = App(
         server, 
         static_assets=www_path
     )
+# /ready for load balancers, /metrics when VX_METRICS is set
+mount_ready(app)
+mount(app)
 
 if __name__ == "__main__":
     app.run()
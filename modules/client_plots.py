@@ -0,0 +1,186 @@
+import base64
+import os
+
+import numpy as np
+from shiny import ui
+
+from .downsample import downsample
+
+# Client-side chart backend.
+# With VX_PLOT_BACKEND=plotly the plots are drawn by plotly.js in the browser:
+# the server only sends compact base64 typed arrays through a custom message
+# and www/plotly_bridge.js updates the existing chart in place, so zoom and
+# pan never reach the server. The default 'matplotlib' backend renders PNGs.
+# plotly.js is served from www/ (the copy bundled with the plotly package in
+# requirements.txt), so the app works without access to a CDN.
+PLOT_BACKEND = os.environ.get('VX_PLOT_BACKEND', 'matplotlib')
+PLOTLY_JS = 'plotly.min.js'
+# Time series are reduced to what a chart this many pixels wide can show
+# before they are sent; the browser's chart width is not known server side
+CLIENT_WIDTH_PX = int(os.environ.get('VX_CLIENT_PLOT_PX', '1600'))
+MESSAGE_TYPE = 'vx-plot'
+LINE_COLOR = '#1f77b4'
+FILL_COLOR = 'rgba(31,119,180,0.3)'
+
+
+def use_plotly():
+    return PLOT_BACKEND == 'plotly'
+
+
+def head_deps():
+    """Scripts for the page <head>; nothing for the matplotlib backend."""
+    if not use_plotly():
+        return []
+    return [ui.tags.script(src=PLOTLY_JS), ui.tags.script(src='plotly_bridge.js')]
+
+
+def plot_output(output_id, height='400px'):
+    """Container div the bridge script draws the chart for output_id into."""
+    return ui.tags.div(id=output_id, class_='vx-plotly', style=f'width:100%;height:{height};')
+
+
+def typed_array(values, dtype):
+    """plotly.js typed-array spec: base64 of the raw little-endian buffer."""
+    arr = np.ascontiguousarray(values, dtype='<' + dtype)
+    return {'dtype': dtype, 'bdata': base64.b64encode(arr.tobytes()).decode('ascii')}
+
+
+def line_arrays(time_ids, values):
+    """Downsampled (x, y) typed arrays for one time series trace."""
+    x, y = downsample(time_ids, values, CLIENT_WIDTH_PX)
+    return typed_array(x, 'i4'), typed_array(y, 'f4')
+
+
+def _layout(title, xaxis_title, yaxis_title, revision, **extra):
+    layout = {
+        'title': {'text': f'<b>{title}</b>', 'font': {'size': 14}},
+        'xaxis': {'title': {'text': xaxis_title}, 'showline': False},
+        'yaxis': {'title': {'text': yaxis_title}, 'gridcolor': '#e5e5e5', 'griddash': 'dash'},
+        'margin': {'l': 60, 'r': 20, 't': 50, 'b': 50},
+        'plot_bgcolor': 'white',
+        'paper_bgcolor': 'rgba(0,0,0,0)',
+        # Keeps the user's zoom while the same subject is updated
+        'uirevision': str(revision),
+    }
+    layout.update(extra)
+    return layout
+
+
+def ts_message(output_id, time_ids, rv, stock):
+    x, y = line_arrays(time_ids, rv)
+    trace = {
+        'type': 'scattergl',
+        'mode': 'lines',
+        'x': x,
+        'y': y,
+        'line': {'color': LINE_COLOR, 'width': 2},
+        'fill': 'tozeroy',
+        'fillcolor': FILL_COLOR,
+        'name': f'Stock {stock}',
+    }
+    layout = _layout(f'Stock {stock} Volatility Over Time', 'Time ID', 'Realized Volatility', stock)
+    return {'id': output_id, 'traces': [trace], 'layout': layout}
+
+
+def top_n_message(output_id, stock_ids, scores, label, revision):
+    trace = {
+        'type': 'scatter',
+        'mode': 'lines',
+        'x': [str(s) for s in stock_ids],
+        'y': typed_array(scores, 'f8'),
+        'line': {'color': LINE_COLOR, 'width': 2},
+        'fill': 'tozeroy',
+        'fillcolor': FILL_COLOR,
+    }
+    layout = _layout(f'Top N Stocks by {label}', 'Stock ID', label, revision,
+                     xaxis={'title': {'text': 'Stock ID'}, 'type': 'category', 'tickangle': -45})
+    return {'id': output_id, 'traces': [trace], 'layout': layout}
+
+
+def pie_message(output_id, stock_ids, values):
+    if len(values) == 0:
+        return {
+            'id': output_id, 'traces': [],
+            'layout': {'annotations': [{'text': 'No holdings', 'showarrow': False}],
+                       'xaxis': {'visible': False}, 'yaxis': {'visible': False}},
+        }
+    trace = {
+        'type': 'pie',
+        'labels': [str(s) for s in stock_ids],
+        'values': typed_array(values, 'f8'),
+        'textinfo': 'label+percent',
+        'sort': False,
+        'direction': 'clockwise',
+        'rotation': 90,
+    }
+    return {'id': output_id, 'traces': [trace],
+            'layout': {'title': {'text': 'Value Proportion'}, 'margin': {'t': 50, 'b': 20}}}
+
+
+def analysis_message(output_id, time_ids, series, acf, stock):
+    colors = [(LINE_COLOR, 1, 0.35), ('#ff6d00', 2, 1.0), ('#8E24AA', 2, 1.0)]
+    traces = []
+    for (label, y), (color, width, opacity) in zip(series.items(), colors):
+        x, y = line_arrays(time_ids, y)
+        traces.append({'type': 'scattergl', 'mode': 'lines', 'x': x, 'y': y, 'name': label,
+                       'line': {'color': color, 'width': width}, 'opacity': opacity})
+    traces.append({'type': 'bar', 'x': typed_array(np.arange(1, len(acf)), 'i4'),
+                   'y': typed_array(acf[1:], 'f8'), 'marker': {'color': LINE_COLOR},
+                   'xaxis': 'x2', 'yaxis': 'y2', 'name': 'Autocorrelation', 'showlegend': False})
+    layout = _layout(f'Stock {stock} Volatility Profile', 'Time ID', 'Realized Volatility', stock,
+                     yaxis={'title': {'text': 'Realized Volatility'}, 'domain': [0.38, 1],
+                            'gridcolor': '#e5e5e5', 'griddash': 'dash'},
+                     xaxis2={'title': {'text': 'Lag (time_ids)'}, 'anchor': 'y2'},
+                     yaxis2={'title': {'text': 'Autocorrelation'}, 'domain': [0, 0.24]},
+                     legend={'orientation': 'h', 'y': 1.08})
+    return {'id': output_id, 'traces': traces, 'layout': layout}
+
+
+def corr_message(output_id, corr, labels, revision):
+    labels = [str(s) for s in labels]
+    trace = {
+        'type': 'heatmap',
+        'z': np.where(np.isnan(corr), None, np.round(corr, 4)).tolist(),
+        'x': labels,
+        'y': labels,
+        'zmin': -1,
+        'zmax': 1,
+        'colorscale': 'RdBu',
+        'reversescale': True,
+    }
+    layout = _layout('RV Correlation', '', '', revision,
+                     xaxis={'type': 'category'}, yaxis={'type': 'category', 'autorange': 'reversed'})
+    return {'id': output_id, 'traces': [trace], 'layout': layout}
+
+
+def overlay_message(output_id, time_ids, series, revision):
+    traces = []
+    for stock, y in series.items():
+        x, y = line_arrays(time_ids, y)
+        traces.append({'type': 'scattergl', 'mode': 'lines', 'x': x, 'y': y,
+                       'name': f'Stock {stock}', 'line': {'width': 1.2}})
+    layout = _layout('Realized Volatility Comparison', 'Time ID', 'Realized Volatility', revision)
+    return {'id': output_id, 'traces': traces, 'layout': layout}
+
+
+def fan_message(output_id, bands, percentiles):
+    steps = typed_array(np.arange(1, bands.shape[1] + 1), 'i4')
+    n = len(percentiles)
+    traces = []
+    for i in range(n // 2):
+        # Lower edge first, then the upper edge filled back down to it
+        traces.append({'type': 'scatter', 'mode': 'lines', 'x': steps, 'y': typed_array(bands[i], 'f8'),
+                       'line': {'width': 0}, 'showlegend': False, 'hoverinfo': 'skip'})
+        traces.append({'type': 'scatter', 'mode': 'lines', 'x': steps, 'y': typed_array(bands[n - 1 - i], 'f8'),
+                       'line': {'width': 0}, 'fill': 'tonexty',
+                       'fillcolor': f'rgba(142,36,170,{0.15 + 0.2 * i / max(n // 2 - 1, 1):.2f})',
+                       'name': f'{percentiles[i]}-{percentiles[n - 1 - i]}th pct'})
+    if n % 2:
+        traces.append({'type': 'scatter', 'mode': 'lines', 'x': steps, 'y': typed_array(bands[n // 2], 'f8'),
+                       'line': {'color': '#4a148c', 'width': 2}, 'name': 'Median'})
+    layout = _layout('Stressed Portfolio Volatility', 'Time IDs Ahead', 'Average Portfolio RV', 'stress')
+    return {'id': output_id, 'traces': traces, 'layout': layout}
+
+
+async def send(session, message):
+    await session.send_custom_message(MESSAGE_TYPE, message)
@@ -0,0 +1,116 @@
+import warnings
+
+import numpy as np
+
+# Rows per block of the blocked computation
+CORR_BLOCK_ROWS = 4096
+
+
+# Pairwise-complete correlation of RV between stocks. For each pair only the
+# rows where both stocks have data count, so four (k x k) sums are needed:
+# joint counts n, S[i, j] = Σ x_i, Q[i, j] = Σ x_i² and P[i, j] = Σ x_i x_j
+# over those rows. Values are centred on each stock's overall mean first, in
+# float64, so the subtractions below do not lose precision on small RV values.
+def _corr_from_sums(n, S, Q, P):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = P - S * S.T / n
+        var_i = Q - S * S / n
+        var_j = var_i.T
+        corr = cov / np.sqrt(var_i * var_j)
+    corr[n < 2] = np.nan
+    return np.clip(corr, -1.0, 1.0)
+
+
+def _centred(values, shift):
+    valid = ~np.isnan(values)
+    return np.where(valid, values - shift, 0.0), valid.astype(np.float64)
+
+
+def _shift(values):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.nan_to_num(np.nanmean(values, axis=0, dtype=np.float64))
+
+
+def _block_sums(x, m):
+    """(n, S, Q, P) over the rows of centred values x with validity m."""
+    return np.stack((m.T @ m, x.T @ m, (x * x).T @ m, x.T @ x))
+
+
+def blocked_corr(values, block_rows=CORR_BLOCK_ROWS):
+    """Correlation matrix of a (rows x k) window, accumulated over row blocks
+    with matrix products so memory stays O(block_rows * k + k²)."""
+    k = values.shape[1]
+    shift = _shift(values)
+    sums = np.zeros((4, k, k))
+    for start in range(0, len(values), block_rows):
+        sums += _block_sums(*_centred(values[start:start + block_rows], shift))
+    return _corr_from_sums(*sums)
+
+
+# Prefix cross-products for a fixed set of k stocks over the time-sorted panel.
+# The four sums are kept at every PREFIX_BLOCK_ROWS-th row only: entry b holds
+# the sums over rows [0, b * PREFIX_BLOCK_ROWS). A window [lo, hi) is the
+# difference of the entries of its whole blocks plus its ragged ends (under a
+# block each) summed directly, so a query costs O(k² * PREFIX_BLOCK_ROWS)
+# however long the window. Memory is 32 bytes x (rows / PREFIX_BLOCK_ROWS) x
+# k² plus the (rows x k) values, so every selection can keep one.
+PREFIX_BLOCK_ROWS = 256
+
+
+class CrossPrefix:
+    def __init__(self, values, block_rows=PREFIX_BLOCK_ROWS):
+        self.values = values
+        self.k = values.shape[1]
+        self.block_rows = block_rows
+        self.shift = _shift(values)
+        n_blocks = len(values) // block_rows
+        self.sums = np.zeros((n_blocks + 1, 4, self.k, self.k))
+        for b in range(n_blocks):
+            self.sums[b + 1] = self.sums[b] + self._sums(b * block_rows, (b + 1) * block_rows)
+
+    @property
+    def nbytes(self):
+        return self.sums.nbytes + self.values.nbytes
+
+    def _sums(self, lo, hi):
+        return _block_sums(*_centred(self.values[lo:hi], self.shift))
+
+    def corr(self, lo, hi):
+        """Correlation matrix over rows [lo, hi)."""
+        first = -(-lo // self.block_rows)
+        last = hi // self.block_rows
+        if first >= last:
+            return _corr_from_sums(*self._sums(lo, max(lo, hi)))
+        sums = self.sums[last] - self.sums[first]
+        sums += self._sums(lo, first * self.block_rows)
+        sums += self._sums(last * self.block_rows, hi)
+        return _corr_from_sums(*sums)
+
+
+def cluster_order(corr):
+    """Leaf order of average-linkage clustering on 1 - corr.
+
+    Correlated stocks end up next to each other, which makes blocks visible
+    in the heatmap. Pairs with no overlap are treated as uncorrelated.
+    """
+    k = len(corr)
+    if k < 3:
+        return np.arange(k)
+    dist = 1.0 - np.nan_to_num(corr, nan=0.0)
+    np.fill_diagonal(dist, np.inf)
+    sizes = np.ones(k)
+    members = [[i] for i in range(k)]
+    active = np.ones(k, dtype=bool)
+    for _ in range(k - 1):
+        a, b = np.unravel_index(np.argmin(dist), dist.shape)
+        a, b = min(a, b), max(a, b)
+        # Average linkage: size-weighted mean of the merged rows
+        merged = (sizes[a] * dist[a] + sizes[b] * dist[b]) / (sizes[a] + sizes[b])
+        dist[a], dist[:, a] = merged, merged
+        dist[a, a] = np.inf
+        dist[b], dist[:, b] = np.inf, np.inf
+        sizes[a] += sizes[b]
+        members[a] = members[a] + members[b]
+        active[b] = False
+    return np.array(members[int(np.flatnonzero(active)[0])])
@@ -0,0 +1,97 @@
+import numpy as np
+
+# Visually lossless reduction of long time series before plotting.
+# A chart n pixels wide cannot show more than about n distinct x positions,
+# so series are cut into that many x-buckets and only the points that shape
+# each bucket's pixel column are kept. All methods are vectorized over the
+# whole series and return (x, y) sorted by x. Missing values (NaN) stay in
+# the output as line breaks, one per pixel column they occur in.
+
+
+def _buckets(n, n_buckets):
+    # Start offset of each of n_buckets near-equal runs over n points
+    return np.linspace(0, n, n_buckets + 1).astype(np.intp)[:-1]
+
+
+def minmax(x, y, n_buckets):
+    """Keep the min and max point of each bucket (spikes always survive),
+    plus the end points so the x extent is unchanged."""
+    keep = _minmax_keep(y, n_buckets)
+    return x[keep], y[keep]
+
+
+def _minmax_keep(y, n_buckets):
+    starts = _buckets(len(y), n_buckets)
+    bucket = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(y))))
+    # Per-bucket argmin/argmax via one stable sort of (bucket, y)
+    order = np.lexsort((y, bucket))
+    ends = np.append(starts[1:], len(y)) - 1
+    return np.union1d(np.union1d(order[starts], order[ends]), [0, len(y) - 1])
+
+
+def lttb(x, y, n_out):
+    """Largest-Triangle-Three-Buckets with bucket-mean anchors.
+
+    Each inner bucket keeps the point forming the largest triangle with the
+    mean of the previous and the next bucket. Using the previous bucket's
+    mean instead of its selected point makes every bucket independent, so the
+    whole selection is a handful of array operations instead of a loop.
+    """
+    if n_out < 3 or len(x) <= n_out:
+        return x, y
+    keep = _lttb_keep(x, y, n_out)
+    return x[keep], y[keep]
+
+
+def _lttb_keep(x, y, n_out):
+    n = len(x)
+    inner = n_out - 2
+    starts = 1 + _buckets(n - 2, inner)
+    counts = np.diff(np.append(starts, n - 1))
+    xs, ys = x.astype(np.float64), y.astype(np.float64)
+    mean_x = np.add.reduceat(xs[1:-1], starts - 1) / counts
+    mean_y = np.add.reduceat(ys[1:-1], starts - 1) / counts
+    prev_x = np.concatenate(([xs[0]], mean_x[:-1]))
+    prev_y = np.concatenate(([ys[0]], mean_y[:-1]))
+    next_x = np.concatenate((mean_x[1:], [xs[-1]]))
+    next_y = np.concatenate((mean_y[1:], [ys[-1]]))
+
+    bucket = np.repeat(np.arange(inner), counts)
+    px, py = xs[1:-1], ys[1:-1]
+    area = np.abs(
+        (prev_x[bucket] - next_x[bucket]) * (py - prev_y[bucket])
+        - (prev_x[bucket] - px) * (next_y[bucket] - prev_y[bucket])
+    )
+    # Per-bucket argmax: sort by (bucket, area) and take each bucket's last
+    order = np.lexsort((area, bucket))
+    ends = np.append(starts[1:], n - 1) - 2
+    return np.concatenate(([0], order[ends] + 1, [n - 1]))
+
+
+def downsample(x, y, width_px, method='minmax', oversample=2):
+    """Reduce (x, y) to what a width_px-wide plot can show.
+
+    Series with at most oversample * width_px values are returned unchanged.
+    Points are selected among the values, 'minmax' keeping two per pixel
+    column and 'lttb' one; the first NaN in each pixel column is kept too, so
+    gaps are still drawn as gaps.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=np.float64)
+    n_px = max(int(width_px), 1)
+    if method not in ('minmax', 'lttb'):
+        raise ValueError(f"Unknown downsampling method: {method}")
+    if len(x) <= oversample * n_px:
+        return x, y
+    finite = np.flatnonzero(~np.isnan(y))
+    if len(finite) <= oversample * n_px:
+        return x, y
+    if method == 'lttb':
+        keep = finite[_lttb_keep(x[finite], y[finite], n_px)]
+    else:
+        keep = finite[_minmax_keep(y[finite], n_px)]
+    if len(finite) < len(y):
+        gaps = np.flatnonzero(np.isnan(y))
+        column = np.searchsorted(_buckets(len(y), n_px), gaps, side='right')
+        keep = np.union1d(keep, gaps[np.diff(column, prepend=-1) > 0])
+    return x[keep], y[keep]
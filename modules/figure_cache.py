@@ -0,0 +1,198 @@
+import base64
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from shiny import render
+
+from . import figures
+
+logger = logging.getLogger(__name__)
+
+
+# Cache of rendered plot images shared by every session in a worker.
+# Entries are PNG data URIs keyed by (plot, query, size, pixel ratio) and
+# tagged with the panel version. Memory is bounded by total bytes with LRU
+# eviction; an optional disk directory keeps images across restarts under its
+# own byte budget and records which subjects are requested most.
+class FigureCache:
+    def __init__(self, max_bytes=64 * 2**20, disk_dir=None, max_disk_bytes=512 * 2**20):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.version = None
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.requests = Counter()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self.requests.update(self._load_requests())
+
+    def get_or_render(self, key, render_png, version=None, subject=None):
+        """Return a PNG data URI for key, calling render_png() on a miss."""
+        if subject is not None:
+            self.requests[subject] += 1
+        with self._lock:
+            self._check_version(version)
+            src = self._entries.get(key)
+            if src is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return src
+        src = self._read_disk(key, version)
+        if src is None:
+            with self._lock:
+                self.misses += 1
+            png = render_png()
+            src = 'data:image/png;base64,' + base64.b64encode(png).decode('ascii')
+            self._write_disk(key, version, src)
+        self.put(key, src, version)
+        return src
+
+    def get(self, key, version=None, subject=None):
+        """The cached data URI for key if it is in memory, else None.
+
+        A miss is not counted; the get_or_render() that follows counts it.
+        """
+        with self._lock:
+            self._check_version(version)
+            src = self._entries.get(key)
+            if src is None:
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        if subject is not None:
+            self.requests[subject] += 1
+        return src
+
+    def put(self, key, src, version=None):
+        with self._lock:
+            self._check_version(version)
+            if version != self.version or len(src) > self.max_bytes:
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= len(old)
+            self._entries[key] = src
+            self.nbytes += len(src)
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= len(evicted)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def _check_version(self, version):
+        if version != self.version:
+            self._entries.clear()
+            self.nbytes = 0
+            self.version = version
+
+    def most_requested(self, n):
+        return [subject for subject, _ in self.requests.most_common(n)]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.nbytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'version': self.version,
+            }
+
+    # Disk tier: one file per (key, version), evicted oldest-first by mtime
+    def _disk_path(self, key, version):
+        digest = hashlib.sha1(repr((key, version)).encode()).hexdigest()
+        return os.path.join(self.disk_dir, f'{digest}.uri')
+
+    def _read_disk(self, key, version):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key, version)) as fh:
+                return fh.read()
+        except OSError:
+            return None
+
+    def _write_disk(self, key, version, src):
+        if not self.disk_dir:
+            return
+        try:
+            with open(self._disk_path(key, version), 'w') as fh:
+                fh.write(src)
+            self._trim_disk()
+        except OSError as exc:
+            logger.warning('figure disk cache write failed: %s', exc)
+
+    def _trim_disk(self):
+        files = [e for e in os.scandir(self.disk_dir) if e.name.endswith('.uri')]
+        total = sum(e.stat().st_size for e in files)
+        for entry in sorted(files, key=lambda e: e.stat().st_mtime):
+            if total <= self.max_disk_bytes:
+                break
+            total -= entry.stat().st_size
+            os.remove(entry.path)
+
+    def _load_requests(self):
+        try:
+            with open(os.path.join(self.disk_dir, 'requests.json')) as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return {}
+
+    def save_requests(self):
+        if not self.disk_dir:
+            return
+        with open(os.path.join(self.disk_dir, 'requests.json'), 'w') as fh:
+            json.dump(dict(self.requests), fh)
+
+
+class cached_image(render.image):
+    """render.image that also accepts a data URI src, as held by FigureCache."""
+
+    async def transform(self, value):
+        if value.get('src', '').startswith('data:'):
+            return dict(value)
+        return await super().transform(value)
+
+
+def _render_ts(key, time_ids, rv, stock, width, height, pixelratio):
+    png = figures.ts_png(time_ids, rv, stock, width, height, pixelratio)
+    return key, 'data:image/png;base64,' + base64.b64encode(png).decode('ascii')
+
+
+def warm_up(cache, panel_store, stocks, width, height, pixelratio=1, jobs=None):
+    """Pre-render time-series figures for stocks in a process pool.
+
+    Runs in a background thread; each finished image is put into the cache
+    under the panel data key current when the job started.
+    """
+    def run():
+        version = panel_store.data_key
+        tasks = []
+        for stock in stocks:
+            key = ('ts', int(stock), width, height, pixelratio)
+            if key in cache:
+                continue
+            time_ids, rv = panel_store.series(stock)
+            tasks.append((key, time_ids.copy(), rv.copy(), int(stock), width, height, pixelratio))
+        if not tasks:
+            return
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            for key, src in pool.map(_render_ts, *zip(*tasks)):
+                cache.put(key, src, version)
+        logger.info('pre-rendered %d time-series figures', len(tasks))
+
+    thread = threading.Thread(target=run, name='figure-warm-up', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,188 @@
+import io
+
+import os
+
+import numpy as np
+from matplotlib.figure import Figure
+
+from .downsample import downsample
+
+# Figure drawing for the screener and portfolio panels, kept free of Shiny and
+# of the loaded panel so it can run in figure-cache warm-up worker processes.
+# Sizes follow render.plot: CSS pixels at 96 dpi scaled by the pixel ratio.
+CSS_DPI = 96
+
+# Downsampling applied to long time series before drawing: 'minmax', 'lttb'
+# or 'none'
+DOWNSAMPLE_METHOD = os.environ.get('VX_DOWNSAMPLE', 'minmax')
+
+
+def new_figure(width, height, pixelratio=1):
+    return Figure(figsize=(width / CSS_DPI, height / CSS_DPI), dpi=CSS_DPI * pixelratio)
+
+
+def to_png(fig):
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=fig.dpi)
+    return buf.getvalue()
+
+
+def draw_ts(fig, time_ids, rv, stock):
+    # Styled area chart of volatility over time for one stock
+    ax = fig.subplots()
+    # Plot line and fill under curve
+    ax.plot(time_ids, rv, color='#1f77b4', linewidth=2)
+    ax.fill_between(time_ids, rv, color='#1f77b4', alpha=0.3)
+    # Style axes
+    ax.set_xlabel('Time ID')
+    ax.set_ylabel('Realized Volatility')
+    ax.set_title(f'Stock {stock} Volatility Over Time', fontsize=12, fontweight='bold')
+    ax.grid(axis='y', linestyle='--', alpha=0.5)
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+    # Rotate x labels for readability, show sparse ticks
+    ticks = time_ids[::len(time_ids)//10 or 1]
+    ax.set_xticks(ticks)
+    ax.set_xticklabels(ticks, rotation=45, ha='right')
+    fig.tight_layout()
+    return fig
+
+
+def draw_top_n(fig, stock_ids, scores, label):
+    ax = fig.subplots()
+    xticks = [str(s) for s in stock_ids]
+    # Plot line and fill under curve for the ranking metric
+    ax.plot(xticks, scores, color='#1f77b4', linewidth=2)
+    ax.fill_between(xticks, scores, color='#1f77b4', alpha=0.3)
+    ax.set_xlabel('Stock ID')
+    ax.set_ylabel(label)
+    ax.set_title(f'Top N Stocks by {label}', fontsize=12, fontweight='bold')
+    ax.grid(axis='y', linestyle='--', alpha=0.5)
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+    # Show only a subset of x-ticks for readability
+    if len(xticks) > 10:
+        step = max(1, len(xticks)//10)
+        ax.set_xticks(xticks[::step])
+        ax.set_xticklabels(xticks[::step], rotation=45, ha='right')
+    else:
+        ax.set_xticks(xticks)
+        ax.set_xticklabels(xticks, rotation=0)
+    fig.tight_layout()
+    return fig
+
+
+def draw_fan(fig, bands, percentiles):
+    # Percentile bands of the running average RV along the stress horizon;
+    # bands has one row per percentile, symmetric pairs are shaded
+    ax = fig.subplots()
+    steps = range(1, bands.shape[1] + 1)
+    n = len(percentiles)
+    for i in range(n // 2):
+        alpha = 0.15 + 0.2 * i / max(n // 2 - 1, 1)
+        ax.fill_between(steps, bands[i], bands[n - 1 - i], color='#8E24AA', alpha=alpha, linewidth=0,
+                        label=f'{percentiles[i]}-{percentiles[n - 1 - i]}th pct')
+    if n % 2:
+        ax.plot(steps, bands[n // 2], color='#4a148c', linewidth=2, label='Median')
+    ax.set_xlabel('Time IDs Ahead')
+    ax.set_ylabel('Average Portfolio RV')
+    ax.set_title('Stressed Portfolio Volatility', fontsize=12, fontweight='bold')
+    ax.grid(axis='y', linestyle='--', alpha=0.5)
+    ax.legend(loc='upper right', fontsize=8)
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+    fig.tight_layout()
+    return fig
+
+
+def draw_analysis(fig, time_ids, series, acf, stock):
+    # RV with its smoothed versions on top, autocorrelation by lag below;
+    # series maps a legend label to (time_ids, values)
+    ax, ax_acf = fig.subplots(2, 1, gridspec_kw={'height_ratios': [3, 1.3]})
+    styles = [('#1f77b4', 1, 0.35), ('#ff6d00', 2, 1.0), ('#8E24AA', 2, 1.0)]
+    for (label, (x, y)), (color, width, alpha) in zip(series.items(), styles):
+        ax.plot(x, y, color=color, linewidth=width, alpha=alpha, label=label)
+    ax.set_xlabel('Time ID')
+    ax.set_ylabel('Realized Volatility')
+    ax.set_title(f'Stock {stock} Volatility Profile', fontsize=12, fontweight='bold')
+    ax.grid(axis='y', linestyle='--', alpha=0.5)
+    ax.legend(loc='upper right', fontsize=8)
+    lags = range(1, len(acf))
+    ax_acf.bar(lags, acf[1:], color='#1f77b4', width=0.8)
+    ax_acf.axhline(0, color='#212121', linewidth=0.8)
+    ax_acf.set_xlabel('Lag (time_ids)')
+    ax_acf.set_ylabel('Autocorrelation')
+    for axis in (ax, ax_acf):
+        for spine in axis.spines.values():
+            spine.set_visible(False)
+    fig.tight_layout()
+    return fig
+
+
+def analysis_png(time_ids, series, acf, stock, width, height, pixelratio=1, method=DOWNSAMPLE_METHOD):
+    if method != 'none':
+        series = {label: downsample(time_ids, y, width * pixelratio, method=method)
+                  for label, y in series.items()}
+    else:
+        series = {label: (time_ids, y) for label, y in series.items()}
+    return to_png(draw_analysis(new_figure(width, height, pixelratio), time_ids, series, acf, stock))
+
+
+def draw_corr(fig, corr, labels):
+    ax = fig.subplots()
+    image = ax.imshow(corr, cmap='RdBu_r', vmin=-1, vmax=1)
+    ax.set_xticks(range(len(labels)))
+    ax.set_xticklabels(labels, rotation=45, ha='right')
+    ax.set_yticks(range(len(labels)))
+    ax.set_yticklabels(labels)
+    # Print the coefficients while the cells are big enough to read
+    if len(labels) <= 12:
+        for i in range(len(labels)):
+            for j in range(len(labels)):
+                if not np.isnan(corr[i, j]):
+                    ax.text(j, i, f'{corr[i, j]:.2f}', ha='center', va='center', fontsize=8,
+                            color='white' if abs(corr[i, j]) > 0.6 else '#212121')
+    ax.set_title('RV Correlation', fontsize=12, fontweight='bold')
+    fig.colorbar(image, ax=ax, shrink=0.8)
+    fig.tight_layout()
+    return fig
+
+
+def draw_overlay(fig, series):
+    # One line per stock; series maps a stock id to (time_ids, rv)
+    ax = fig.subplots()
+    for stock, (x, y) in series.items():
+        ax.plot(x, y, linewidth=1.2, label=f'Stock {stock}')
+    ax.set_xlabel('Time ID')
+    ax.set_ylabel('Realized Volatility')
+    ax.set_title('Realized Volatility Comparison', fontsize=12, fontweight='bold')
+    ax.grid(axis='y', linestyle='--', alpha=0.5)
+    ax.legend(loc='upper right', fontsize=8, ncol=2)
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+    fig.tight_layout()
+    return fig
+
+
+def overlay_png(time_ids, series, width, height, pixelratio=1, method=DOWNSAMPLE_METHOD):
+    if method != 'none':
+        series = {stock: downsample(time_ids, y, width * pixelratio, method=method)
+                  for stock, y in series.items()}
+    else:
+        series = {stock: (time_ids, y) for stock, y in series.items()}
+    return to_png(draw_overlay(new_figure(width, height, pixelratio), series))
+
+
+def corr_png(corr, labels, width, height, pixelratio=1):
+    return to_png(draw_corr(new_figure(width, height, pixelratio), corr, labels))
+
+
+def ts_png(time_ids, rv, stock, width, height, pixelratio=1, method=DOWNSAMPLE_METHOD):
+    # Beyond a couple of points per device pixel nothing more is visible
+    if method != 'none':
+        time_ids, rv = downsample(time_ids, rv, width * pixelratio, method=method)
+    return to_png(draw_ts(new_figure(width, height, pixelratio), time_ids, rv, stock))
+
+
+def top_n_png(stock_ids, scores, label, width, height, pixelratio=1):
+    return to_png(draw_top_n(new_figure(width, height, pixelratio), stock_ids, scores, label))
@@ -0,0 +1,159 @@
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .panel_cache import DEFAULT_CSV, load_panel
+from .range_index import RangeIndex
+from .stock_stats import EWMA_HALFLIFE, rolling_mean
+
+# Next-period RV forecasts for every stock.
+# HAR-RV regresses RV_{t+1} on the "daily", "weekly" and "monthly" averages of
+# RV over the last 1, 5 and 22 time_ids. All stocks are fitted at once: the
+# per-stock normal equations are accumulated with one einsum over the masked
+# design and solved as a batch of 4 x 4 systems. The EWMA baseline forecasts
+# the latest exponentially weighted average.
+HAR_LAGS = (1, 5, 22)
+MIN_FIT_ROWS = 30
+
+
+def har_features(csum_c, ccount, shift):
+    """(rows, n_stocks, 1 + len(HAR_LAGS)) design: intercept and lag means."""
+    n_rows, n_stocks = csum_c.shape[0] - 1, csum_c.shape[1]
+    features = np.empty((n_rows, n_stocks, 1 + len(HAR_LAGS)))
+    features[:, :, 0] = 1.0
+    for i, lag in enumerate(HAR_LAGS, start=1):
+        features[:, :, i] = rolling_mean(csum_c, ccount, shift, lag)
+    return features
+
+
+def ewma(values):
+    return pd.DataFrame(values).ewm(halflife=EWMA_HALFLIFE, ignore_na=True).mean().to_numpy()
+
+
+def fit_har(features, target):
+    """Least-squares HAR coefficients per stock, shape (n_stocks, n_features).
+
+    features[t] predicts target[t]; rows with any NaN are left out of that
+    stock's fit. Stocks with fewer than MIN_FIT_ROWS usable rows get NaN.
+    """
+    usable = ~np.isnan(target) & ~np.isnan(features).any(axis=2)
+    x = np.where(usable[:, :, None], features, 0.0)
+    y = np.where(usable, target, 0.0)
+    xtx = np.einsum('tsi,tsj->sij', x, x)
+    xty = np.einsum('tsi,ts->si', x, y)
+    # A tiny ridge keeps near-constant series solvable
+    ridge = 1e-13 * np.trace(xtx, axis1=1, axis2=2)[:, None, None] * np.eye(xtx.shape[1])
+    fitted = usable.sum(axis=0) >= MIN_FIT_ROWS
+    coef = np.full(xty.shape, np.nan)
+    if fitted.any():
+        coef[fitted] = np.linalg.solve(xtx[fitted] + ridge[fitted], xty[fitted][:, :, None])[:, :, 0]
+    return coef
+
+
+def predict_har(coef, features):
+    """Forecasts from features (..., n_stocks, n_features), clipped at zero."""
+    return np.maximum(np.einsum('...si,si->...s', features, coef), 0.0)
+
+
+def forecast_frame(rv_index):
+    """Next-period HAR and EWMA forecasts per stock from the full panel."""
+    n = len(rv_index.values)
+    features = har_features(rv_index.csum_c[:n + 1], rv_index.ccount[:n + 1], rv_index.shift)
+    values = rv_index.values[:n]
+    coef = fit_har(features[:-1], values[1:])
+    smoothed = ewma(values)
+    last = np.argmax(~np.isnan(smoothed[::-1]), axis=0)
+    return pd.DataFrame({
+        'stock_id': rv_index.stock_ids,
+        'har_forecast': predict_har(coef, features[-1]),
+        'ewma_forecast': smoothed[n - 1 - last, np.arange(values.shape[1])],
+    })
+
+
+# Walk-forward backtest: refit HAR every `step` rows on the previous `train`
+# rows (or everything before, when train is None) and forecast the following
+# `step` rows one period ahead. Refit points are split into contiguous chunks
+# and each chunk runs in a worker process on just the rows it needs.
+def _backtest_chunk(features, values, smoothed, fit_ends, train, step):
+    n_stocks = values.shape[1]
+    totals = {name: np.zeros(n_stocks) for name in ('har_sq', 'har_abs', 'ewma_sq', 'ewma_abs', 'count')}
+    for end in fit_ends:
+        lo = 0 if train is None else max(end - train, 0)
+        # Rows lo..end-1 predict lo+1..end, all known at time end
+        coef = fit_har(features[lo:end - 1], values[lo + 1:end])
+        rows = slice(end - 1, min(end - 1 + step, len(values) - 1))
+        target = values[rows.start + 1:rows.stop + 1]
+        har = predict_har(coef, features[rows])
+        base = smoothed[rows]
+        scored = ~np.isnan(target) & ~np.isnan(har) & ~np.isnan(base)
+        for name, err in (('har', har - target), ('ewma', base - target)):
+            err = np.where(scored, err, 0.0)
+            totals[f'{name}_sq'] += (err * err).sum(axis=0)
+            totals[f'{name}_abs'] += np.abs(err).sum(axis=0)
+        totals['count'] += scored.sum(axis=0)
+    return totals
+
+
+def backtest(rv_index, train=1000, step=50, jobs=None):
+    """Per-stock out-of-sample RMSE and MAE of the HAR and EWMA forecasts."""
+    n = len(rv_index.values)
+    features = har_features(rv_index.csum_c[:n + 1], rv_index.ccount[:n + 1], rv_index.shift)
+    values = rv_index.values[:n]
+    smoothed = ewma(values)
+    first = (train or max(HAR_LAGS) * 5) + 1
+    fit_ends = np.arange(first, n, step)
+    if len(fit_ends) == 0:
+        raise ValueError(f"The panel has too few rows ({n}) for a training window of {train}")
+    n_chunks = min(len(fit_ends), jobs or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = []
+        for chunk in np.array_split(fit_ends, n_chunks):
+            lo = 0 if train is None else max(chunk[0] - train, 0)
+            hi = min(chunk[-1] + step, n)
+            futures.append(pool.submit(
+                _backtest_chunk, features[lo:hi], values[lo:hi], smoothed[lo:hi], chunk - lo, train, step
+            ))
+        parts = [f.result() for f in futures]
+    totals = {name: sum(p[name] for p in parts) for name in parts[0]}
+    count = totals['count']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return pd.DataFrame({
+            'stock_id': rv_index.stock_ids,
+            'n_forecasts': count.astype(np.int64),
+            'har_rmse': np.sqrt(totals['har_sq'] / count),
+            'har_mae': totals['har_abs'] / count,
+            'ewma_rmse': np.sqrt(totals['ewma_sq'] / count),
+            'ewma_mae': totals['ewma_abs'] / count,
+        })
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m modules.forecast',
+        description='Forecast next-period realized volatility for every stock, or backtest the forecasts.',
+    )
+    parser.add_argument('command', choices=['forecast', 'backtest'])
+    parser.add_argument('--csv', default=DEFAULT_CSV, help='panel CSV (default: %(default)s)')
+    parser.add_argument('--train', type=int, default=1000,
+                        help='backtest training window in time_ids, 0 for expanding (default: %(default)s)')
+    parser.add_argument('--step', type=int, default=50, help='backtest refit interval (default: %(default)s)')
+    parser.add_argument('--jobs', type=int, help='worker processes (default: CPU count)')
+    parser.add_argument('--output', help='write the CSV here instead of stdout')
+    args = parser.parse_args(argv)
+
+    panel = load_panel(args.csv)
+    rv_index = RangeIndex(panel, panel.stock_cols)
+    if args.command == 'forecast':
+        out = forecast_frame(rv_index)
+    else:
+        out = backtest(rv_index, train=args.train or None, step=args.step, jobs=args.jobs)
+    out.to_csv(args.output or sys.stdout, index=False)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
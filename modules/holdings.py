@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+
+HOLDING_COLUMNS = ['stock_id', 'volume', 'price']
+
+
+# Portfolio holdings held as NumPy arrays indexed by stock position.
+# Upserting one holding is O(1) and keeps the total value current, and a whole
+# book can be loaded in one vectorized step. `added_at` remembers when each
+# stock was first added so tables and charts keep the order the user built.
+class HoldingsStore:
+    def __init__(self, stock_ids):
+        self.stock_ids = np.asarray(stock_ids, dtype=np.int64)
+        self.position = {int(s): i for i, s in enumerate(self.stock_ids)}
+        self._by_id = np.argsort(self.stock_ids)
+        n = len(self.stock_ids)
+        self.volume = np.zeros(n)
+        self.price = np.zeros(n)
+        self.held = np.zeros(n, dtype=bool)
+        self.added_at = np.zeros(n, dtype=np.int64)
+        self.total_value = 0.0
+        self.version = 0
+        self._clock = 0
+
+    def __len__(self):
+        return int(self.held.sum())
+
+    def _ensure(self, stock_ids):
+        # Stocks that joined the panel after the store was created
+        ids = np.unique(np.asarray(stock_ids, dtype=np.int64))
+        new = [int(s) for s in ids[~np.isin(ids, self.stock_ids)]]
+        if not new:
+            return
+        self.position.update({s: len(self.stock_ids) + i for i, s in enumerate(new)})
+        self.stock_ids = np.concatenate([self.stock_ids, new])
+        self._by_id = np.argsort(self.stock_ids)
+        pad = len(new)
+        self.volume = np.concatenate([self.volume, np.zeros(pad)])
+        self.price = np.concatenate([self.price, np.zeros(pad)])
+        self.held = np.concatenate([self.held, np.zeros(pad, dtype=bool)])
+        self.added_at = np.concatenate([self.added_at, np.zeros(pad, dtype=np.int64)])
+
+    def upsert(self, stock, volume, price):
+        """Add volume to a holding (creating it if needed) and reprice it."""
+        self._ensure([stock])
+        pos = self.position[int(stock)]
+        old_value = self.volume[pos] * self.price[pos] if self.held[pos] else 0.0
+        if not self.held[pos]:
+            self.held[pos] = True
+            self.volume[pos] = 0.0
+            self._clock += 1
+            self.added_at[pos] = self._clock
+        self.volume[pos] += volume
+        self.price[pos] = price
+        self.total_value += self.volume[pos] * self.price[pos] - old_value
+        self.version += 1
+
+    def clear(self):
+        self.held[:] = False
+        self.volume[:] = 0.0
+        self.price[:] = 0.0
+        self.total_value = 0.0
+        self.version += 1
+
+    def load(self, book, replace=True):
+        """Load a holdings frame (stock_id, volume, price) in one vectorized step.
+
+        Repeated stocks have their volumes summed and keep their last price.
+        """
+        stocks = book['stock_id'].to_numpy(dtype=np.int64)
+        volumes = book['volume'].to_numpy(dtype=np.float64)
+        prices = book['price'].to_numpy(dtype=np.float64)
+        self._ensure(stocks)
+        if replace:
+            self.held[:] = False
+            self.volume[:] = 0.0
+            self.price[:] = 0.0
+        positions = self._by_id[np.searchsorted(self.stock_ids[self._by_id], stocks)]
+        first_seen = ~self.held[positions]
+        self.volume[positions[first_seen]] = 0.0
+        np.add.at(self.volume, positions, volumes)
+        # Fancy assignment keeps the last write for repeated positions
+        self.price[positions] = prices
+        new_positions, first_row = np.unique(positions[first_seen], return_index=True)
+        self.added_at[new_positions] = self._clock + 1 + np.argsort(np.argsort(first_row))
+        self._clock += len(new_positions)
+        self.held[positions] = True
+        self.total_value = float(self.volume[self.held] @ self.price[self.held])
+        self.version += 1
+
+    def weights(self):
+        """Value weights over all stock positions (zero where not held)."""
+        values = np.where(self.held, self.volume * self.price, 0.0)
+        return values / self.total_value if self.total_value else values
+
+    def to_frame(self):
+        positions = np.flatnonzero(self.held)
+        positions = positions[np.argsort(self.added_at[positions], kind='stable')]
+        value = self.volume[positions] * self.price[positions]
+        return pd.DataFrame({
+            'stock_id': self.stock_ids[positions],
+            'volume': self.volume[positions],
+            'price': self.price[positions],
+            'value': value,
+            'proportion': value / self.total_value if self.total_value else value,
+        })
+
+
+def read_book(path, filename=None):
+    """Read an uploaded holdings book (CSV or Parquet) into HOLDING_COLUMNS."""
+    name = (filename or path).lower()
+    book = pd.read_parquet(path) if name.endswith('.parquet') else pd.read_csv(path)
+    book.columns = [str(c).strip().lower().replace(' ', '_') for c in book.columns]
+    missing = [c for c in HOLDING_COLUMNS if c not in book.columns]
+    if missing:
+        raise ValueError(f"Holdings file is missing column(s): {', '.join(missing)}")
+    book = book[HOLDING_COLUMNS].dropna()
+    ids = pd.to_numeric(book['stock_id'], errors='coerce').to_numpy(dtype=np.float64)
+    bad = ~np.isfinite(ids) | (ids != np.round(ids))
+    if bad.any():
+        examples = ', '.join(str(s) for s in book['stock_id'][bad][:5])
+        raise ValueError(f"Holdings stock_id must be an integer (got {examples})")
+    book['stock_id'] = ids.astype(np.int64)
+    if (book['volume'] < 0).any() or (book['price'] < 0).any():
+        raise ValueError("Holdings volume and price must be non-negative")
+    return book
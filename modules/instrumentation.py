@@ -0,0 +1,264 @@
+import bisect
+import cProfile
+import functools
+import heapq
+import inspect
+import io
+import os
+import pstats
+import random
+import threading
+import time
+from contextlib import contextmanager
+from itertools import accumulate
+
+from shiny.reactive._reactives import Calc_, Effect_
+from shiny.render.renderer import Renderer
+from shiny.types import SilentException
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+
+# Opt-in instrumentation of the reactive graph (VX_METRICS=1).
+# While a session's server function runs, every reactive calc, effect and
+# render it creates gets its function wrapped with a timer, so each one
+# reports a latency histogram, call and error counts and the rows of the
+# frames or arrays it produced. Outputs report twice: 'value' for the app's
+# function and 'render' for the whole render including serialization.
+# Gauges (open sessions, panel size) are read at scrape time.
+# Everything is served from /metrics on the app's own Starlette router, as
+# Prometheus text or JSON (/metrics?format=json).
+#
+# VX_PROFILE_SLOWEST=N also runs cProfile on a sample (VX_PROFILE_RATE) of
+# synchronous calls and keeps the N slowest profiles, at /metrics/profiles.
+ENABLED = os.environ.get('VX_METRICS', '') not in ('', '0')
+PROFILE_SLOWEST = int(os.environ.get('VX_PROFILE_SLOWEST', '0'))
+PROFILE_RATE = float(os.environ.get('VX_PROFILE_RATE', '0.05'))
+# Histogram bucket upper bounds, seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROFILE_LINES = 30
+
+
+class _Series:
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.errors = 0
+        self.rows = 0
+
+    def observe(self, seconds, rows, failed):
+        i = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+        if i < len(self.buckets):
+            self.buckets[i] += 1
+        self.count += 1
+        self.total += seconds
+        self.rows += rows
+        self.errors += failed
+
+
+# Process-wide registry of per-reactive series, gauges and slow profiles
+class Metrics:
+    def __init__(self, profile_slowest=0, profile_rate=PROFILE_RATE):
+        self.series = {}
+        self.gauges = {}
+        self.sessions = 0
+        self.profile_slowest = profile_slowest
+        self.profile_rate = profile_rate
+        self.profiles = []
+        self._profiling = threading.local()
+        self._lock = threading.Lock()
+
+    def observe(self, kind, name, seconds, rows=0, failed=False):
+        with self._lock:
+            series = self.series.get((kind, name))
+            if series is None:
+                series = self.series[(kind, name)] = _Series()
+            series.observe(seconds, rows, failed)
+
+    def gauge(self, name, help_text, read):
+        """Register a gauge whose value is read(), called at scrape time."""
+        self.gauges[name] = (help_text, read)
+
+    def _keep_profile(self, seconds, kind, name, profile):
+        out = io.StringIO()
+        pstats.Stats(profile, stream=out).sort_stats('cumulative').print_stats(PROFILE_LINES)
+        entry = (seconds, time.time(), kind, name, out.getvalue())
+        with self._lock:
+            if len(self.profiles) < self.profile_slowest:
+                heapq.heappush(self.profiles, entry)
+            elif seconds > self.profiles[0][0]:
+                heapq.heapreplace(self.profiles, entry)
+
+    def wrap(self, kind, name, fn):
+        """fn with timing (and sampled profiling) reported as (kind, name)."""
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def timed_async(*args, **kwargs):
+                start = time.perf_counter()
+                failed, rows = False, 0
+                try:
+                    value = await fn(*args, **kwargs)
+                    rows = _rows(value)
+                    return value
+                except Exception as exc:
+                    failed = not isinstance(exc, SilentException)
+                    raise
+                finally:
+                    self.observe(kind, name, time.perf_counter() - start, rows, failed)
+            return timed_async
+
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            # Only the outermost sampled call is profiled; nested calcs are
+            # part of its profile
+            profile = None
+            if (self.profile_slowest and not getattr(self._profiling, 'active', False)
+                    and random.random() < self.profile_rate):
+                profile = cProfile.Profile()
+                self._profiling.active = True
+                profile.enable()
+            start = time.perf_counter()
+            failed, rows = False, 0
+            try:
+                value = fn(*args, **kwargs)
+                rows = _rows(value)
+                return value
+            except Exception as exc:
+                # req() and friends stop a run on purpose, they are not errors
+                failed = not isinstance(exc, SilentException)
+                raise
+            finally:
+                seconds = time.perf_counter() - start
+                if profile is not None:
+                    profile.disable()
+                    self._profiling.active = False
+                    self._keep_profile(seconds, kind, name, profile)
+                self.observe(kind, name, seconds, rows, failed)
+        return timed
+
+    def snapshot(self):
+        with self._lock:
+            series = {
+                f'{kind}:{name}': {
+                    'kind': kind, 'name': name, 'count': s.count, 'errors': s.errors,
+                    'seconds_total': s.total, 'rows_total': s.rows,
+                    'buckets': dict(zip(LATENCY_BUCKETS, accumulate(s.buckets))),
+                }
+                for (kind, name), s in sorted(self.series.items())
+            }
+            gauges = {'vx_sessions': ('Open sessions', lambda: self.sessions), **self.gauges}
+        return {
+            'series': series,
+            'gauges': {name: {'help': help_text, 'value': _read(read)} for name, (help_text, read) in gauges.items()},
+        }
+
+    def prometheus(self):
+        snap = self.snapshot()
+        lines = [
+            '# HELP vx_reactive_seconds Run time of reactive calcs, effects and renders',
+            '# TYPE vx_reactive_seconds histogram',
+        ]
+        for s in snap['series'].values():
+            labels = f'kind="{s["kind"]}",name="{s["name"]}"'
+            for le, count in s['buckets'].items():
+                lines.append(f'vx_reactive_seconds_bucket{{{labels},le="{le}"}} {count}')
+            lines.append(f'vx_reactive_seconds_bucket{{{labels},le="+Inf"}} {s["count"]}')
+            lines.append(f'vx_reactive_seconds_sum{{{labels}}} {s["seconds_total"]:.6f}')
+            lines.append(f'vx_reactive_seconds_count{{{labels}}} {s["count"]}')
+        for metric, key, help_text in (
+            ('vx_reactive_errors_total', 'errors', 'Reactive runs that raised'),
+            ('vx_reactive_rows_total', 'rows_total', 'Rows of the frames and arrays produced'),
+        ):
+            lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} counter']
+            for s in snap['series'].values():
+                lines.append(f'{metric}{{kind="{s["kind"]}",name="{s["name"]}"}} {s[key]}')
+        for name, gauge in snap['gauges'].items():
+            lines += [f'# HELP {name} {gauge["help"]}', f'# TYPE {name} gauge', f'{name} {gauge["value"]}']
+        return '\n'.join(lines) + '\n'
+
+    def slow_profiles(self):
+        with self._lock:
+            entries = sorted(self.profiles, reverse=True)
+        return [
+            {'seconds': seconds, 'at': at, 'kind': kind, 'name': name, 'profile': text}
+            for seconds, at, kind, name, text in entries
+        ]
+
+
+def _rows(value):
+    # Frames, series and arrays (or a tuple led by one); the numeric stack
+    # is not imported here so the module stays cheap to load
+    if isinstance(value, tuple) and value:
+        value = value[0]
+    shape = getattr(value, 'shape', None)
+    return int(shape[0]) if shape else 0
+
+
+def _read(read):
+    try:
+        return float(read())
+    except Exception:
+        return float('nan')
+
+
+metrics = Metrics(PROFILE_SLOWEST)
+
+
+@contextmanager
+def instrument(session):
+    """Wrap the calcs, effects and renders created inside the block.
+
+    Shiny's own helpers (the per-output effects) are left alone. A no-op
+    unless VX_METRICS is set.
+    """
+    if not ENABLED:
+        yield
+        return
+    calc_init, effect_init, renderer_call = Calc_.__init__, Effect_.__init__, Renderer.__call__
+
+    def init_calc(self, fn, *args, **kwargs):
+        calc_init(self, metrics.wrap('calc', fn.__name__, fn), *args, **kwargs)
+
+    def init_effect(self, fn, *args, **kwargs):
+        if not getattr(fn, '__module__', '').startswith('shiny'):
+            fn = metrics.wrap('effect', fn.__name__, fn)
+        effect_init(self, fn, *args, **kwargs)
+
+    def call_renderer(self, fn):
+        # 'value' times the app's function, 'render' adds the serialization
+        result = renderer_call(self, metrics.wrap('value', fn.__name__, fn))
+        self.render = metrics.wrap('render', fn.__name__, self.render)
+        return result
+
+    with metrics._lock:
+        metrics.sessions += 1
+    session.on_ended(_session_ended)
+    Calc_.__init__, Effect_.__init__, Renderer.__call__ = init_calc, init_effect, call_renderer
+    try:
+        yield
+    finally:
+        Calc_.__init__, Effect_.__init__, Renderer.__call__ = calc_init, effect_init, renderer_call
+
+
+def _session_ended():
+    with metrics._lock:
+        metrics.sessions -= 1
+
+
+async def _metrics_route(request):
+    if request.query_params.get('format') == 'json':
+        return JSONResponse(metrics.snapshot())
+    return PlainTextResponse(metrics.prometheus(), media_type='text/plain; version=0.0.4')
+
+
+async def _profiles_route(request):
+    return JSONResponse(metrics.slow_profiles())
+
+
+def mount(app):
+    """Add the /metrics routes to a Shiny App's Starlette router (if enabled)."""
+    if ENABLED:
+        routes = app.starlette_app.router.routes
+        routes.insert(0, Route('/metrics/profiles', _profiles_route, methods=['GET']))
+        routes.insert(0, Route('/metrics', _metrics_route, methods=['GET']))
+    return app
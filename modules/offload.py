@@ -0,0 +1,122 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from shiny import reactive, req
+
+# Heavy per-session work (window metrics, similarity search, figure renders)
+# runs on a bounded thread pool instead of the event loop; NumPy releases the
+# GIL in its array loops, so other sessions keep being served meanwhile.
+# Matplotlib is not thread-safe, so an offloaded render is handed on to a
+# worker process with render_in_process(); in the server process only the
+# event loop thread draws figures.
+#   - Fairness: each session holds at most OFFLOAD_PER_SESSION pool slots, so
+#     one user dragging a slider cannot queue work ahead of everyone else.
+#   - Latest only: a LatestTask cancels its previous run whenever it is
+#     started again. Work still waiting for a slot is dropped, a run already
+#     on a thread finishes but its result is discarded, so bursts of input
+#     coalesce into the last one.
+OFFLOAD_WORKERS = int(os.environ.get('VX_OFFLOAD_WORKERS', str(min(8, os.cpu_count() or 1))))
+OFFLOAD_PER_SESSION = int(os.environ.get('VX_OFFLOAD_PER_SESSION', '2'))
+RENDER_WORKERS = int(os.environ.get('VX_RENDER_WORKERS', '2'))
+
+_pool = ThreadPoolExecutor(max_workers=OFFLOAD_WORKERS, thread_name_prefix='offload')
+_lanes = {}
+_render_pool = None
+_render_lock = threading.Lock()
+
+
+def render_in_process(fn, *args):
+    """fn(*args) in a render worker process, for use on offload threads.
+
+    fn and its arguments must pickle (module-level functions, arrays and
+    frames). Workers are spawned, not forked from this threaded process, and
+    started on first use.
+    """
+    global _render_pool
+    with _render_lock:
+        if _render_pool is None:
+            _render_pool = ProcessPoolExecutor(max_workers=RENDER_WORKERS,
+                                               mp_context=multiprocessing.get_context('spawn'))
+        pool = _render_pool
+    try:
+        return pool.submit(fn, *args).result()
+    except BrokenProcessPool:
+        # A worker died; the next render starts a fresh pool
+        with _render_lock:
+            if _render_pool is pool:
+                _render_pool = None
+        raise
+
+
+# One session's share of the pool. The slot is released when the thread is
+# done, not when the awaiting coroutine is cancelled, so stale runs still
+# count against the session until they finish.
+class SessionLane:
+    def __init__(self, limit=OFFLOAD_PER_SESSION):
+        self._slots = asyncio.Semaphore(limit)
+
+    async def run(self, fn, *args):
+        await self._slots.acquire()
+        try:
+            future = _pool.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        loop = asyncio.get_running_loop()
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._slots.release))
+        # Cancelling the wrapper cancels the pool future if it has not started
+        return await asyncio.wrap_future(future)
+
+
+def lane(session):
+    """The SessionLane of session, dropped when the session ends."""
+    key = session.id
+    if key not in _lanes:
+        _lanes[key] = SessionLane()
+        session.on_ended(lambda: _lanes.pop(key, None))
+    return _lanes[key]
+
+
+# fn(*args) on the session's lane as a Shiny extended task. start() cancels
+# the previous run first; result() behaves like ExtendedTask.result(), so
+# outputs reading it keep their last value and show progress while running.
+# set_result() makes a value that is already at hand (a cache hit) the
+# result at once, without a trip through the pool.
+class LatestTask:
+    def __init__(self, session):
+        self._lane = lane(session)
+        self._value = reactive.Value(None)
+
+        @reactive.extended_task
+        async def task(fn, args):
+            return await self._lane.run(fn, *args)
+
+        self._task = task
+
+    def start(self, fn, *args):
+        self._value.set(None)
+        self._task.cancel()
+        self._task.invoke(fn, args)
+
+    def set_result(self, value):
+        self._task.cancel()
+        self._value.set((value,))
+
+    def cancel(self):
+        self._task.cancel()
+
+    def result(self):
+        value = self._value.get()
+        if value is not None:
+            return value[0]
+        # A cancelled run is being replaced: show progress, not an empty output
+        if self._task.status() == 'cancelled':
+            req(False, cancel_output='progress')
+        return self._task.result()
+
+    def status(self):
+        return self._task.status()
@@ -0,0 +1,239 @@
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .panel_cache import DEFAULT_CSV, load_panel
+from .portfolio_risk import nan_cov
+
+# Long-only portfolio weights from an RV covariance matrix.
+# Weights always sum to one and stay within [0, cap]; callers turn them into
+# positions at a fixed total value with `rebalance`. Both solvers accept the
+# previous solution as a starting point, so re-solving after a small edit to
+# the portfolio takes a few iterations instead of a cold solve.
+METHODS = {
+    'min_variance': "Minimum Variance",
+    'risk_parity': "Risk Parity",
+}
+
+
+def project_capped_simplex(v, cap=1.0):
+    """Euclidean projection of v onto {w : 0 <= w <= cap, sum(w) = 1}.
+
+    sum(clip(v - tau, 0, cap)) is piecewise linear and non-increasing in tau
+    with breakpoints at v and v - cap, so it is evaluated at every breakpoint
+    at once with prefix sums and tau is interpolated inside the crossing one.
+    """
+    v = np.asarray(v, dtype=np.float64)
+    k = len(v)
+    if cap * k < 1 - 1e-12:
+        raise ValueError(f"A cap of {cap:g} cannot hold a fully invested portfolio of {k} stocks")
+    if cap * k <= 1 + 1e-12:
+        return np.full(k, cap)
+    v_sorted = np.sort(v)
+    prefix = np.concatenate(([0.0], np.cumsum(v_sorted)))
+
+    def total(tau):
+        lo = np.searchsorted(v_sorted, tau, side='right')
+        hi = np.searchsorted(v_sorted, tau + cap, side='left')
+        return prefix[hi] - prefix[lo] - tau * (hi - lo) + cap * (k - hi)
+
+    points = np.unique(np.concatenate((v_sorted, v_sorted - cap)))
+    sums = total(points)
+    # First breakpoint whose sum falls to or below one
+    j = int(np.argmax(sums <= 1.0))
+    if j == 0:
+        tau = points[0]
+    else:
+        t0, t1, s0, s1 = points[j - 1], points[j], sums[j - 1], sums[j]
+        tau = t0 + (s0 - 1.0) * (t1 - t0) / (s0 - s1)
+    return np.clip(v - tau, 0.0, cap)
+
+
+def _largest_eigenvalue(matrix, iters=50):
+    x = np.full(len(matrix), 1.0 / np.sqrt(len(matrix)))
+    value = 0.0
+    for _ in range(iters):
+        y = matrix @ x
+        value = float(np.linalg.norm(y))
+        if value == 0.0:
+            break
+        x = y / value
+    return value
+
+
+def min_variance(cov, cap=1.0, w0=None, tol=1e-10, max_iter=5000):
+    """Minimize wᵀΣw over the capped simplex; returns (weights, iterations).
+
+    Accelerated projected gradient (FISTA with adaptive restart), started
+    from w0 when given.
+    """
+    k = len(cov)
+    w = project_capped_simplex(np.full(k, 1.0 / k) if w0 is None else w0, cap)
+    step = 1.0 / (2 * _largest_eigenvalue(cov) * 1.01 or 1.0)
+    z, t = w, 1.0
+    for it in range(1, max_iter + 1):
+        w_next = project_capped_simplex(z - step * 2 * (cov @ z), cap)
+        if np.max(np.abs(w_next - w)) < tol:
+            return w_next, it
+        if np.dot(z - w_next, w_next - w) > 0:
+            # Momentum points uphill: restart from the plain step
+            z, t = w_next, 1.0
+        else:
+            t_next = (1 + np.sqrt(1 + 4 * t * t)) / 2
+            z = w_next + (t - 1) / t_next * (w_next - w)
+            t = t_next
+        w = w_next
+    return w, max_iter
+
+
+def risk_parity(cov, cap=1.0, w0=None, tol=1e-10, max_iter=100):
+    """Equal risk contribution weights; returns (weights, iterations).
+
+    Damped Newton on the convex form min ½yᵀΣy - Σ log(y_i)/k, whose minimizer
+    normalized to sum one has equal w_i (Σw)_i. A warm start w0 is rescaled
+    onto the solution's yᵀΣy = 1 surface, so small edits converge in a
+    couple of steps. Caps are applied by projecting the unconstrained answer.
+    """
+    k = len(cov)
+    budget = np.full(k, 1.0 / k)
+    y = np.full(k, 1.0 / k) if w0 is None else np.maximum(np.asarray(w0, dtype=np.float64), 1e-6)
+    y = y / np.sqrt(max(float(y @ cov @ y), 1e-300))
+
+    def objective(y):
+        return 0.5 * float(y @ cov @ y) - float(budget @ np.log(y))
+
+    it = 0
+    for it in range(1, max_iter + 1):
+        grad = cov @ y - budget / y
+        hessian = cov + np.diag(budget / (y * y))
+        direction = np.linalg.solve(hessian, grad)
+        if float(grad @ direction) < tol:
+            break
+        step, current = 1.0, objective(y)
+        while True:
+            y_next = y - step * direction
+            if np.all(y_next > 0) and objective(y_next) <= current - 0.25 * step * float(grad @ direction):
+                break
+            step *= 0.5
+        y = y_next
+    w = y / y.sum()
+    if w.max() > cap:
+        w = project_capped_simplex(w, cap)
+    return w, it
+
+
+def optimize(cov, method='min_variance', cap=1.0, w0=None):
+    """Weights for every column of cov; stocks with no RV variance get zero.
+
+    The covariance is rescaled to unit average variance first (weights do
+    not depend on its scale, the solvers' tolerances do).
+    """
+    cov = np.asarray(cov, dtype=np.float64)
+    active = np.diag(cov) > 0
+    weights = np.zeros(len(cov))
+    if not active.any():
+        return weights, 0
+    sub = cov[np.ix_(active, active)]
+    sub = sub / np.mean(np.diag(sub))
+    start = None
+    if w0 is not None and np.asarray(w0)[active].sum() > 0:
+        start = np.asarray(w0, dtype=np.float64)[active]
+        start = start / start.sum()
+    if method == 'min_variance':
+        weights[active], iterations = min_variance(sub, cap, start)
+    elif method == 'risk_parity':
+        weights[active], iterations = risk_parity(sub, cap, start)
+    else:
+        raise ValueError(f"Unknown optimization method: {method}")
+    return weights, iterations
+
+
+def rebalance(weights, total_value, prices):
+    """Target values and volumes holding the portfolio's total value fixed."""
+    target_value = np.asarray(weights) * total_value
+    with np.errstate(invalid='ignore', divide='ignore'):
+        target_volume = np.where(prices > 0, target_value / prices, 0.0)
+    return target_value, target_volume
+
+
+def suggest(holdings, cov, method='min_variance', cap=1.0, w0=None):
+    """Rebalance table for a holdings frame (stock_id, proportion, value,
+    price, volume) given the covariance of its stocks."""
+    weights, _ = optimize(cov, method, cap, w0)
+    target_value, target_volume = rebalance(weights, holdings['value'].sum(), holdings['price'].to_numpy())
+    return pd.DataFrame({
+        'stock_id': holdings['stock_id'].to_numpy(),
+        'proportion': holdings['proportion'].to_numpy(),
+        'target_weight': weights,
+        'target_value': target_value,
+        'volume_change': target_volume - holdings['volume'].to_numpy(),
+    })
+
+
+# Batch mode: one solve per rolling window of the panel. Windows are split
+# into contiguous chunks, each solved in a worker process with every window
+# warm-started from the one before it.
+def _solve_chunk(values, window, ends, method, cap):
+    weights, w = [], None
+    offset = ends[0] - window
+    for end in ends:
+        rows = values[end - window - offset:end - offset]
+        w, _ = optimize(nan_cov(rows), method, cap, w)
+        weights.append(w)
+    return np.array(weights)
+
+
+def rolling_weights(values, window, step=1, method='min_variance', cap=1.0, jobs=None):
+    """Solve over every window of `window` rows ending each `step` rows.
+
+    values is a time-sorted (time x stock) array. Returns (window end rows,
+    weights of shape (n_windows, n_stocks)).
+    """
+    ends = np.arange(window, len(values) + 1, step)
+    if len(ends) == 0:
+        raise ValueError(f"The panel has fewer than {window} rows")
+    n_chunks = min(len(ends), jobs or os.cpu_count() or 1)
+    chunks = [c for c in np.array_split(ends, n_chunks) if len(c)]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [
+            pool.submit(_solve_chunk, values[c[0] - window:c[-1]], window, c, method, cap)
+            for c in chunks
+        ]
+        weights = np.vstack([f.result() for f in futures])
+    return ends, weights
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m modules.optimizer',
+        description='Solve portfolio weights over rolling windows of the volatility panel.',
+    )
+    parser.add_argument('stocks', help='comma-separated stock ids')
+    parser.add_argument('--window', type=int, required=True, help='rows (time_ids) per window')
+    parser.add_argument('--step', type=int, default=1, help='rows between window ends (default: %(default)s)')
+    parser.add_argument('--method', choices=sorted(METHODS), default='min_variance')
+    parser.add_argument('--cap', type=float, default=1.0, help='maximum weight per stock (default: %(default)s)')
+    parser.add_argument('--csv', default=DEFAULT_CSV, help='panel CSV (default: %(default)s)')
+    parser.add_argument('--jobs', type=int, help='worker processes (default: CPU count)')
+    parser.add_argument('--output', help='write the weights CSV here instead of stdout')
+    args = parser.parse_args(argv)
+
+    panel = load_panel(args.csv).frame()
+    stocks = [s.strip() for s in args.stocks.split(',') if s.strip()]
+    missing = [s for s in stocks if s not in panel.columns]
+    if missing:
+        parser.error(f"unknown stock id(s): {', '.join(missing)}")
+    values = panel[stocks].to_numpy(dtype=np.float64)
+    ends, weights = rolling_weights(values, args.window, args.step, args.method, args.cap, args.jobs)
+    out = pd.DataFrame(weights, columns=stocks)
+    out.insert(0, 'time_id', panel['time_id'].to_numpy()[ends - 1])
+    out.to_csv(args.output or sys.stdout, index=False)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
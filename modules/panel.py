@@ -0,0 +1,82 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Storage type of the RV values; float32 halves the panel and everything
+# derived from it cell by cell (sparse tables), VX_PANEL_DTYPE=float64 keeps
+# full precision. Sums over the panel are always accumulated in float64.
+PANEL_DTYPE = np.dtype(os.environ.get('VX_PANEL_DTYPE', 'float32'))
+# Rows copied per step when converting a DataFrame, so the conversion never
+# holds a second full-size float64 copy of the panel
+FRAME_BLOCK_ROWS = 4096
+
+
+# Compact in-memory volatility panel.
+# One C-contiguous (time_id x stock) array of RV with NaN for missing cells,
+# sorted int32 time_ids and integer stock ids mapped to column positions.
+# Time windows and single stocks are returned as views of that array, so a
+# query never copies the panel.
+class Panel:
+    def __init__(self, times, values, stock_ids, columns=None):
+        self.times = times
+        self.values = values
+        self.stock_ids = stock_ids
+        self._columns = columns if columns is not None else {int(s): c for c, s in enumerate(stock_ids)}
+
+    @classmethod
+    def from_frame(cls, df, stock_cols=None, dtype=None):
+        """Panel from a wide frame (time_id plus one column per stock)."""
+        if stock_cols is None:
+            stock_cols = [c for c in df.columns if c != 'time_id']
+        times = df['time_id'].to_numpy()
+        order = None if df['time_id'].is_monotonic_increasing else np.argsort(times, kind='stable')
+        if order is not None:
+            times = times[order]
+        if len(times) and (times[0] < np.iinfo(np.int32).min or times[-1] > np.iinfo(np.int32).max):
+            raise ValueError('time_ids do not fit in int32')
+        values = np.empty((len(times), len(stock_cols)), dtype=dtype or PANEL_DTYPE)
+        for start in range(0, len(times), FRAME_BLOCK_ROWS):
+            rows = slice(start, start + FRAME_BLOCK_ROWS)
+            block = df.iloc[rows] if order is None else df.iloc[order[rows]]
+            values[rows] = block[stock_cols].to_numpy(dtype=np.float64)
+        return cls(times.astype(np.int32), values, np.array([int(c) for c in stock_cols]))
+
+    @property
+    def stock_cols(self):
+        return [str(s) for s in self.stock_ids]
+
+    @property
+    def nbytes(self):
+        return self.times.nbytes + self.values.nbytes + self.stock_ids.nbytes
+
+    def column(self, stock):
+        """Column position of a stock id (int or str)."""
+        try:
+            return self._columns[int(stock)]
+        except (KeyError, ValueError):
+            raise ValueError(f"Unknown stock: {stock}") from None
+
+    def columns(self, stocks):
+        return np.array([self.column(s) for s in stocks], dtype=np.intp)
+
+    def bounds(self, start_time, end_time):
+        """Row positions [lo, hi) covering start_time <= time_id <= end_time."""
+        lo = int(np.searchsorted(self.times, start_time, side='left'))
+        hi = int(np.searchsorted(self.times, end_time, side='right'))
+        return lo, max(lo, hi)
+
+    def window(self, start_time, end_time):
+        """(time_ids, values) views of the rows in a time_id range."""
+        lo, hi = self.bounds(start_time, end_time)
+        return self.times[lo:hi], self.values[lo:hi]
+
+    def stock(self, stock):
+        """(time_ids, rv) views of one stock's series."""
+        return self.times, self.values[:, self.column(stock)]
+
+    def frame(self):
+        """Wide DataFrame (time_id + stock columns) over the values."""
+        df = pd.DataFrame(self.values, columns=self.stock_cols, copy=False)
+        df.insert(0, 'time_id', self.times)
+        return df
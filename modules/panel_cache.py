@@ -0,0 +1,192 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from .panel import PANEL_DTYPE, Panel
+
+# Binary columnar cache of the wide realized volatility panel.
+# The CSV is parsed once into a time-sorted `.npy` matrix in the panel's
+# storage dtype plus an int32 time_id vector and a JSON header; later loads
+# memory-map the matrix as the Panel itself, so startup neither parses text
+# nor copies the values, and pages are only read when touched. A cache
+# written in another dtype counts as missing and is rebuilt.
+CACHE_VERSION = 2
+
+_project_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DEFAULT_CSV = os.path.join(_project_dir, 'data/vol_df.csv')
+
+
+def cache_paths(csv_path):
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(csv_path)), '.cache')
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    return {
+        'dir': cache_dir,
+        'values': os.path.join(cache_dir, f'{stem}.values.npy'),
+        'times': os.path.join(cache_dir, f'{stem}.time_id.npy'),
+        'meta': os.path.join(cache_dir, f'{stem}.meta.json'),
+    }
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _read_meta(paths):
+    try:
+        with open(paths['meta']) as fh:
+            meta = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    if meta.get('version') != CACHE_VERSION or meta.get('dtype') != PANEL_DTYPE.name:
+        return None
+    if not (os.path.exists(paths['values']) and os.path.exists(paths['times'])):
+        return None
+    return meta
+
+
+def _write_atomic(path, write):
+    tmp = f'{path}.tmp{os.getpid()}'
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def _save_npy(path, array):
+    def write(tmp):
+        with open(tmp, 'wb') as fh:
+            np.save(fh, array)
+    _write_atomic(path, write)
+
+
+def _write_meta(paths, meta):
+    def write(tmp):
+        with open(tmp, 'w') as fh:
+            json.dump(meta, fh)
+    _write_atomic(paths['meta'], write)
+
+
+def cache_status(csv_path):
+    """Return 'fresh', 'touched' (mtime changed, same content), 'stale' or 'missing'."""
+    paths = cache_paths(csv_path)
+    meta = _read_meta(paths)
+    if meta is None:
+        return 'missing'
+    if not os.path.exists(csv_path):
+        # Deployments may ship the cache without the source CSV
+        return 'fresh'
+    stat = os.stat(csv_path)
+    if stat.st_mtime_ns == meta['mtime_ns'] and stat.st_size == meta['size']:
+        return 'fresh'
+    if stat.st_size == meta['size'] and file_sha256(csv_path) == meta['sha256']:
+        return 'touched'
+    return 'stale'
+
+
+def build_cache(csv_path):
+    """Parse the CSV once and write the binary cache next to it."""
+    paths = cache_paths(csv_path)
+    os.makedirs(paths['dir'], exist_ok=True)
+    stat = os.stat(csv_path)
+    df = pd.read_csv(csv_path)
+    stock_cols = [c for c in df.columns if c != 'time_id']
+    panel = Panel.from_frame(df, stock_cols)
+    del df
+
+    _save_npy(paths['values'], panel.values)
+    _save_npy(paths['times'], panel.times)
+    _write_meta(paths, {
+        'version': CACHE_VERSION,
+        'source': os.path.abspath(csv_path),
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'sha256': file_sha256(csv_path),
+        'stock_cols': stock_cols,
+        'dtype': PANEL_DTYPE.name,
+        'shape': list(panel.values.shape),
+    })
+    return paths
+
+
+def load_cached(csv_path):
+    """Panel over the read-only memory map of the cached values."""
+    paths = cache_paths(csv_path)
+    meta = _read_meta(paths)
+    values = np.load(paths['values'], mmap_mode='r')
+    times = np.load(paths['times'])
+    return Panel(times, values, np.array([int(c) for c in meta['stock_cols']]))
+
+
+def load_panel(csv_path):
+    """Load the Panel through the binary cache, rebuilding it if stale."""
+    status = cache_status(csv_path)
+    if status == 'touched':
+        paths = cache_paths(csv_path)
+        meta = _read_meta(paths)
+        meta['mtime_ns'] = os.stat(csv_path).st_mtime_ns
+        try:
+            _write_meta(paths, meta)
+        except OSError:
+            # Read-only data directory: the cache is still valid, only the
+            # next start hashes the CSV again
+            pass
+    elif status in ('missing', 'stale'):
+        if not os.path.exists(csv_path):
+            raise FileNotFoundError(csv_path)
+        try:
+            build_cache(csv_path)
+        except OSError:
+            # Read-only data directory: fall back to parsing the CSV
+            return Panel.from_frame(pd.read_csv(csv_path))
+    return load_cached(csv_path)
+
+
+def verify_cache(csv_path):
+    """Check that the cache holds exactly the CSV's panel in the storage dtype."""
+    if cache_status(csv_path) not in ('fresh', 'touched'):
+        return False
+    cached = load_cached(csv_path)
+    source = Panel.from_frame(pd.read_csv(csv_path))
+    return (
+        cached.stock_cols == source.stock_cols
+        and np.array_equal(cached.times, source.times)
+        and np.array_equal(cached.values, source.values, equal_nan=True)
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m modules.panel_cache',
+        description='Build or verify the binary cache of the volatility panel.',
+    )
+    parser.add_argument('command', choices=['build', 'verify', 'status'])
+    parser.add_argument('--csv', default=DEFAULT_CSV, help='source CSV (default: %(default)s)')
+    parser.add_argument('--force', action='store_true', help='rebuild even if the cache is fresh')
+    args = parser.parse_args(argv)
+
+    status = cache_status(args.csv)
+    if args.command == 'status':
+        print(status)
+        return 0
+    if args.command == 'build':
+        if args.force or status in ('missing', 'stale'):
+            paths = build_cache(args.csv)
+            print(f"built {paths['values']}")
+        else:
+            load_panel(args.csv)
+            print(f'cache is {status}, nothing to do')
+        return 0
+    ok = verify_cache(args.csv)
+    print('cache OK' if ok else f'cache invalid ({status})')
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,142 @@
+import hashlib
+import logging
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .range_index import RangeIndex
+
+logger = logging.getLogger(__name__)
+
+
+# Live, append-only view of the realized volatility panel.
+# Wraps the RangeIndex (which owns the time-sorted panel) and bumps `version`
+# whenever rows are ingested, so reactive code can poll one integer to know
+# when every derived result is stale. Ingesting publishes a new index object
+# in one assignment, so readers should take `store.index` once per query.
+class PanelStore:
+    def __init__(self, rv_index):
+        self.index = rv_index
+        self.version = 0
+        self._lock = threading.Lock()
+        self._seen_files = {}
+
+    @property
+    def data_key(self):
+        """Identity of the current rows, stable across restarts on the same data."""
+        if getattr(self, '_data_key', (None,))[0] != self.version:
+            version, index = self.version, self.index
+            digest = hashlib.sha1()
+            digest.update(repr((index.stock_cols, len(index.times))).encode())
+            digest.update(index.times[-1:].tobytes())
+            digest.update(index.csum_c[-1].tobytes())
+            self._data_key = (version, digest.hexdigest()[:16])
+        return self._data_key[1]
+
+    @property
+    def stock_cols(self):
+        return self.index.stock_cols
+
+    @property
+    def times(self):
+        return self.index.times
+
+    @property
+    def min_time(self):
+        return int(self.index.times[0])
+
+    @property
+    def max_time(self):
+        return int(self.index.times[-1])
+
+    @property
+    def panel(self):
+        return self.index.panel
+
+    def series(self, stock):
+        """(time_ids, rv) views for one stock, sorted by time_id."""
+        return self.index.panel.stock(stock)
+
+    def frame(self):
+        """Wide DataFrame (time_id + stock columns) over the current rows."""
+        return self.index.panel.frame()
+
+    def append(self, rows):
+        """Ingest a wide frame of new rows (time_id plus any stock columns).
+
+        Rows already ingested with the same values (a drop file read again
+        after it grew) are skipped. Rows after the current last time_id with
+        known stocks are appended to the index incrementally. New stocks or
+        late/corrected time_ids need a rebuild, which is logged because it
+        costs O(panel). The version only moves when the rows changed.
+        """
+        rows = rows.drop_duplicates('time_id', keep='last').sort_values('time_id')
+        if rows.empty:
+            return self.version
+        rows.columns = [str(c) for c in rows.columns]
+        with self._lock:
+            index = self.index
+            new_stocks = [c for c in rows.columns if c != 'time_id' and c not in index.stock_cols]
+            if not new_stocks:
+                rows = rows[~self._ingested(index, rows)]
+                if rows.empty:
+                    return self.version
+            late = int((rows['time_id'] <= index.times[-1]).sum())
+            if new_stocks or late:
+                logger.warning('rebuilding panel index (new stocks: %s, late rows: %s)', len(new_stocks), late)
+                merged = rows.set_index('time_id').combine_first(index.panel.frame().set_index('time_id'))
+                stock_cols = sorted(merged.columns, key=int)
+                self.index = RangeIndex(merged.reset_index(), stock_cols, dtype=index.values.dtype)
+            else:
+                if not index.__dict__.get('_buffers'):
+                    # The first append copies a shared or mapped index into this process
+                    logger.info('copying panel index into private buffers (%.1f MiB)', index.nbytes / 2**20)
+                values = rows.reindex(columns=index.stock_cols).to_numpy(dtype=np.float64)
+                self.index = index.extended(rows['time_id'].to_numpy(), values)
+            self.version += 1
+        return self.version
+
+    @staticmethod
+    def _ingested(index, rows):
+        """Mask of rows whose time_id is indexed with the same stored values.
+
+        Values are compared in the index's storage dtype; NaN in the rows
+        means no observation, as in the rebuild's combine_first.
+        """
+        times = rows['time_id'].to_numpy()
+        pos = np.minimum(np.searchsorted(index.times, times), len(index.times) - 1)
+        known = index.times[pos] == times
+        if not known.any():
+            return known
+        stock_cols = [c for c in rows.columns if c != 'time_id']
+        incoming = rows.loc[known, stock_cols].to_numpy(dtype=np.float64).astype(index.values.dtype)
+        stored = index.values[pos[known]][:, index.panel.columns(stock_cols)]
+        same = (np.isnan(incoming) | (incoming == stored)).all(axis=1)
+        known[known] = same
+        return known
+
+    def poll_drop_dir(self, path):
+        """Ingest new or changed CSV files in a drop directory; return the version.
+
+        Files are read in name order and left in place, so every worker
+        process watching the same directory ingests the same rows.
+        """
+        try:
+            entries = sorted(os.scandir(path), key=lambda e: e.name)
+        except OSError:
+            return self.version
+        for entry in entries:
+            if not entry.name.endswith('.csv') or not entry.is_file():
+                continue
+            stat = entry.stat()
+            stamp = (stat.st_mtime_ns, stat.st_size)
+            if self._seen_files.get(entry.path) == stamp:
+                continue
+            self._seen_files[entry.path] = stamp
+            try:
+                self.append(pd.read_csv(entry.path))
+            except (OSError, ValueError, KeyError) as exc:
+                logger.error('could not ingest %s: %s', entry.path, exc)
+        return self.version
@@ -0,0 +1,125 @@
+import warnings
+
+import numpy as np
+
+
+def nan_cov(values):
+    """Column covariance of a (time x stock) array, ignoring NaN per pair."""
+    valid = ~np.isnan(values)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        mean = np.nan_to_num(np.nanmean(values, axis=0))
+    centered = np.where(valid, values - mean, 0.0)
+    n_obs = valid.astype(np.float64)
+    pair_counts = n_obs.T @ n_obs
+    return (centered.T @ centered) / np.maximum(pair_counts - 1, 1)
+
+
+# Risk model over the realized volatility panel, built once per data version.
+# `values` is a view of the panel; a portfolio series fills the missing RV of
+# the held columns only and is two matrix-vector products over them.
+# `cov` is the stock-by-stock covariance of RV over time (NaN rows contribute
+# nothing to a pair, the same convention as the RangeIndex sums).
+class RiskModel:
+    def __init__(self, rv_index):
+        values = rv_index.values
+        self.stock_ids = np.asarray(rv_index.stock_ids, dtype=np.int64)
+        self.times = rv_index.times
+        self.values = values
+        self.cov = nan_cov(values)
+        self._by_id = np.argsort(self.stock_ids)
+
+    @property
+    def nbytes(self):
+        # `values` and `times` belong to the panel
+        return self.cov.nbytes + self.stock_ids.nbytes + self._by_id.nbytes
+
+    def positions(self, stock_ids):
+        """Model column of each stock id, -1 where the stock is unknown."""
+        stock_ids = np.asarray(stock_ids, dtype=np.int64)
+        sorted_ids = self.stock_ids[self._by_id]
+        found = np.clip(np.searchsorted(sorted_ids, stock_ids), 0, len(sorted_ids) - 1)
+        return np.where(sorted_ids[found] == stock_ids, self._by_id[found], -1)
+
+    def series(self, weights):
+        """Value-weighted portfolio RV per time_id.
+
+        Weights are renormalized over the holdings that have data at each
+        time_id; rows where no holding has data are NaN.
+        """
+        held = np.flatnonzero(weights)
+        w = weights[held]
+        values = self.values[:, held]
+        valid = ~np.isnan(values)
+        total = np.where(valid, values, 0.0) @ w
+        coverage = valid @ w
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(coverage > 0, total / coverage, np.nan)
+
+
+def with_risk_share(df, risk):
+    """Copy of a holdings frame with each stock's share of wᵀΣw (NaN when
+    the stock is not in the model)."""
+    cols = risk.model.positions(df['stock_id'])
+    share = risk.risk_contributions()
+    return df.assign(risk_share=np.where(cols >= 0, share[cols], np.nan))
+
+
+# Per-session portfolio risk kept in step with a HoldingsStore.
+# Holds the dollar value vector v and Σv (so vᵀΣv is one dot product). A sync only touches the
+# columns of Σ for holdings whose value changed, so adding one holding costs
+# O(n_stocks) instead of the O(n_stocks²) of a full product.
+class PortfolioRisk:
+    # Above this share of changed holdings a full product is cheaper
+    FULL_UPDATE_SHARE = 0.25
+
+    def __init__(self, model):
+        self.model = model
+        n = len(model.stock_ids)
+        self.value = np.zeros(n)
+        self.cov_value = np.zeros(n)
+        self.total = 0.0
+
+    def sync(self, holdings):
+        """Bring v (and Σv) in line with the holdings; returns self."""
+        value = np.zeros_like(self.value)
+        held = np.flatnonzero(holdings.held)
+        cols = self.model.positions(holdings.stock_ids[held])
+        known = cols >= 0
+        value[cols[known]] = (holdings.volume[held] * holdings.price[held])[known]
+        delta = value - self.value
+        changed = np.flatnonzero(delta)
+        if len(changed) > self.FULL_UPDATE_SHARE * len(value):
+            self.cov_value = self.model.cov @ value
+        elif len(changed):
+            self.cov_value += self.model.cov[:, changed] @ delta[changed]
+        self.value = value
+        self.total = float(value.sum())
+        return self
+
+    def weights(self):
+        return self.value / self.total if self.total else self.value
+
+    def variance(self):
+        """Variance of the value-weighted portfolio RV, wᵀΣw."""
+        if not self.total:
+            return np.nan
+        return float(self.value @ self.cov_value) / self.total**2
+
+    def diversification_ratio(self):
+        """Weighted average of stock RV std over the portfolio RV std."""
+        variance = self.variance()
+        if not variance or np.isnan(variance):
+            return np.nan
+        stock_std = np.sqrt(np.clip(np.diag(self.model.cov), 0, None))
+        return float(self.weights() @ stock_std) / np.sqrt(variance)
+
+    def risk_contributions(self):
+        """Share of wᵀΣw due to each stock, w_i (Σw)_i / wᵀΣw."""
+        quad = float(self.value @ self.cov_value)
+        if not quad:
+            return np.zeros_like(self.value)
+        return self.value * self.cov_value / quad
+
+    def series(self):
+        return self.model.series(self.weights())
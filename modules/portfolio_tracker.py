@@ -1,11 +1,21 @@
 import os
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 from shiny import ui, render, reactive
 from faicons import icon_svg
 
-# Load stock list and data from screener
-from .screener import stock_cols, vol_df
+# Live panel and its version from the screener
+from . import client_plots, figures
+from .figure_cache import cached_image
+from .holdings import HoldingsStore, read_book
+from .offload import LatestTask, render_in_process
+from .optimizer import METHODS, suggest
+from .portfolio_risk import PortfolioRisk, RiskModel, with_risk_share
+from .stress import MAX_BLOCK, MAX_HORIZON, MAX_PATHS, STRESS_PERCENTILES, StressRun
+from .screener import (
+    figure_cache, image_data, output_visible, panel_store, panel_version, plot_size, result_cache, stat_tiles
+)
 
 # UI for the portfolio tracker panel
 def ui_portfolio_tracker():
@@ -18,18 +28,41 @@ def ui_portfolio_tracker():
                     ui.h2("Portfolio Builder"),
                     style="display:flex;align-items:center;gap:10px;margin-bottom:1.5rem;"
                 ),
-                ui.input_select("pt_stock", "Stock ID:", choices=[str(s) for s in stock_cols]),
+                ui.input_select("pt_stock", "Stock ID:", choices=list(panel_store.stock_cols)),
                 ui.input_numeric("pt_volume", "Volume:", value=1, min=0),
                 ui.input_numeric("pt_price", "Price per share:", value=1.0, min=0.0, step=0.01),
                 ui.input_action_button("pt_add", "Add to Portfolio"),
                 ui.input_action_button("pt_clear", "Clear Portfolio", class_="btn-danger"),
+                ui.input_file(
+                    "pt_upload", "Import Holdings (CSV/Parquet):",
+                    accept=[".csv", ".parquet"], multiple=False
+                ),
+                ui.tags.hr(),
+                ui.tags.div(
+                    icon_svg("scale-balanced"),
+                    ui.h2("Rebalance"),
+                    style="display:flex;align-items:center;gap:10px;margin:1.5rem 0 1rem 0;"
+                ),
+                ui.input_select("pt_opt_method", "Target:", choices=METHODS, selected='min_variance'),
+                ui.input_numeric("pt_opt_cap", "Max weight per stock:", value=1.0, min=0.01, max=1.0, step=0.05),
+                ui.tags.hr(),
+                ui.tags.div(
+                    icon_svg("bolt"),
+                    ui.h2("Stress Test"),
+                    style="display:flex;align-items:center;gap:10px;margin:1.5rem 0 1rem 0;"
+                ),
+                ui.input_numeric("pt_stress_paths", "Bootstrap paths:", value=20000, min=1000, max=MAX_PATHS, step=1000),
+                ui.input_numeric("pt_stress_horizon", "Horizon (time_ids):", value=50, min=1, max=MAX_HORIZON),
+                ui.input_numeric("pt_stress_block", "Block length:", value=10, min=1, max=MAX_BLOCK),
+                ui.input_numeric("pt_stress_seed", "Seed:", value=42, min=0),
+                ui.input_action_button("pt_stress_run", "Run Stress Test"),
                 ui.tags.hr(),
                 ui.tags.div(
                     icon_svg("chart-line"),
                     ui.h2("Time Series Viewer"),
                     style="display:flex;align-items:center;gap:10px;margin:1.5rem 0 1rem 0;"
                 ),
-                ui.input_select("pt_ts_stock", "Select Stock to Plot:", choices=[str(s) for s in stock_cols]),
+                ui.input_select("pt_ts_stock", "Select Stock to Plot:", choices=list(panel_store.stock_cols)),
                 width=270,
                 position="left",
                 class_="portfolio-sidebar"
@@ -41,7 +74,7 @@ def ui_portfolio_tracker():
                         ui.h2("Portfolio Composition", class_="card-title"),
                         style="display:flex;align-items:center;gap:10px;"
                     ),
-                    ui.output_plot("pt_pie"),
+                    client_plots.plot_output("pt_pie") if client_plots.use_plotly() else ui.output_plot("pt_pie"),
                     class_="portfolio-card"
                 ),
                 ui.tags.div(
@@ -50,13 +83,44 @@ def ui_portfolio_tracker():
                         ui.h2("Volatility Over Time", class_="card-title"),
                         style="display:flex;align-items:center;gap:10px;"
                     ),
-                    ui.output_plot("pt_ts_plot"),
+                    client_plots.plot_output("pt_ts_plot") if client_plots.use_plotly()
+                    else ui.output_image("pt_ts_plot", height="400px"),
                     class_="portfolio-card ts-card"
                 ),
+                ui.tags.div(
+                    ui.tags.div(
+                        icon_svg("shield-halved"),
+                        ui.h2("Portfolio Risk", class_="card-title"),
+                        style="display:flex;align-items:center;gap:10px;"
+                    ),
+                    ui.output_ui("pt_risk"),
+                    class_="portfolio-card"
+                ),
                 ui.tags.div(
                     ui.output_data_frame("pt_table"),
                     class_="portfolio-card"
                 ),
+                ui.tags.div(
+                    ui.tags.div(
+                        icon_svg("bolt"),
+                        ui.h2("Stress Test", class_="card-title"),
+                        style="display:flex;align-items:center;gap:10px;"
+                    ),
+                    ui.output_text("pt_stress_status"),
+                    client_plots.plot_output("pt_stress_plot") if client_plots.use_plotly()
+                    else ui.output_plot("pt_stress_plot"),
+                    ui.output_data_frame("pt_stress_table"),
+                    class_="portfolio-card"
+                ),
+                ui.tags.div(
+                    ui.tags.div(
+                        icon_svg("scale-balanced"),
+                        ui.h2("Suggested Rebalance", class_="card-title"),
+                        style="display:flex;align-items:center;gap:10px;"
+                    ),
+                    ui.output_data_frame("pt_suggest"),
+                    class_="portfolio-card"
+                ),
                 class_="main-content"
             )
         ),
@@ -66,77 +130,289 @@ def ui_portfolio_tracker():
 
 # Server logic for portfolio tracker
 def server_portfolio_tracker(input, output, session):
-    portfolio = reactive.Value([])
+    # Holdings live in a per-session array store; `portfolio` only carries
+    # its version so dependants re-run after each change
+    holdings = HoldingsStore([int(s) for s in panel_store.stock_cols])
+    portfolio = reactive.Value(holdings.version)
+
+    @reactive.Effect
+    def _sync_stocks():
+        panel_version()
+        choices = list(panel_store.stock_cols)
+        with reactive.isolate():
+            ui.update_select("pt_stock", choices=choices, selected=input.pt_stock())
+            ui.update_select("pt_ts_stock", choices=choices, selected=input.pt_ts_stock())
 
     @reactive.Effect
     @reactive.event(input.pt_add)
     def _add_holding():
-        holdings = portfolio()
-        stock = int(input.pt_stock())
-        vol = input.pt_volume()
-        price = input.pt_price()
-        new_holdings = [h.copy() for h in holdings]
-        for h in new_holdings:
-            if h['stock_id'] == stock:
-                h['volume'] += vol
-                h['price'] = price
-                break
-        else:
-            new_holdings.append({'stock_id': stock, 'volume': vol, 'price': price})
-        portfolio.set(new_holdings)
+        holdings.upsert(int(input.pt_stock()), input.pt_volume(), input.pt_price())
+        portfolio.set(holdings.version)
 
     @reactive.Effect
     @reactive.event(input.pt_clear)
     def _clear():
-        portfolio.set([])
+        holdings.clear()
+        portfolio.set(holdings.version)
+
+    @reactive.Effect
+    @reactive.event(input.pt_upload)
+    def _upload():
+        upload = input.pt_upload()
+        if not upload:
+            return
+        try:
+            book = read_book(upload[0]['datapath'], upload[0]['name'])
+        except (ValueError, OSError, ImportError) as exc:
+            ui.notification_show(f"Could not import holdings: {exc}", type="error")
+            return
+        known = book['stock_id'].astype(str).isin(panel_store.stock_cols)
+        if not known.all():
+            ui.notification_show(
+                f"Skipped {int((~known).sum())} row(s) for stocks not in the panel", type="warning"
+            )
+        holdings.load(book[known], replace=True)
+        portfolio.set(holdings.version)
 
     @reactive.Calc
     def df_portfolio():
-        df = pd.DataFrame(portfolio())
-        if df.empty:
-            return df
-        df['value'] = df['volume'] * df['price']
-        df['proportion'] = df['value'] / df['value'].sum()
-        return df
+        portfolio()
+        return holdings.to_frame()
+
+    # Covariance model shared by all sessions for the current panel version;
+    # each session keeps Σv for its own holdings and updates it per change
+    risk_state = {}
+
+    @reactive.Calc
+    def portfolio_risk():
+        panel_version()
+        portfolio()
+        model = result_cache.get_or_compute(
+            ('risk_model',), lambda: RiskModel(panel_store.index), version=panel_store.version
+        )
+        if risk_state.get('model') is not model:
+            risk_state['model'] = model
+            risk_state['risk'] = PortfolioRisk(model)
+        return risk_state['risk'].sync(holdings)
 
     @output
-    @render.plot
-    def pt_pie():
+    @render.ui
+    def pt_risk():
+        risk = portfolio_risk()
+        if not risk.total:
+            return ui.p("Add holdings to see portfolio risk.")
+        rv = risk.series()
+        latest = rv[~np.isnan(rv)][-1:]
+        stats = [
+            ("Latest Portfolio RV", f"{latest[0]:.5f}" if len(latest) else "n/a"),
+            ("Average Portfolio RV", f"{np.nanmean(rv):.5f}"),
+            ("Portfolio RV Std", f"{np.sqrt(max(risk.variance(), 0.0)):.5f}"),
+            ("Diversification Ratio", f"{risk.diversification_ratio():.2f}"),
+        ]
+        return stat_tiles(stats)
+
+    # Rebalance solves run off the event loop. Each result is (frame, error);
+    # the last suggested weights by stock id warm-start the next solve
+    suggest_task = LatestTask(session)
+    last_weights = {}
+
+    @reactive.Effect
+    def _start_suggestion():
+        risk = portfolio_risk()
+        method = input.pt_opt_method()
+        cap = input.pt_opt_cap() or 1.0
         df = df_portfolio()
-        fig, ax = plt.subplots(figsize=(5, 5))
         if df.empty:
-            ax.text(0.5, 0.5, "No holdings", ha='center', va='center')
-        else:
-            ax.pie(df['value'], labels=df['stock_id'].astype(str), autopct='%1.1f%%', startangle=90)
-            ax.set_title('Value Proportion')
-        return fig
+            suggest_task.set_result((None, None))
+            return
+        cols = risk.model.positions(df['stock_id'])
+        known = cols >= 0
+        df, cols = df[known], cols[known]
+        cov = risk.model.cov[np.ix_(cols, cols)]
+        w0 = np.array([last_weights.get(s, 0.0) for s in df['stock_id']])
+
+        def solve():
+            try:
+                return suggest(df, cov, method, cap, w0 if w0.any() else None), None
+            except ValueError as exc:
+                return None, str(exc)
+
+        suggest_task.start(solve)
+
+    @reactive.Effect
+    def _apply_suggestion():
+        df, error = suggest_task.result()
+        if error is not None:
+            ui.notification_show(error, type="warning")
+        elif df is not None:
+            last_weights.clear()
+            last_weights.update(zip(df['stock_id'], df['target_weight']))
 
     @output
-    @render.plot
-    def pt_ts_plot():
-        # Styled area chart of volatility over time for selected stock
-        stock = int(input.pt_ts_stock())
-        ts_df = vol_df[['time_id', str(stock)]].rename(columns={str(stock): 'rv'})
-        ts_df = ts_df.sort_values('time_id')
-        fig, ax = plt.subplots(figsize=(10, 4))
-        # Plot line and fill under curve
-        ax.plot(ts_df['time_id'], ts_df['rv'], color='#1f77b4', linewidth=2)
-        ax.fill_between(ts_df['time_id'], ts_df['rv'], color='#1f77b4', alpha=0.3)
-        # Style axes
-        ax.set_xlabel('Time ID')
-        ax.set_ylabel('Realized Volatility')
-        ax.set_title(f'Stock {stock} Volatility Over Time', fontsize=12, fontweight='bold')
-        ax.grid(axis='y', linestyle='--', alpha=0.5)
-        for spine in ax.spines.values():
-            spine.set_visible(False)
-        # Rotate x labels for readability, show sparse ticks
-        ax.set_xticks(ts_df['time_id'][::len(ts_df)//10 or 1])
-        ax.set_xticklabels(ts_df['time_id'][::len(ts_df)//10 or 1], rotation=45, ha='right')
-        plt.tight_layout()
-        return fig
+    @render.data_frame
+    def pt_suggest():
+        df, _ = suggest_task.result()
+        if df is None:
+            df = pd.DataFrame(columns=['stock_id', 'proportion', 'target_weight', 'target_value', 'volume_change'])
+        return df.rename(columns={'stock_id': 'Stock ID', 'proportion': 'Current Weight', 'target_weight': 'Target Weight',
+                                  'target_value': 'Target Value', 'volume_change': 'Volume Change'})
+
+    # Bootstrap stress runs go to a background thread (and process pool); the
+    # poller below folds finished paths into `stress_result` until it is done
+    stress_run = reactive.Value(None)
+    stress_result = reactive.Value(None)
+
+    @reactive.Effect
+    @reactive.event(input.pt_stress_run)
+    def _start_stress():
+        with reactive.isolate():
+            previous = stress_run.get()
+        if previous is not None:
+            previous.cancel()
+        risk = portfolio_risk()
+        if not risk.total:
+            ui.notification_show("Add holdings before running a stress test.", type="warning")
+            return
+        try:
+            run = StressRun(
+                risk.series(), input.pt_stress_paths(), input.pt_stress_horizon(),
+                input.pt_stress_block(), seed=input.pt_stress_seed() or 0,
+            )
+        except (TypeError, ValueError, MemoryError) as exc:
+            ui.notification_show(f"Could not run the stress test: {exc}", type="error")
+            return
+        stress_result.set(None)
+        stress_run.set(run.start())
+
+    @reactive.Effect
+    def _poll_stress():
+        run = stress_run.get()
+        if run is None:
+            return
+        with reactive.isolate():
+            shown = stress_result.get()
+        # Summaries are computed by the run's thread; this only picks up a new one
+        done = run.done
+        snapshot = run.snapshot()
+        if snapshot is not None and snapshot is not shown:
+            stress_result.set(snapshot)
+        if run.error is not None:
+            ui.notification_show(f"Stress test failed: {run.error}", type="error")
+        elif not done or snapshot is not shown:
+            reactive.invalidate_later(0.25)
+
+    def _cancel_stress():
+        with reactive.isolate():
+            run = stress_run.get()
+        if run is not None:
+            run.cancel()
+
+    session.on_ended(_cancel_stress)
+
+    @output
+    @render.text
+    def pt_stress_status():
+        run, result = stress_run.get(), stress_result.get()
+        if run is None:
+            return "Run a stress test to see bootstrapped volatility bands."
+        done = result['paths'] if result else 0
+        state = "done" if run.done and done == run.n_paths else "running"
+        return f"{done:,} of {run.n_paths:,} paths ({state})"
+
+    if client_plots.use_plotly():
+        @reactive.Effect
+        async def _send_stress():
+            result = stress_result.get()
+            if result is not None:
+                await client_plots.send(
+                    session, client_plots.fan_message('pt_stress_plot', result['bands'], STRESS_PERCENTILES)
+                )
+    else:
+        @output
+        @render.plot
+        def pt_stress_plot():
+            result = stress_result.get()
+            if result is None:
+                return None
+            return figures.draw_fan(plt.figure(), result['bands'], STRESS_PERCENTILES)
+
+    @output
+    @render.data_frame
+    def pt_stress_table():
+        result = stress_result.get()
+        tail = result['tail'] if result else {}
+        return pd.DataFrame({'Metric': list(tail), 'Value': list(tail.values())})
+
+    @reactive.Calc
+    def ts_data():
+        # (time_ids, rv) views into the panel, no per-stock copy
+        panel_version()
+        return panel_store.series(int(input.pt_ts_stock()))
+
+    if client_plots.use_plotly():
+        # Browser-drawn charts: send the numbers, plotly.js does the rest
+        @reactive.Effect
+        async def _send_pie():
+            df = df_portfolio()
+            if df.empty:
+                await client_plots.send(session, client_plots.pie_message('pt_pie', [], []))
+            else:
+                await client_plots.send(
+                    session, client_plots.pie_message('pt_pie', df['stock_id'], df['value'])
+                )
+
+        @reactive.Effect
+        async def _send_ts():
+            stock = int(input.pt_ts_stock())
+            times, rv = ts_data()
+            await client_plots.send(session, client_plots.ts_message('pt_ts_plot', times, rv, stock))
+    else:
+        @output
+        @render.plot
+        def pt_pie():
+            df = df_portfolio()
+            fig, ax = plt.subplots(figsize=(5, 5))
+            if df.empty:
+                ax.text(0.5, 0.5, "No holdings", ha='center', va='center')
+            else:
+                ax.pie(df['value'], labels=df['stock_id'].astype(str), autopct='%1.1f%%', startangle=90)
+                ax.set_title('Value Proportion')
+            return fig
+
+        # Rendered off the event loop; picking another stock drops a
+        # render that has not started yet
+        ts_plot_task = LatestTask(session)
+
+        @reactive.Effect
+        def _start_ts_plot():
+            if not output_visible(session, 'pt_ts_plot'):
+                return
+            stock = int(input.pt_ts_stock())
+            times, rv = ts_data()
+            width, height, pixelratio = plot_size(session, 'pt_ts_plot')
+            version = panel_store.data_key
+            cache_key = ('ts', stock, width, height, pixelratio)
+            src = figure_cache.get(cache_key, version, subject=stock)
+            if src is not None:
+                ts_plot_task.set_result((src, stock))
+                return
+            ts_plot_task.start(lambda: (figure_cache.get_or_render(
+                cache_key,
+                lambda: render_in_process(figures.ts_png, times, rv, stock, width, height, pixelratio),
+                version=version,
+                subject=stock,
+            ), stock))
+
+        @output
+        @cached_image
+        def pt_ts_plot():
+            # Styled area chart of volatility over time for selected stock,
+            # rendered once per stock and size and then served from the cache
+            src, stock = ts_plot_task.result()
+            return image_data(src, f'Stock {stock} Volatility Over Time')
 
     @output
     @render.data_frame
     def pt_table():
-        df = df_portfolio()
-        return df.rename(columns={'stock_id': 'Stock ID', 'volume': 'Volume', 'price': 'Price', 'value': 'Value', 'proportion': 'Proportion'})
+        df = with_risk_share(df_portfolio(), portfolio_risk())
+        return df.rename(columns={'stock_id': 'Stock ID', 'volume': 'Volume', 'price': 'Price', 'value': 'Value', 'proportion': 'Proportion', 'risk_share': 'Risk Share'})
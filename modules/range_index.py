@@ -0,0 +1,407 @@
+import copy
+import uuid
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from .panel import Panel
+
+# Rows per block of the block max/min tables and of the quantile sketch
+BLOCK_ROWS = 256
+# Equal-count value buckets per stock in the quantile sketch; bucket numbers
+# fit a uint8 with MISSING marking NaN cells
+SKETCH_BUCKETS = 255
+MISSING = 255
+# Stocks whose bucket edges are computed together (bounds the sort buffers)
+SKETCH_COLUMNS = 64
+
+
+# Range-query index over the wide realized volatility panel.
+# Built once on the time-sorted panel so that any [start, end] time_id window
+# can be aggregated per stock from precomputed structures instead of a rescan:
+#   - prefix counts and centred sums / sums of squares for mean and std
+#   - max/min per block of BLOCK_ROWS rows with sparse tables over the blocks,
+#     so a range max is O(1) over whole blocks plus a scan of the ragged ends
+#   - block-level cumulative bucket counts as an approximate quantile sketch
+# The values, time_ids and stock ids are those of a compact Panel (float32
+# by default); the prefix sums are float64 whatever the panel's dtype.
+# An index is never changed once published: extended() returns a new one, so
+# a reader holding an index sees one consistent set of rows. `build_id` is
+# shared by an index and everything extended from it.
+class RangeIndex:
+    def __init__(self, panel, stock_cols, dtype=None):
+        if not isinstance(panel, Panel):
+            panel = Panel.from_frame(panel, stock_cols, dtype)
+        self._panel = panel
+        self.build_id = uuid.uuid4().hex
+        self.stock_cols = list(stock_cols)
+        self.stock_ids = panel.stock_ids
+        self.times = panel.times
+        values = panel.values
+        self.values = values
+
+        # NaN-aware cumulative counts and sums, with a leading zero row so that
+        # the window [lo, hi) is simply row hi minus row lo. Sums are taken
+        # around each stock's overall mean so the variance subtraction does
+        # not lose precision on small RV values.
+        valid = ~np.isnan(values)
+        n_stocks = len(self.stock_cols)
+        self.ccount = np.zeros((len(values) + 1, n_stocks), dtype=np.int32)
+        np.cumsum(valid, axis=0, dtype=np.int32, out=self.ccount[1:])
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            self.shift = np.nan_to_num(np.nanmean(values, axis=0, dtype=np.float64))
+        centered = np.where(valid, values - self.shift, 0.0)
+        self.csum_c = np.zeros((len(values) + 1, n_stocks))
+        self.csum_sq = np.zeros_like(self.csum_c)
+        np.cumsum(centered, axis=0, out=self.csum_c[1:])
+        np.cumsum(centered * centered, axis=0, out=self.csum_sq[1:])
+        del centered, valid
+
+        self._build_block_tables(values)
+        self._build_sketch(values)
+
+    def _build_block_tables(self, values):
+        # Level k holds the max/min of every run of 2**k blocks; NaN where a
+        # run has no data (fmax/fmin skip NaN)
+        n_blocks = len(values) // BLOCK_ROWS
+        blocks = values[:n_blocks * BLOCK_ROWS].reshape(n_blocks, BLOCK_ROWS, values.shape[1])
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            self.max_table = [np.fmax.reduce(blocks, axis=1)]
+            self.min_table = [np.fmin.reduce(blocks, axis=1)]
+        width = 1
+        while 2 * width <= n_blocks:
+            prev_max, prev_min = self.max_table[-1], self.min_table[-1]
+            self.max_table.append(np.fmax(prev_max[:-width], prev_max[width:]))
+            self.min_table.append(np.fmin(prev_min[:-width], prev_min[width:]))
+            width *= 2
+
+    def _build_sketch(self, values):
+        # Each stock's values over the whole panel are split into
+        # SKETCH_BUCKETS equal-count buckets; edges[s, k] is the smallest value
+        # of bucket k and edges[s, -1] the stock's maximum
+        n_rows, n_stocks = values.shape
+        self.edges = np.zeros((n_stocks, SKETCH_BUCKETS + 1))
+        self.buckets = np.empty((n_rows, n_stocks), dtype=np.uint8)
+        has_data = np.zeros(n_stocks, dtype=bool)
+        largest = 0
+        for start in range(0, n_stocks, SKETCH_COLUMNS):
+            cols = slice(start, start + SKETCH_COLUMNS)
+            # One contiguous row per stock; NaN sorts last
+            block = np.ascontiguousarray(values[:, cols].T)
+            count = (~np.isnan(block)).sum(axis=1)[:, None]
+            if n_rows:
+                first = -(-np.arange(SKETCH_BUCKETS + 1) * count // SKETCH_BUCKETS)
+                first = np.clip(np.minimum(first, count - 1), 0, None)
+                self.edges[cols] = np.take_along_axis(np.sort(block, axis=1), first, axis=1)
+            has_data[cols] = count[:, 0] > 0
+            bucket = np.empty(block.shape, dtype=np.uint8)
+            for i, row in enumerate(block):
+                bucket[i] = self._bucket(start + i, row)
+                if has_data[start + i]:
+                    largest = max(largest, np.bincount(bucket[i], minlength=MISSING + 1)[:MISSING].max())
+            self.buckets[:, cols] = bucket.T
+        # Stocks without data get typical edges, for rows appended later
+        if not has_data.all():
+            self.edges[~has_data] = np.median(self.edges[has_data], axis=0) if has_data.any() else 0.0
+
+        # Cumulative counts stay below rows / SKETCH_BUCKETS per bucket unless
+        # a stock repeats one value many times; leave room for appends
+        n_blocks = n_rows // BLOCK_ROWS
+        dtype = np.uint16 if largest <= np.iinfo(np.uint16).max // 2 else np.uint32
+        self.block_hist = np.zeros((n_blocks + 1, n_stocks, SKETCH_BUCKETS), dtype=dtype)
+        for b in range(n_blocks):
+            rows = slice(b * BLOCK_ROWS, (b + 1) * BLOCK_ROWS)
+            self.block_hist[b + 1] = self.block_hist[b] + self._histogram(rows)
+
+    def _bucket(self, col, values):
+        """Sketch bucket of each value of one stock, MISSING for NaN."""
+        bucket = np.clip(np.searchsorted(self.edges[col], values, side='right') - 1, 0, SKETCH_BUCKETS - 1)
+        return np.where(np.isnan(values), MISSING, bucket).astype(np.uint8)
+
+    @property
+    def panel(self):
+        """The indexed rows as a Panel (views of this index's arrays)."""
+        panel = self.__dict__.get('_panel')
+        if panel is None or panel.values is not self.values or panel.times is not self.times:
+            # Appends replace the arrays; the stock-to-column map still holds
+            self._panel = Panel(self.times, self.values, self.stock_ids, panel._columns if panel else None)
+        return self._panel
+
+    @property
+    def nbytes(self):
+        """Bytes held by the panel and every structure built on it."""
+        arrays, _ = self.export_state()
+        return sum(arr.nbytes for arr in arrays.values())
+
+    def column(self, stock):
+        return self.panel.column(stock)
+
+    def export_state(self):
+        """Split the index into plain arrays and JSON metadata for sharing."""
+        arrays, meta = {}, {}
+        for key, value in vars(self).items():
+            if key.startswith('_'):
+                continue
+            if isinstance(value, np.ndarray):
+                arrays[key] = value
+            elif isinstance(value, list) and value and isinstance(value[0], np.ndarray):
+                meta[key] = {'levels': len(value)}
+                for level, arr in enumerate(value):
+                    arrays[f'{key}.{level}'] = arr
+            else:
+                meta[key] = value
+        return arrays, meta
+
+    @classmethod
+    def from_state(cls, arrays, meta):
+        """Rebuild an index around arrays from export_state() without copying."""
+        index = cls.__new__(cls)
+        for key, value in meta.items():
+            if isinstance(value, dict) and 'levels' in value:
+                value = [arrays[f'{key}.{level}'] for level in range(value['levels'])]
+            setattr(index, key, value)
+        for key, arr in arrays.items():
+            if '.' not in key:
+                setattr(index, key, arr)
+        return index
+
+    def extended(self, times, values):
+        """A new index with rows appended after the last indexed time_id.
+
+        Every structure is extended from its last row (capacity doubling), so
+        appending k rows costs O(k) per stock plus the blocks they complete,
+        rather than a rebuild. The new index writes past the end of this one's
+        arrays in shared buffers, which this one never reads, and takes over
+        the buffers. Sketch bucket edges are kept from the initial build;
+        values beyond them count in the end buckets.
+        """
+        index = copy.copy(self)
+        index.max_table = list(self.max_table)
+        index.min_table = list(self.min_table)
+        index._buffers = self.__dict__.pop('_buffers', {})
+        index._extend(times, values)
+        return index
+
+    def _extend(self, times, values):
+        times = np.asarray(times)
+        values = np.asarray(values, dtype=self.values.dtype)
+        if len(times) == 0:
+            return
+        if len(self.times) and times[0] <= self.times[-1] or np.any(np.diff(times) <= 0):
+            raise ValueError('appended time_ids must be increasing and after the indexed range')
+        if times[-1] > np.iinfo(self.times.dtype).max:
+            raise ValueError(f'time_ids do not fit in {self.times.dtype}')
+        old_rows = len(self.times)
+        valid = ~np.isnan(values)
+        centered = np.where(valid, values - self.shift, 0.0)
+
+        self._append('times', times)
+        self._append('values', values)
+        self._append('ccount', self.ccount[-1] + np.cumsum(valid, axis=0, dtype=np.int32))
+        self._append('csum_c', self.csum_c[-1] + np.cumsum(centered, axis=0))
+        self._append('csum_sq', self.csum_sq[-1] + np.cumsum(centered * centered, axis=0))
+
+        buckets = np.empty(values.shape, dtype=np.uint8)
+        for col in range(values.shape[1]):
+            buckets[:, col] = self._bucket(col, values[:, col])
+        self._append('buckets', buckets)
+
+        # Blocks completed by the new rows: their max/min and bucket counts
+        new_blocks = range(old_rows // BLOCK_ROWS, len(self.times) // BLOCK_ROWS)
+        if not new_blocks:
+            return
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            block_rows = self.values[new_blocks.start * BLOCK_ROWS:new_blocks.stop * BLOCK_ROWS]
+            block_rows = block_rows.reshape(len(new_blocks), BLOCK_ROWS, values.shape[1])
+            self._append('max_table.0', np.fmax.reduce(block_rows, axis=1))
+            self._append('min_table.0', np.fmin.reduce(block_rows, axis=1))
+        for b in new_blocks:
+            rows = slice(b * BLOCK_ROWS, (b + 1) * BLOCK_ROWS)
+            hist = self.block_hist[b] + self._histogram(rows)
+            if hist.max() > np.iinfo(self.block_hist.dtype).max:
+                self.block_hist = self.block_hist.astype(np.uint32)
+                self.__dict__.get('_buffers', {}).pop('block_hist', None)
+            self._append('block_hist', hist[None])
+
+        # Sparse tables over the blocks: each level gains the runs that now
+        # fit, and a new level appears at each power of two
+        for key, combine in (('max_table', np.fmax), ('min_table', np.fmin)):
+            table = getattr(self, key)
+            width, level = 1, 1
+            while 2 * width <= len(table[0]):
+                prev = table[level - 1]
+                start = len(table[level]) if level < len(table) else 0
+                stop = len(prev) - width
+                new = combine(prev[start:stop], prev[start + width:stop + width])
+                if level < len(table):
+                    self._append(f'{key}.{level}', new)
+                else:
+                    table.append(new)
+                width *= 2
+                level += 1
+
+    def _append(self, name, rows):
+        # Arrays are views over a private buffer with spare capacity; arrays
+        # without one (fresh builds, shared memory, memory maps) get one on
+        # first append, which copies them out of any shared segment.
+        # Sparse table levels are addressed as e.g. 'max_table.3'.
+        key, _, level = name.partition('.')
+        current = getattr(self, key)[int(level)] if level else getattr(self, key)
+        buffers = self.__dict__.setdefault('_buffers', {})
+        buf = buffers.get(name)
+        used, need = len(current), len(current) + len(rows)
+        if buf is None or buf.shape[0] < need:
+            buf = np.empty((max(need, 2 * used, 16),) + current.shape[1:], dtype=current.dtype)
+            buf[:used] = current
+            buffers[name] = buf
+        buf[used:need] = rows
+        if level:
+            getattr(self, key)[int(level)] = buf[:need]
+        else:
+            setattr(self, key, buf[:need])
+
+    def bounds(self, start_time, end_time):
+        """Row positions [lo, hi) covering start_time <= time_id <= end_time."""
+        lo = int(np.searchsorted(self.times, start_time, side='left'))
+        hi = int(np.searchsorted(self.times, end_time, side='right'))
+        return lo, max(lo, hi)
+
+    def mean(self, start_time, end_time):
+        lo, hi = self.bounds(start_time, end_time)
+        total = self.csum_c[hi] - self.csum_c[lo]
+        count = self.ccount[hi] - self.ccount[lo]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(count > 0, total / np.maximum(count, 1) + self.shift, np.nan)
+
+    def max(self, start_time, end_time):
+        return self._extreme(self.max_table, np.fmax, start_time, end_time)
+
+    def min(self, start_time, end_time):
+        return self._extreme(self.min_table, np.fmin, start_time, end_time)
+
+    def _extreme(self, table, combine, start_time, end_time):
+        # Whole blocks from the sparse table (two overlapping runs), the
+        # ragged ends (under a block each) scanned directly
+        lo, hi = self.bounds(start_time, end_time)
+        result = np.full(len(self.stock_cols), np.nan)
+        first = -(-lo // BLOCK_ROWS)
+        last = hi // BLOCK_ROWS
+        if first < last:
+            level = (last - first).bit_length() - 1
+            result = combine(table[level][first], table[level][last - (1 << level)]).astype(np.float64)
+            ragged = (slice(lo, first * BLOCK_ROWS), slice(last * BLOCK_ROWS, hi))
+        else:
+            ragged = (slice(lo, hi),)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            for rows in ragged:
+                if rows.stop > rows.start:
+                    result = combine(result, combine.reduce(self.values[rows], axis=0))
+        return result
+
+    def std(self, start_time, end_time, ddof=1):
+        lo, hi = self.bounds(start_time, end_time)
+        count = self.ccount[hi] - self.ccount[lo]
+        total = self.csum_c[hi] - self.csum_c[lo]
+        total_sq = self.csum_sq[hi] - self.csum_sq[lo]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            var = (total_sq - total * total / count) / (count - ddof)
+        var = np.where(count > ddof, np.maximum(var, 0.0), np.nan)
+        return np.sqrt(var)
+
+    def quantile(self, q, start_time, end_time, exact=True):
+        """Per-stock q-quantile (linear interpolation, NaNs skipped).
+
+        Exact quantiles select over the window's rows, O(window) per stock.
+        The approximate ones come from the sketch in O(SKETCH_BUCKETS) per
+        stock whatever the window: bucket counts in the window are exact, so
+        the result lies in the bucket holding the exact quantile and is off
+        by at most that bucket's width, 1/SKETCH_BUCKETS of the stock's
+        values over the whole panel (its next bucket too when the exact
+        quantile interpolates across a bucket boundary).
+        """
+        lo, hi = self.bounds(start_time, end_time)
+        # Windows shorter than two sketch blocks are cheaper to select exactly
+        if exact or hi - lo < 2 * BLOCK_ROWS:
+            # Selection over the contiguous window slice, no copy of the panel
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                if hi == lo:
+                    return np.full(len(self.stock_cols), np.nan)
+                return np.nanquantile(self.values[lo:hi], q, axis=0).astype(np.float64)
+        return self._sketch_quantile(q, lo, hi)
+
+    def median(self, start_time, end_time, exact=True):
+        return self.quantile(0.5, start_time, end_time, exact=exact)
+
+    def _histogram(self, rows):
+        buckets = self.buckets[rows]
+        n_stocks = buckets.shape[1]
+        keep = buckets != MISSING
+        flat = (buckets.astype(np.intp) + np.arange(n_stocks) * SKETCH_BUCKETS)[keep]
+        return np.bincount(flat, minlength=n_stocks * SKETCH_BUCKETS).reshape(n_stocks, SKETCH_BUCKETS)
+
+    def _sketch_quantile(self, q, lo, hi):
+        # Whole blocks come from the cumulative counts, the ragged edges
+        # (less than a block each) are counted directly
+        first = -(-lo // BLOCK_ROWS)
+        last = hi // BLOCK_ROWS
+        hist = self.block_hist[last].astype(np.int64) - self.block_hist[first]
+        hist += self._histogram(slice(lo, first * BLOCK_ROWS))
+        hist += self._histogram(slice(last * BLOCK_ROWS, hi))
+
+        count = hist.sum(axis=1)
+        cum = np.cumsum(hist, axis=1)
+        rank = q * np.maximum(count - 1, 0)
+        bucket = np.minimum((cum <= rank[:, None]).sum(axis=1), SKETCH_BUCKETS - 1)
+        rows = np.arange(len(count))
+        below = cum[rows, bucket] - hist[rows, bucket]
+        frac = (rank - below + 0.5) / np.maximum(hist[rows, bucket], 1)
+        left, right = self.edges[rows, bucket], self.edges[rows, bucket + 1]
+        result = left + np.clip(frac, 0.0, 1.0) * (right - left)
+        return np.where(count > 0, result, np.nan)
+
+    def metric(self, name, start_time, end_time, exact=True):
+        if name == 'mean':
+            return self.mean(start_time, end_time)
+        if name == 'max':
+            return self.max(start_time, end_time)
+        if name == 'min':
+            return self.min(start_time, end_time)
+        if name == 'std':
+            return self.std(start_time, end_time)
+        if name == 'median':
+            return self.median(start_time, end_time, exact=exact)
+        if name.startswith('p'):
+            return self.quantile(int(name[1:]) / 100, start_time, end_time, exact=exact)
+        raise ValueError(f"Unknown screener metric: {name}")
+
+    def top_n(self, scores, n, mask=None):
+        """Positions of the n highest scores, descending, NaN scores last.
+
+        With a boolean mask only the stocks where it is True are ranked.
+        """
+        candidates = np.arange(len(scores)) if mask is None else np.flatnonzero(mask)
+        n = min(max(int(n), 0), len(candidates))
+        if n == 0:
+            return np.empty(0, dtype=np.intp)
+        keyed = scores[candidates]
+        keyed = np.where(np.isnan(keyed), -np.inf, keyed)
+        if n < len(keyed):
+            # Partial selection first, then only the selected n are sorted
+            picked = np.argpartition(-keyed, n - 1)[:n]
+        else:
+            picked = np.arange(len(keyed))
+        order = np.lexsort((self.stock_ids[candidates[picked]], -keyed[picked]))
+        return candidates[picked[order]]
+
+    def top_frame(self, scores, n, column, mask=None):
+        picked = self.top_n(scores, n, mask)
+        return pd.DataFrame({
+            'stock_id': self.stock_ids[picked],
+            column: scores[picked],
+        })
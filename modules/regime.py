@@ -0,0 +1,107 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Volatility spike and regime-shift events for every stock and time_id.
+# Each RV value is standardized against the stock's trailing baseline (the
+# previous BASELINE_ROWS time_ids, from the RangeIndex prefix sums):
+#   - a spike is a standardized value above SPIKE_Z
+#   - an up/down shift is a two-sided CUSUM of the standardized values
+#     crossing CUSUM_H, with drift allowance CUSUM_K
+# The CUSUM without resets is S_t - min(0, min_{u<=t} S_u) for S the running
+# sum of (z - k), so whole blocks of rows are scanned with cumsum and
+# minimum.accumulate across all stocks at once. Events are kept as prefix
+# counts per time_id, so the events inside any window are a subtraction.
+BASELINE_ROWS = 100
+MIN_BASELINE_ROWS = 20
+SPIKE_Z = 3.0
+CUSUM_K = 0.5
+CUSUM_H = 8.0
+EVENT_TYPES = ('spike', 'up', 'down')
+
+
+class RegimeScanner:
+    def __init__(self):
+        self.index = None
+        self.n_rows = 0
+        self._lock = threading.Lock()
+
+    def sync(self, rv_index):
+        """Scan rows added to rv_index since the last call (all rows for a new index).
+
+        An index extended from the scanned one shares its build_id and its
+        first rows, so only the appended rows are scanned.
+        """
+        with self._lock:
+            n = len(rv_index.values)
+            if getattr(self.index, 'build_id', None) != rv_index.build_id or n < self.n_rows:
+                self._reset(rv_index)
+            self.index = rv_index
+            if n > self.n_rows:
+                self._scan(self.n_rows, n)
+        return self
+
+    def _reset(self, rv_index):
+        n_stocks = len(rv_index.stock_cols)
+        self.index = rv_index
+        self.n_rows = 0
+        self.counts = {kind: np.zeros((1, n_stocks), dtype=np.int32) for kind in EVENT_TYPES}
+        self.last_event = np.empty((0, n_stocks), dtype=np.int32)
+        # CUSUM state per direction: running sum, its running minimum (with
+        # the zero start) and the last statistic value
+        self.state = {kind: [np.zeros(n_stocks), np.zeros(n_stocks), np.zeros(n_stocks)] for kind in ('up', 'down')}
+
+    def _standardized(self, start, end):
+        index = self.index
+        rows = np.arange(start, end)
+        lo = np.maximum(rows - BASELINE_ROWS, 0)
+        count = index.ccount[rows] - index.ccount[lo]
+        total = index.csum_c[rows] - index.csum_c[lo]
+        total_sq = index.csum_sq[rows] - index.csum_sq[lo]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = total / count
+            std = np.sqrt(np.maximum((total_sq - total * mean) / (count - 1), 0.0))
+            z = (index.values[start:end] - index.shift - mean) / std
+        return np.where((count >= MIN_BASELINE_ROWS) & (std > 0) & ~np.isnan(z), z, np.nan)
+
+    def _scan(self, start, end):
+        z = self._standardized(start, end)
+        scored = ~np.isnan(z)
+        events = {'spike': scored & (z > SPIKE_Z)}
+        for kind, sign in (('up', 1.0), ('down', -1.0)):
+            total, low, last = self.state[kind]
+            s = total + np.cumsum(np.where(scored, sign * z - CUSUM_K, 0.0), axis=0)
+            running_min = np.minimum(low, np.minimum.accumulate(s, axis=0))
+            stat = s - running_min
+            previous = np.vstack([last[None], stat[:-1]])
+            events[kind] = (stat > CUSUM_H) & (previous <= CUSUM_H)
+            self.state[kind] = [s[-1], running_min[-1], stat[-1]]
+
+        for kind in EVENT_TYPES:
+            counts = self.counts[kind][-1] + np.cumsum(events[kind], axis=0, dtype=np.int32)
+            self.counts[kind] = np.concatenate([self.counts[kind], counts])
+        any_event = events['spike'] | events['up'] | events['down']
+        rows = np.where(any_event, np.arange(start, end)[:, None], -1).astype(np.int32)
+        previous_last = self.last_event[-1] if len(self.last_event) else np.full(rows.shape[1], -1, np.int32)
+        last = np.maximum.accumulate(np.vstack([previous_last[None], rows]), axis=0)[1:]
+        self.last_event = np.concatenate([self.last_event, last])
+        self.n_rows = end
+
+    def events(self, lo, hi):
+        """Per-stock event counts over rows [lo, hi) for stocks with any event."""
+        with self._lock:
+            hi = min(hi, self.n_rows)
+            lo = min(lo, hi)
+            counts = {kind: self.counts[kind][hi] - self.counts[kind][lo] for kind in EVENT_TYPES}
+            last = self.last_event[hi - 1] if hi > 0 else np.full(len(self.index.stock_cols), -1)
+            index = self.index
+        flagged = (counts['spike'] + counts['up'] + counts['down']) > 0
+        last = last[flagged]
+        return pd.DataFrame({
+            'stock_id': index.stock_ids[flagged],
+            'spikes': counts['spike'][flagged],
+            'up_shifts': counts['up'][flagged],
+            'down_shifts': counts['down'][flagged],
+            'last_event': np.where(last >= lo, index.times[np.maximum(last, 0)], -1),
+        }).sort_values(['up_shifts', 'spikes', 'down_shifts'], ascending=False, kind='stable')
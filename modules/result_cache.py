@@ -0,0 +1,108 @@
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def sizeof(value):
+    """Approximate bytes held by a cached result.
+
+    Frames count their columns, arrays and index structures their own
+    `nbytes` (views of the panel are not theirs), tuples their items.
+    """
+    if isinstance(value, (tuple, list)):
+        return sum(sizeof(item) for item in value)
+    usage = getattr(value, 'memory_usage', None)
+    if usage is not None:
+        return int(np.sum(usage(deep=True)))
+    nbytes = getattr(value, 'nbytes', None)
+    if nbytes is not None:
+        return int(nbytes)
+    return sys.getsizeof(value)
+
+
+# Process-wide LRU cache shared by every session in a worker.
+# Entries belong to one data version; asking with a newer version drops them
+# all, so a live ingest can never serve a result computed on older rows. A
+# late call with an older version is computed but neither served from nor
+# stored in the cache. Memory is bounded by the total sizeof() of the
+# entries, since a cached frame and a cached prefix index differ by orders of
+# magnitude.
+class LRUCache:
+    def __init__(self, max_bytes=256 * 2**20):
+        self.max_bytes = max_bytes
+        self.version = None
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version=None, default=None):
+        """The cached value for key, else default.
+
+        A miss is not counted; the get_or_compute() that follows counts it.
+        """
+        with self._lock:
+            self._check_version(version)
+            if version != self.version or key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0]
+
+    def get_or_compute(self, key, compute, version=None):
+        with self._lock:
+            self._check_version(version)
+            if version == self.version and key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+        # Computed outside the lock; two sessions racing on the same key
+        # both compute, which is cheaper than serialising all misses
+        value = compute()
+        self.put(key, value, version)
+        return value
+
+    def put(self, key, value, version=None):
+        size = sizeof(value)
+        with self._lock:
+            if version != self.version or size > self.max_bytes:
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old[1]
+            self._entries[key] = (value, size)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.nbytes -= evicted
+                self.evictions += 1
+
+    def _check_version(self, version):
+        if version is not None and (self.version is None or version > self.version):
+            self._entries.clear()
+            self.nbytes = 0
+            self.version = version
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.nbytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / total if total else 0.0,
+                'version': self.version,
+            }
@@ -0,0 +1,45 @@
+from . import figures
+from .screen_expr import SCREEN_FIELDS
+
+# Screener computations, shared by the reactive code in modules/screener.py
+# and the benchmark suite so both time the same work.
+
+# Ranking metrics offered by the screener and their table column labels
+METRICS = {
+    'mean': 'Avg Realized Volatility',
+    'max': 'Peak Realized Volatility',
+    'min': 'Min Realized Volatility',
+    'std': 'Realized Volatility Std',
+    'median': 'Median Realized Volatility',
+    'p90': '90th Pct Realized Volatility',
+    'p95': '95th Pct Realized Volatility',
+}
+QUANTILE_METRICS = ('median', 'p90', 'p95')
+
+
+def screen_frame(index, metric, start_time, end_time, top_n, exact=True, screen=None):
+    """Top N stocks by a window metric, among those passing the screen.
+
+    Returns a frame of stock_id and the metric under its METRICS label.
+    Only the metrics the screen names are computed.
+    """
+    scores = index.metric(metric, start_time, end_time, exact=exact)
+    mask = None
+    if screen is not None:
+        fields = {}
+        for name in screen.fields:
+            field = SCREEN_FIELDS[name]
+            if field is None:
+                fields[name] = index.stock_ids
+            elif field == metric:
+                fields[name] = scores
+            else:
+                fields[name] = index.metric(field, start_time, end_time, exact=exact)
+        mask = screen.mask(fields, len(scores))
+    return index.top_frame(scores, top_n, METRICS[metric], mask)
+
+
+def screen_png(df, width, height, pixelratio=1):
+    """PNG of a screen_frame() result, labelled with its metric."""
+    label = df.columns[1]
+    return figures.top_n_png(df['stock_id'], df[label], label, width, height, pixelratio)
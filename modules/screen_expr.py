@@ -0,0 +1,341 @@
+import functools
+import operator
+import re
+
+import numpy as np
+
+# Screening expressions over per-stock window metrics, e.g.
+#   mean_rv > 0.004 and max_rv < 0.05 and stock_id in {1, 5, 9}
+# An expression is tokenized and parsed once into a small tree, checked
+# (known names, booleans where booleans belong) and compiled into nested
+# closures over whole arrays, so evaluating it is a handful of NumPy
+# operations on the n_stocks metric vectors. Compiled filters are cached by
+# their text.
+#
+# Grammar, loosest binding first:
+#   or_expr    := and_expr ('or' and_expr)*
+#   and_expr   := not_expr ('and' not_expr)*
+#   not_expr   := 'not' not_expr | comparison
+#   comparison := sum (CMP sum)* | sum ['not'] 'in' '{' [NUMBER (',' NUMBER)*] '}'
+#   sum        := product (('+' | '-') product)*
+#   product    := unary (('*' | '/') unary)*
+#   unary      := '-' unary | NUMBER | NAME | '(' or_expr ')'
+# Comparisons chain like Python's (0.001 < mean_rv < 0.01). Comparisons and
+# set tests on a missing metric (NaN) are false, '!=' and 'not in' included.
+# Expressions longer than MAX_LENGTH characters or nesting parentheses,
+# 'not' or unary minus deeper than MAX_DEPTH are rejected like any other
+# invalid input, so the recursive parser never runs out of stack.
+MAX_LENGTH = 500
+MAX_DEPTH = 32
+SCREEN_FIELDS = {
+    'mean_rv': 'mean',
+    'max_rv': 'max',
+    'min_rv': 'min',
+    'std_rv': 'std',
+    'median_rv': 'median',
+    'p90_rv': 'p90',
+    'p95_rv': 'p95',
+    'stock_id': None,
+}
+
+_TOKEN = re.compile(r"""
+    \s*(?:
+        (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)
+      | (?P<name>[A-Za-z_]\w*)
+      | (?P<op><=|>=|==|!=|<|>|[-+*/(){},])
+    )""", re.VERBOSE)
+_KEYWORDS = ('and', 'or', 'not', 'in')
+_COMPARE = {'<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge, '==': operator.eq, '!=': operator.ne}
+_ARITH = {'+': operator.add, '-': operator.sub, '*': operator.mul, '/': operator.truediv}
+
+
+def _tokenize(text):
+    tokens, pos = [], 0
+    text = text.rstrip()
+    while pos < len(text):
+        match = _TOKEN.match(text, pos)
+        if match is None:
+            raise ValueError(f"Unexpected character {text[pos:].lstrip()[0]!r} at position {pos + 1}")
+        kind = match.lastgroup
+        value = match.group(kind)
+        at = match.start(kind) + 1
+        if kind == 'name' and value.lower() in _KEYWORDS:
+            kind, value = 'op', value.lower()
+        tokens.append((kind, value, at))
+        pos = match.end()
+    tokens.append(('end', '', len(text) + 1))
+    return tokens
+
+
+# Recursive-descent parser producing (kind, node) pairs, where kind is 'bool'
+# or 'num' and node is a nested tuple:
+#   ('num', value) ('field', name) ('neg', x) ('arith', op, a, b)
+#   ('compare', (a, op, b, op, c, ...)) ('in', x, values, negated)
+#   ('and', a, b) ('or', a, b) ('not', x)
+class _Parser:
+    def __init__(self, text):
+        if len(text) > MAX_LENGTH:
+            raise ValueError(f"Expression is too long ({len(text)} characters, at most {MAX_LENGTH})")
+        self.tokens = _tokenize(text)
+        self.pos = 0
+        self.depth = 0
+
+    def nested(self, parse, at):
+        # parse() one level deeper, within MAX_DEPTH
+        if self.depth >= MAX_DEPTH:
+            raise ValueError(f"Expression nests too deeply at position {at} (at most {MAX_DEPTH} levels)")
+        self.depth += 1
+        try:
+            return parse()
+        finally:
+            self.depth -= 1
+
+    def peek(self):
+        return self.tokens[self.pos]
+
+    def take(self, value=None):
+        kind, token, at = self.tokens[self.pos]
+        if value is not None and (kind != 'op' or token != value):
+            found = "end of expression" if kind == 'end' else repr(token)
+            raise ValueError(f"Expected {value!r} at position {at}, found {found}")
+        self.pos += 1
+        return kind, token, at
+
+    def at_op(self, *values):
+        kind, token, _ = self.peek()
+        return kind == 'op' and token in values
+
+    def parse(self):
+        kind, node = self.or_expr()
+        if self.peek()[0] != 'end':
+            _, token, at = self.peek()
+            raise ValueError(f"Unexpected {token!r} at position {at}")
+        if kind != 'bool':
+            raise ValueError("The expression must be a condition, e.g. mean_rv > 0.004")
+        return node
+
+    def _boolean(self, kind, at):
+        if kind != 'bool':
+            raise ValueError(f"Expected a condition at position {at}")
+
+    def or_expr(self):
+        at = self.peek()[2]
+        kind, node = self.and_expr()
+        while self.at_op('or'):
+            self._boolean(kind, at)
+            self.take()
+            at = self.peek()[2]
+            right_kind, right = self.and_expr()
+            self._boolean(right_kind, at)
+            node = ('or', node, right)
+        return kind, node
+
+    def and_expr(self):
+        at = self.peek()[2]
+        kind, node = self.not_expr()
+        while self.at_op('and'):
+            self._boolean(kind, at)
+            self.take()
+            at = self.peek()[2]
+            right_kind, right = self.not_expr()
+            self._boolean(right_kind, at)
+            node = ('and', node, right)
+        return kind, node
+
+    def not_expr(self):
+        if self.at_op('not'):
+            at = self.take()[2]
+            kind, node = self.nested(self.not_expr, at)
+            self._boolean(kind, at)
+            return 'bool', ('not', node)
+        return self.comparison()
+
+    def comparison(self):
+        at = self.peek()[2]
+        kind, node = self.sum()
+        if self.at_op('in', 'not'):
+            negated = self.take()[1] == 'not'
+            if negated:
+                self.take('in')
+            self._numeric(kind, at)
+            return 'bool', ('in', node, self.number_set(), negated)
+        chain = [node]
+        while self.at_op(*_COMPARE):
+            self._numeric(kind, at)
+            chain.append(self.take()[1])
+            at = self.peek()[2]
+            kind, node = self.sum()
+            self._numeric(kind, at)
+            chain.append(node)
+        if len(chain) > 1:
+            return 'bool', ('compare', tuple(chain))
+        return kind, node
+
+    def number_set(self):
+        self.take('{')
+        values = []
+        while not self.at_op('}'):
+            if values:
+                self.take(',')
+            sign = 1.0
+            if self.at_op('-'):
+                self.take()
+                sign = -1.0
+            kind, token, at = self.take()
+            if kind != 'number':
+                raise ValueError(f"Expected a number at position {at}")
+            values.append(sign * float(token))
+        self.take('}')
+        return tuple(sorted(set(values)))
+
+    def _numeric(self, kind, at):
+        if kind != 'num':
+            raise ValueError(f"Expected a number or metric at position {at}")
+
+    def sum(self):
+        return self._binary(self.product, ('+', '-'))
+
+    def product(self):
+        return self._binary(self.unary, ('*', '/'))
+
+    def _binary(self, operand, ops):
+        at = self.peek()[2]
+        kind, node = operand()
+        while self.at_op(*ops):
+            self._numeric(kind, at)
+            op = self.take()[1]
+            at = self.peek()[2]
+            right_kind, right = operand()
+            self._numeric(right_kind, at)
+            node = ('arith', op, node, right)
+        return kind, node
+
+    def unary(self):
+        kind, token, at = self.take()
+        if kind == 'op' and token == '-':
+            operand_kind, node = self.nested(self.unary, at)
+            self._numeric(operand_kind, at)
+            return 'num', ('neg', node)
+        if kind == 'op' and token == '(':
+            inner = self.nested(self.or_expr, at)
+            self.take(')')
+            return inner
+        if kind == 'number':
+            return 'num', ('num', float(token))
+        if kind == 'name':
+            if token not in SCREEN_FIELDS:
+                raise ValueError(
+                    f"Unknown name {token!r} at position {at}; available: {', '.join(SCREEN_FIELDS)}"
+                )
+            return 'num', ('field', token)
+        found = "end of expression" if kind == 'end' else repr(token)
+        raise ValueError(f"Unexpected {found} at position {at}")
+
+
+def _format(node):
+    kind = node[0]
+    if kind == 'num':
+        return repr(node[1])
+    if kind == 'field':
+        return node[1]
+    if kind == 'neg':
+        return f"(-{_format(node[1])})"
+    if kind == 'arith':
+        return f"({_format(node[2])} {node[1]} {_format(node[3])})"
+    if kind == 'compare':
+        return '(' + ' '.join(part if isinstance(part, str) else _format(part) for part in node[1]) + ')'
+    if kind == 'in':
+        values = ', '.join(repr(v) for v in node[2])
+        return f"({_format(node[1])} {'not in' if node[3] else 'in'} {{{values}}})"
+    if kind == 'not':
+        return f"(not {_format(node[1])})"
+    return f"({_format(node[1])} {kind} {_format(node[2])})"
+
+
+def _compile(node):
+    # Each node becomes a function of the field arrays returning an array
+    # (or a scalar for constants, which NumPy broadcasts)
+    kind = node[0]
+    if kind == 'num':
+        value = node[1]
+        return lambda fields: value
+    if kind == 'field':
+        name = node[1]
+        return lambda fields: fields[name]
+    if kind == 'neg':
+        inner = _compile(node[1])
+        return lambda fields: -inner(fields)
+    if kind == 'arith':
+        op, left, right = _ARITH[node[1]], _compile(node[2]), _compile(node[3])
+
+        def arith(fields):
+            with np.errstate(invalid='ignore', divide='ignore'):
+                return op(np.asarray(left(fields), dtype=np.float64), right(fields))
+        return arith
+    if kind == 'compare':
+        parts = node[1]
+        operands = [_compile(part) for part in parts[::2]]
+        ops = [_COMPARE[op] for op in parts[1::2]]
+
+        def compare(fields):
+            values = [f(fields) for f in operands]
+            mask = True
+            with np.errstate(invalid='ignore'):
+                for op, a, b in zip(ops, values, values[1:]):
+                    mask = mask & op(a, b) & ~np.isnan(a) & ~np.isnan(b)
+            return mask
+        return compare
+    if kind == 'in':
+        inner, values, negated = _compile(node[1]), np.array(node[2]), node[3]
+
+        def member(fields):
+            x = inner(fields)
+            return np.isin(x, values, invert=negated) & ~np.isnan(x)
+        return member
+    if kind == 'not':
+        inner = _compile(node[1])
+        return lambda fields: ~np.asarray(inner(fields), dtype=bool)
+    combine = np.logical_and if kind == 'and' else np.logical_or
+    left, right = _compile(node[1]), _compile(node[2])
+    return lambda fields: combine(left(fields), right(fields))
+
+
+def _fields(node):
+    if node[0] == 'field':
+        return {node[1]}
+    if node[0] == 'compare':
+        parts = node[1][::2]
+    elif node[0] == 'arith':
+        parts = node[2:]
+    elif node[0] == 'in':
+        parts = node[1:2]
+    else:
+        parts = node[1:]
+    return set().union(*(_fields(p) for p in parts if isinstance(p, tuple)))
+
+
+# A parsed and compiled screening expression. `key` is a canonical form of
+# the expression (fully parenthesized), so texts that differ only in spacing
+# or redundant parentheses share cached results.
+class ScreenFilter:
+    def __init__(self, text):
+        tree = _Parser(text).parse()
+        self.text = text
+        self.key = _format(tree)
+        self.fields = frozenset(_fields(tree))
+        self._evaluate = _compile(tree)
+
+    def mask(self, fields, n):
+        """Boolean mask over n stocks from a dict of per-stock field arrays."""
+        return np.broadcast_to(np.asarray(self._evaluate(fields), dtype=bool), (n,))
+
+
+@functools.lru_cache(maxsize=256)
+def compile_filter(text):
+    """ScreenFilter for text (cached), or None for a blank filter.
+
+    Raises ValueError with the position of the problem for invalid input.
+    """
+    if not text or not text.strip():
+        return None
+    return ScreenFilter(text.strip())
@@ -1,23 +1,134 @@
+import atexit
 import os
-import pandas as pd
-import matplotlib.pyplot as plt
 from shiny import ui, render, reactive
 from faicons import icon_svg
 
+from . import client_plots
+from .figure_cache import FigureCache, cached_image, warm_up
+from .forecast import forecast_frame
+from .instrumentation import metrics
+from .offload import LatestTask, render_in_process
+from .panel_cache import load_panel
+from .panel_store import PanelStore
+from .range_index import RangeIndex
+from .regime import RegimeScanner
+from .result_cache import LRUCache
+from .screen import METRICS, QUANTILE_METRICS, screen_frame, screen_png
+from .screen_expr import SCREEN_FIELDS, compile_filter
+from .shared_panel import attach_panel
+from .similarity import SIMILARITY_METRICS, ProjectionIndex, similar_stocks
+
 # Determine project root and data path
 _project_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 DATA_PATH = os.path.join(_project_dir, 'data/vol_df.csv')
 
-# Load realized volatility panel (wide format)
-vol_df = pd.read_csv(DATA_PATH)
+# Attach to the panel shared by the launcher (serve.py) when running under
+# it, otherwise load the realized volatility panel (wide format) through the
+# binary cache and build its prefix-sum index, which answers per-stock window
+# aggregates without a rescan
+rv_index = attach_panel()
+if rv_index is None:
+    _panel = load_panel(DATA_PATH)
+    rv_index = RangeIndex(_panel, _panel.stock_cols)
+    del _panel
+
+# Live panel: new time_ids dropped as wide CSV files into INGEST_DIR are
+# appended in place and bump the store version, which every session polls
+panel_store = PanelStore(rv_index)
+INGEST_DIR = os.environ.get('VX_INGEST_DIR', os.path.join(_project_dir, 'data/incoming'))
+INGEST_POLL_SECS = float(os.environ.get('VX_INGEST_POLL_SECS', '2'))
+# Approximate similarity queries also run the exact search and report their
+# recall when set; off by default since it makes them slower than exact ones
+SIMILAR_RECALL = os.environ.get('VX_SIMILAR_RECALL') == '1'
+
+# Panel size for the /metrics endpoint (see modules/instrumentation.py)
+metrics.gauge('vx_panel_time_ids', 'Rows (time_ids) in the panel', lambda: len(panel_store.index.times))
+metrics.gauge('vx_panel_stocks', 'Stocks in the panel', lambda: len(panel_store.stock_cols))
+metrics.gauge('vx_panel_bytes', 'Bytes of the compact panel', lambda: panel_store.panel.nbytes)
+metrics.gauge('vx_index_bytes', 'Bytes of the panel and its range index', lambda: panel_store.index.nbytes)
+metrics.gauge('vx_panel_version', 'Ingest version of the panel', lambda: panel_store.version)
+
+
+@reactive.poll(lambda: panel_store.poll_drop_dir(INGEST_DIR), INGEST_POLL_SECS)
+def panel_version():
+    return panel_store.version
+
+# Results shared across sessions, keyed by normalized inputs and dropped
+# whenever the panel version changes
+result_cache = LRUCache(max_bytes=int(os.environ.get('VX_RESULT_CACHE_MB', '256')) * 2**20)
+metrics.gauge('vx_result_cache_hits', 'Result cache hits', lambda: result_cache.hits)
+metrics.gauge('vx_result_cache_misses', 'Result cache misses', lambda: result_cache.misses)
+metrics.gauge('vx_result_cache_bytes', 'Approximate bytes of the cached results', lambda: result_cache.nbytes)
+
+# Spike and regime-shift events for the whole universe, scanned once and then
+# only over newly ingested rows
+regime_scanner = RegimeScanner()
+
+
+def shared_forecasts():
+    """Next-period forecasts for every stock, fitted once per panel version."""
+    return result_cache.get_or_compute(
+        ('forecast',), lambda: forecast_frame(panel_store.index), version=panel_store.version
+    )
+
+
+def warm_results():
+    """Compute the shared results every new session asks for first."""
+    shared_forecasts()
+    regime_scanner.sync(panel_store.index)
+
+# Rendered plot images, bounded in memory (and optionally on disk) and keyed
+# by the data they show; VX_FIGURE_WARMUP=N pre-renders the N most requested
+# stock time series in a background process pool at startup
+figure_cache = FigureCache(
+    max_bytes=int(float(os.environ.get('VX_FIGURE_CACHE_MB', '64')) * 2**20),
+    disk_dir=os.environ.get('VX_FIGURE_CACHE_DIR') or None,
+)
+atexit.register(figure_cache.save_requests)
+if int(os.environ.get('VX_FIGURE_WARMUP', '0')) > 0:
+    _n_warm = int(os.environ['VX_FIGURE_WARMUP'])
+    warm_up(
+        figure_cache, panel_store,
+        figure_cache.most_requested(_n_warm) or panel_store.stock_cols[:_n_warm],
+        width=int(os.environ.get('VX_FIGURE_WARMUP_WIDTH', '1000')),
+        height=int(os.environ.get('VX_FIGURE_WARMUP_HEIGHT', '400')),
+    )
+
+
+def plot_size(session, output_id, step=50):
+    """(width, height, pixelratio) of an output, width rounded to share cache entries."""
+    width = session.clientdata.output_width(output_id)
+    height = session.clientdata.output_height(output_id)
+    pixelratio = session.clientdata.pixelratio()
+    return max(step, int(round(width / step)) * step), int(height), pixelratio
+
+
+def output_visible(session, output_id):
+    """Whether an output is on screen (reactive), like render suspension."""
+    return session.clientdata.output_hidden(output_id) is False
+
+
+def image_data(src, alt):
+    return {'src': src, 'width': '100%', 'height': 'auto', 'alt': alt}
 
-# Identify time_id range and stock columns
-min_time = int(vol_df['time_id'].min())
-max_time = int(vol_df['time_id'].max())
-stock_cols = [c for c in vol_df.columns if c != 'time_id']
+
+def stat_tiles(stats):
+    """Grid of labelled numbers from (label, formatted value) pairs."""
+    return ui.tags.div(
+        *[
+            ui.tags.div(ui.tags.div(label, class_="stat-label"), ui.tags.div(value, class_="stat-value"),
+                        class_="stat-tile")
+            for label, value in stats
+        ],
+        class_="stat-grid"
+    )
+
+# Time bounds the slider was rendered with, for sessions opened after ingest
+_ui_time_bounds = [None, None]
 
 # UI for the screener panel
 def ui_screener():
+    _ui_time_bounds[:] = [panel_store.min_time, panel_store.max_time]
     return ui.nav_panel(
         "Volatility Screener",
         ui.layout_sidebar(
@@ -29,12 +140,54 @@ def ui_screener():
                 ),
                 ui.input_slider(
                     "scr_time_range", "Time ID Range:",
-                    min=min_time, max=max_time,
-                    value=(min_time, max_time), step=1
+                    min=panel_store.min_time, max=panel_store.max_time,
+                    value=(panel_store.min_time, panel_store.max_time), step=1
                 ),
                 ui.input_slider(
                     "top_n", "Top N Stocks:",
-                    min=1, max=len(stock_cols), value=10, step=1
+                    min=1, max=len(panel_store.stock_cols), value=10, step=1
+                ),
+                ui.input_select(
+                    "scr_metric", "Rank By:",
+                    choices={
+                        'mean': "Average",
+                        'max': "Peak",
+                        'min': "Minimum",
+                        'std': "Dispersion (Std)",
+                        'median': "Median",
+                        'p90': "90th Percentile",
+                        'p95': "95th Percentile",
+                    },
+                    selected='mean'
+                ),
+                ui.panel_conditional(
+                    "['median', 'p90', 'p95'].includes(input.scr_metric)",
+                    ui.input_radio_buttons(
+                        "scr_quantile_mode", "Quantile Mode:",
+                        choices={'exact': "Exact", 'approx': "Approximate (fast)"},
+                        selected='exact', inline=True
+                    ),
+                ),
+                ui.input_text(
+                    "scr_filter", "Filter (applied before ranking):",
+                    placeholder="mean_rv > 0.004 and stock_id in {1, 5, 9}", update_on='blur'
+                ),
+                ui.tags.small(
+                    f"Metrics: {', '.join(SCREEN_FIELDS)}; operators: and, or, not, in {{...}}, < <= > >= == !=, + - * /",
+                    class_="text-muted"
+                ),
+                ui.tags.hr(),
+                ui.input_select(
+                    "scr_similar_to", "Find Stocks Similar To:",
+                    choices={'': "(none)", **{s: s for s in panel_store.stock_cols}}, selected=''
+                ),
+                ui.panel_conditional(
+                    "input.scr_similar_to !== ''",
+                    ui.input_numeric("scr_similar_k", "How Many:", value=5, min=1, max=50),
+                    ui.input_radio_buttons(
+                        "scr_similar_metric", "Similarity:", choices=SIMILARITY_METRICS, selected='corr', inline=True
+                    ),
+                    ui.input_checkbox("scr_similar_approx", "Approximate index (random projections)", value=False),
                 ),
                 width=270,
                 position="left",
@@ -47,13 +200,31 @@ def ui_screener():
                     class_="screener-title-row"
                 ),
                 ui.tags.div(
-                    "Showing the top N stocks by average realized volatility. Use the filter to adjust N and time range.",
+                    "Showing the top N stocks by the selected realized volatility metric. Use the filters to adjust the metric, N and time range.",
                     class_="screener-subtitle"
                 ),
                 ui.tags.div(
                     ui.output_data_frame("scr_table"),
                     class_="screener-card"
                 ),
+                ui.tags.div(
+                    client_plots.plot_output("scr_plot") if client_plots.use_plotly()
+                    else ui.output_image("scr_plot", height="400px"),
+                    class_="screener-card"
+                ),
+                ui.tags.div(
+                    ui.output_text("scr_regime_title"),
+                    ui.output_data_frame("scr_regime"),
+                    class_="screener-card"
+                ),
+                ui.panel_conditional(
+                    "input.scr_similar_to !== ''",
+                    ui.tags.div(
+                        ui.output_text("scr_similar_title"),
+                        ui.output_data_frame("scr_similar"),
+                        class_="screener-card"
+                    ),
+                ),
                 class_="main-content"
             )
         ),
@@ -63,61 +234,233 @@ def ui_screener():
 
 # Server logic for screener
 def server_screener(input, output, session):
-    @reactive.Calc
-    def filtered_data():
-        start_time, end_time = input.scr_time_range()
-        subset = vol_df[
-            (vol_df['time_id'] >= start_time) &
-            (vol_df['time_id'] <= end_time)
-        ]
-        df_long = subset.melt(
-            id_vars=['time_id'], value_vars=stock_cols,
-            var_name='stock_id', value_name='rv'
+    # Slider max before the latest ingest; a range ending there follows the
+    # live edge as new time_ids arrive
+    last_max = [_ui_time_bounds[1]]
+
+    @reactive.Effect
+    def _sync_bounds():
+        panel_version()
+        min_time, max_time = panel_store.min_time, panel_store.max_time
+        with reactive.isolate():
+            start_time, end_time = input.scr_time_range()
+        if last_max[0] is not None and end_time >= last_max[0]:
+            end_time = max_time
+        last_max[0] = max_time
+        ui.update_slider(
+            "scr_time_range", min=min_time, max=max_time,
+            value=(max(start_time, min_time), min(end_time, max_time))
         )
-        df_long['stock_id'] = df_long['stock_id'].astype(int)
-        df_mean = (
-            df_long.groupby('stock_id')['rv']
-                   .mean()
-                   .reset_index(name='Avg Realized Volatility')
+        ui.update_slider("top_n", max=len(panel_store.stock_cols))
+        with reactive.isolate():
+            similar_to = input.scr_similar_to()
+        ui.update_select(
+            "scr_similar_to", choices={'': "(none)", **{s: s for s in panel_store.stock_cols}}, selected=similar_to
         )
-        top_n = input.top_n()
-        return df_mean.sort_values('Avg Realized Volatility', ascending=False).head(top_n)
+
+    @reactive.Calc
+    def screen_filter():
+        # Parsed once per distinct text; an invalid filter is reported and
+        # ignored rather than emptying the table
+        try:
+            return compile_filter(input.scr_filter())
+        except ValueError as exc:
+            ui.notification_show(f"Invalid filter: {exc}", type="warning")
+            return None
+
+    @reactive.Calc
+    def screen_key():
+        panel_version()
+        start_time, end_time = input.scr_time_range()
+        metric = input.scr_metric()
+        exact = metric not in QUANTILE_METRICS or input.scr_quantile_mode() == 'exact'
+        index = panel_store.index
+        # Windows covering the same rows share an entry, whatever the
+        # exact slider values, and so do top N beyond the universe size
+        lo, hi = index.bounds(start_time, end_time)
+        top_n = min(input.top_n(), len(index.stock_cols))
+        screen = screen_filter()
+        return ('screen', metric, exact, lo, hi, top_n, screen.key if screen else None)
+
+    # Window metrics, similarity search and the plot render run off the event
+    # loop; a new request replaces one still pending (see modules/offload.py)
+    screen_task = LatestTask(session)
+    similar_task = LatestTask(session)
+    scr_plot_task = LatestTask(session)
+
+    @reactive.Effect
+    def _start_screen():
+        key = screen_key()
+        _, metric, exact, _, _, top_n, _ = key
+        screen = screen_filter()
+        start_time, end_time = input.scr_time_range()
+        index = panel_store.index
+
+        def compute():
+            return screen_frame(index, metric, start_time, end_time, top_n, exact, screen)
+
+        version = panel_store.version
+        cached = result_cache.get(key, version)
+        if cached is not None:
+            screen_task.set_result((key, cached))
+            return
+        screen_task.start(lambda: (key, result_cache.get_or_compute(key, compute, version=version)))
+
+    @reactive.Calc
+    def screen_result():
+        # (screen_key, frame); keeps showing the previous table (with
+        # progress) while a new one is computed
+        return screen_task.result()
+
+    @reactive.Calc
+    def filtered_data():
+        return screen_result()[1]
+
+    @reactive.Calc
+    def forecasts():
+        panel_version()
+        return shared_forecasts()
 
     @output
     @render.data_frame
     def scr_table():
         """
-        Show top N stocks in a paginated data table.
+        Show top N stocks in a paginated data table, with next-period
+        forecasts alongside the ranking metric.
         """
-        df_top = filtered_data()
-        return df_top.rename(
-            columns={
-                'stock_id': 'Stock ID',
-                'Avg Realized Volatility': 'Avg Realized Volatility'
-            }
+        df_top = filtered_data().merge(forecasts(), on='stock_id', how='left')
+        return df_top.rename(columns={
+            'stock_id': 'Stock ID',
+            'har_forecast': 'Next RV Forecast (HAR)',
+            'ewma_forecast': 'Next RV Forecast (EWMA)',
+        })
+
+    @reactive.Calc
+    def regime_data():
+        # Stocks with a volatility spike or regime shift inside the window
+        panel_version()
+        start_time, end_time = input.scr_time_range()
+        index = panel_store.index
+        lo, hi = index.bounds(start_time, end_time)
+        return result_cache.get_or_compute(
+            ('regime', lo, hi), lambda: regime_scanner.sync(index).events(lo, hi), version=panel_store.version
         )
 
     @output
-    @render.plot
-    def scr_plot():
-        df = filtered_data()
-        fig, ax = plt.subplots(figsize=(10, 4))
-        # Plot line and fill under curve for average realized volatility
-        ax.plot(df['stock_id'].astype(str), df['Avg Realized Volatility'], color='#1f77b4', linewidth=2)
-        ax.fill_between(df['stock_id'].astype(str), df['Avg Realized Volatility'], color='#1f77b4', alpha=0.3)
-        ax.set_xlabel('Stock ID')
-        ax.set_ylabel('Avg Realized Volatility')
-        ax.set_title('Top N Stocks by Avg Realized Volatility', fontsize=12, fontweight='bold')
-        ax.grid(axis='y', linestyle='--', alpha=0.5)
-        for spine in ax.spines.values():
-            spine.set_visible(False)
-        # Show only a subset of x-ticks for readability
-        xticks = df['stock_id'].astype(str)
-        if len(xticks) > 10:
-            step = max(1, len(xticks)//10)
-            ax.set_xticks(xticks[::step])
-            ax.set_xticklabels(xticks[::step], rotation=45, ha='right')
-        else:
-            ax.set_xticklabels(xticks, rotation=0)
-        plt.tight_layout()
-        return fig
+    @render.text
+    def scr_regime_title():
+        return f"Regime flags: {len(regime_data())} stocks spiked or shifted regime in the selected time range"
+
+    @output
+    @render.data_frame
+    def scr_regime():
+        return regime_data().rename(columns={
+            'stock_id': 'Stock ID',
+            'spikes': 'Spikes',
+            'up_shifts': 'Shifts Up',
+            'down_shifts': 'Shifts Down',
+            'last_event': 'Last Event (time_id)',
+        })
+
+    @reactive.Calc
+    def similar_query():
+        panel_version()
+        stock = input.scr_similar_to()
+        return bool(stock) and stock in panel_store.stock_cols
+
+    @reactive.Effect
+    def _start_similar():
+        if not similar_query():
+            similar_task.cancel()
+            return
+        stock = input.scr_similar_to()
+        start_time, end_time = input.scr_time_range()
+        metric = input.scr_similar_metric()
+        k = int(input.scr_similar_k() or 5)
+        approximate = metric == 'corr' and input.scr_similar_approx()
+        index = panel_store.index
+        lo, hi = index.bounds(start_time, end_time)
+
+        def compute():
+            projection = None
+            if approximate:
+                # One projection sketch (n_stocks x PROJECTION_DIMS) per window,
+                # shared by every query on it
+                projection = result_cache.get_or_compute(
+                    ('projection', lo, hi), lambda: ProjectionIndex(index.values[lo:hi]),
+                    version=panel_store.version
+                )
+            return similar_stocks(index, stock, lo, hi, k, metric, projection, recall=SIMILAR_RECALL)
+
+        key, version = ('similar', stock, metric, approximate, lo, hi, k), panel_store.version
+        cached = result_cache.get(key, version)
+        if cached is not None:
+            similar_task.set_result(cached)
+            return
+        similar_task.start(result_cache.get_or_compute, key, compute, version)
+
+    @reactive.Calc
+    def similar_data():
+        if not similar_query():
+            return None
+        return similar_task.result()
+
+    @output
+    @render.text
+    def scr_similar_title():
+        data = similar_data()
+        if data is None:
+            return ""
+        df, recall = data
+        if df.empty:
+            return f"No stocks to compare with {input.scr_similar_to()} over the selected time range"
+        title = f"Stocks most similar to {input.scr_similar_to()} over the selected time range"
+        if recall is not None:
+            title += f" (approximate, recall {recall:.0%} vs exact)"
+        elif input.scr_similar_metric() == 'corr' and input.scr_similar_approx():
+            title += " (approximate)"
+        return title
+
+    @output
+    @render.data_frame
+    def scr_similar():
+        data = similar_data()
+        if data is None:
+            return None
+        df, _ = data
+        return df.rename(columns={'stock_id': 'Stock ID'})
+
+    if client_plots.use_plotly():
+        @reactive.Effect
+        async def _send_scr_plot():
+            df = filtered_data()
+            # The metric of the result, which may trail the input
+            label = df.columns[1]
+            await client_plots.send(session, client_plots.top_n_message(
+                'scr_plot', df['stock_id'], df[label], label, revision=label
+            ))
+    else:
+        @reactive.Effect
+        def _start_scr_plot():
+            if not output_visible(session, 'scr_plot'):
+                return
+            key, df = screen_result()
+            label = df.columns[1]
+            width, height, pixelratio = plot_size(session, 'scr_plot')
+            version = panel_store.data_key
+            cache_key = ('top_n', key, width, height, pixelratio)
+            src = figure_cache.get(cache_key, version)
+            if src is not None:
+                scr_plot_task.set_result((src, label))
+                return
+            scr_plot_task.start(lambda: (figure_cache.get_or_render(
+                cache_key,
+                lambda: render_in_process(screen_png, df, width, height, pixelratio),
+                version=version,
+            ), label))
+
+        @output
+        @cached_image
+        def scr_plot():
+            src, label = scr_plot_task.result()
+            return image_data(src, f'Top N Stocks by {label}')
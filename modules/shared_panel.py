@@ -0,0 +1,113 @@
+import json
+import logging
+import os
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from .range_index import RangeIndex
+
+# Read-only sharing of the volatility panel and its derived index across
+# uvicorn worker processes. The launcher packs every array into a single
+# shared memory segment and describes it in an environment variable; workers
+# that find the variable attach to the segment instead of loading the data.
+# Sharing lasts until a worker's first live ingest (PanelStore.append): the
+# extended index copies the per-row arrays (the panel, prefix sums and sketch
+# buckets, nearly all of its size) into private buffers, and the block tables
+# once a block completes, so from then on every worker holds its own copy.
+# The launcher does not republish; restart it to share the grown panel again.
+MANIFEST_ENV = 'VX_SHARED_PANEL'
+ALIGN = 64
+
+# Workers run under uvicorn's logging config, so report through its logger
+logger = logging.getLogger('uvicorn.error')
+
+# Keeps the attached segment (and so every view into it) alive in workers
+_attached = []
+
+
+def publish(arrays, meta):
+    """Copy named arrays into one shared segment; return (segment, manifest)."""
+    layout = {}
+    offset = 0
+    for name, arr in arrays.items():
+        arr = np.asarray(arr)
+        layout[name] = {'dtype': arr.dtype.str, 'shape': list(arr.shape), 'offset': offset}
+        offset += -(-arr.nbytes // ALIGN) * ALIGN
+    segment = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for name, arr in arrays.items():
+        spec = layout[name]
+        view = np.ndarray(spec['shape'], dtype=spec['dtype'], buffer=segment.buf, offset=spec['offset'])
+        view[...] = arr
+    manifest = {'segment': segment.name, 'arrays': layout, 'meta': meta}
+    return segment, manifest
+
+
+def release(segment):
+    """Close and unlink a segment created by publish()."""
+    segment.close()
+    # Workers share the launcher's resource tracker and unregistered the name
+    # when attaching; register it again so unlink() can unregister it cleanly
+    resource_tracker.register(segment._name, 'shared_memory')
+    segment.unlink()
+
+
+def attach(manifest=None):
+    """Attach to the published segment; return (arrays, meta) or None."""
+    if manifest is None:
+        raw = os.environ.get(MANIFEST_ENV)
+        if not raw:
+            return None
+        manifest = json.loads(raw)
+    segment = shared_memory.SharedMemory(name=manifest['segment'])
+    # The launcher owns the segment; workers must not unlink it on exit
+    resource_tracker.unregister(segment._name, 'shared_memory')
+    _attached.append(segment)
+    arrays = {}
+    for name, spec in manifest['arrays'].items():
+        view = np.ndarray(spec['shape'], dtype=spec['dtype'], buffer=segment.buf, offset=spec['offset'])
+        view.flags.writeable = False
+        arrays[name] = view
+    return arrays, manifest['meta']
+
+
+def memory_report(pid='self'):
+    """Resident memory breakdown in MiB from /proc (Linux only)."""
+    fields = {'VmRSS': 'rss', 'RssAnon': 'anon', 'RssFile': 'file', 'RssShmem': 'shmem'}
+    report = {}
+    try:
+        with open(f'/proc/{pid}/status') as fh:
+            for line in fh:
+                key, _, value = line.partition(':')
+                if key in fields:
+                    report[fields[key]] = round(int(value.split()[0]) / 1024, 1)
+    except OSError:
+        pass
+    return report
+
+
+def log_memory(label):
+    report = memory_report()
+    if report:
+        logger.info(
+            '%s pid=%s rss=%sMiB private=%sMiB shared=%sMiB',
+            label, os.getpid(), report.get('rss'), report.get('anon'),
+            round(report.get('file', 0) + report.get('shmem', 0), 1),
+        )
+
+
+def publish_panel(rv_index):
+    """Publish the panel's RangeIndex (which holds the time-sorted panel)."""
+    arrays, meta = rv_index.export_state()
+    return publish(arrays, meta)
+
+
+def attach_panel():
+    """Return a RangeIndex backed by the launcher's segment, or None."""
+    shared = attach()
+    if shared is None:
+        return None
+    arrays, meta = shared
+    rv_index = RangeIndex.from_state(arrays, meta)
+    log_memory('attached shared volatility panel')
+    return rv_index
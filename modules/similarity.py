@@ -0,0 +1,160 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# Similarity search over the RV series of every stock in a time_id window.
+# Exact search correlates one stock with all others using a handful of
+# matrix-vector products (pairwise-complete, like cross_index). The optional
+# approximate index z-normalizes the window once and keeps a random
+# projection of every series, so a query is an (n_stocks x d) product plus an
+# exact rerank of a few candidates. DTW-lite compares the shapes of coarse
+# (piecewise-averaged) series within a narrow warping band.
+SIMILARITY_METRICS = {
+    'corr': "Correlation",
+    'dtw': "DTW Distance",
+}
+PROJECTION_DIMS = 256
+DTW_POINTS = 128
+DTW_BAND = 8
+
+
+def correlations(values, col):
+    """Correlation of column col with every column over the rows of values."""
+    valid = ~np.isnan(values)
+    m = valid.astype(np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        shift = np.where(valid.any(axis=0), np.nansum(values, axis=0) / m.sum(axis=0), 0.0)
+    x = np.where(valid, values - shift, 0.0)
+    xq, mq = x[:, col], m[:, col]
+    n = mq @ m
+    s_q, s_j = xq @ m, mq @ x
+    q_q, q_j = (xq * xq) @ m, mq @ (x * x)
+    p = xq @ x
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = p - s_q * s_j / n
+        corr = cov / np.sqrt((q_q - s_q * s_q / n) * (q_j - s_j * s_j / n))
+    corr[n < 2] = np.nan
+    return np.clip(corr, -1.0, 1.0)
+
+
+def znormalize(values):
+    """Columns centred, scaled to unit norm, NaN as zero; Zᵀ Z ≈ correlation."""
+    valid = ~np.isnan(values)
+    count = valid.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(count > 0, np.nansum(values, axis=0) / count, 0.0)
+        z = np.where(valid, values - mean, 0.0)
+        norm = np.sqrt((z * z).sum(axis=0))
+        return np.where(norm > 0, z / norm, 0.0)
+
+
+# Random-projection index of a z-normalized window. Gaussian projections
+# preserve inner products in expectation, so the nearest stocks in the
+# d-dimensional sketch are likely to be the most correlated; the top
+# `oversample * k` candidates are then reranked with exact correlation.
+# Only the (n_stocks x d) sketch is kept; `values` is the caller's view.
+class ProjectionIndex:
+    def __init__(self, values, dims=PROJECTION_DIMS, seed=0):
+        self.values = values
+        rng = np.random.default_rng(seed)
+        projection = rng.standard_normal((len(values), dims)) / np.sqrt(dims)
+        self.sketch = znormalize(values).T @ projection
+
+    @property
+    def nbytes(self):
+        return self.sketch.nbytes
+
+    def query(self, col, k, oversample=10):
+        n = self.sketch.shape[0]
+        scores = self.sketch @ self.sketch[col]
+        scores[col] = -np.inf
+        n_candidates = min(n - 1, oversample * k)
+        candidates = np.argpartition(-scores, n_candidates - 1)[:n_candidates] if n_candidates else np.array([], int)
+        corr = correlations(self.values[:, np.concatenate(([col], candidates))], 0)[1:]
+        best = _best(-corr, k)
+        return candidates[best], corr[best]
+
+
+def _best(cost, k, exclude=None):
+    """Positions of the k lowest finite costs, leaving out `exclude`."""
+    keep = np.isfinite(cost)
+    if exclude is not None:
+        keep[exclude] = False
+    positions = np.flatnonzero(keep)
+    return positions[np.argsort(cost[positions], kind='stable')[:k]]
+
+
+def piecewise_mean(values, n_points):
+    """Average rows into n_points near-equal segments (NaN-aware)."""
+    bounds = np.linspace(0, len(values), min(n_points, len(values)) + 1).astype(np.intp)
+    valid = ~np.isnan(values)
+    sums = np.add.reduceat(np.where(valid, values, 0.0), bounds[:-1], axis=0)
+    counts = np.add.reduceat(valid, bounds[:-1], axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def dtw_distances(query, series, band=DTW_BAND):
+    """Banded DTW distance from query (L,) to every column of series (L, n).
+
+    The recurrence runs over the L x (2 * band + 1) band cells with every
+    candidate series updated at once, keeping only two rows of the table.
+    """
+    length, n = series.shape
+    previous = np.full((length + 1, n), np.inf)
+    previous[0] = 0.0
+    for i in range(1, length + 1):
+        current = np.full((length + 1, n), np.inf)
+        for j in range(max(1, i - band), min(length, i + band) + 1):
+            d = (query[i - 1] - series[j - 1]) ** 2
+            current[j] = d + np.minimum(np.minimum(previous[j], current[j - 1]), previous[j - 1])
+        previous = current
+    return np.sqrt(previous[length])
+
+
+def _zscore(values):
+    with warnings.catch_warnings(), np.errstate(invalid='ignore', divide='ignore'):
+        warnings.simplefilter('ignore', RuntimeWarning)
+        mean = np.nanmean(values, axis=0)
+        std = np.nanstd(values, axis=0)
+        z = (values - mean) / np.where(std > 0, std, np.nan)
+    # Gaps in the coarse series count as average volatility
+    return np.nan_to_num(z)
+
+
+def similar_stocks(index, stock, lo, hi, k=5, metric='corr', approximate=None, recall=False):
+    """The k stocks most similar to `stock` over index rows [lo, hi).
+
+    `approximate` is a ProjectionIndex over the same rows. Returns (DataFrame
+    of stock_id and score, recall); with `recall` set an approximate search
+    also runs the exact one and reports the overlap of the two answers,
+    otherwise recall is None. The stock itself and stocks without a finite
+    score are never returned, so the frame is empty when the stock has no
+    data in the window.
+    """
+    if metric not in SIMILARITY_METRICS:
+        raise ValueError(f"Unknown similarity metric: {metric}")
+    col = index.column(stock)
+    values = index.values[lo:hi]
+    k = max(0, min(k, len(index.stock_cols) - 1))
+    overlap = None
+    empty = pd.DataFrame({'stock_id': index.stock_ids[:0], SIMILARITY_METRICS[metric]: np.empty(0)})
+    if not np.isfinite(values[:, col]).any():
+        return empty, overlap
+    if metric == 'dtw':
+        coarse = _zscore(piecewise_mean(values, DTW_POINTS))
+        dist = dtw_distances(coarse[:, col], coarse)
+        dist[np.isnan(values).all(axis=0)] = np.inf
+        best = _best(dist, k, exclude=col)
+        return pd.DataFrame({'stock_id': index.stock_ids[best], SIMILARITY_METRICS[metric]: dist[best]}), overlap
+    if approximate is None or recall:
+        corr = correlations(values, col)
+        exact = _best(-corr, k, exclude=col)
+    if approximate is None:
+        best, scores = exact, corr[exact]
+    else:
+        best, scores = approximate.query(col, k)
+        if recall and len(exact):
+            overlap = len(np.intersect1d(best, exact)) / len(exact)
+    return pd.DataFrame({'stock_id': index.stock_ids[best], SIMILARITY_METRICS[metric]: scores}), overlap
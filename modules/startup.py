@@ -0,0 +1,139 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from shiny import ui
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+logger = logging.getLogger(__name__)
+
+# Two-phase startup. Importing home.py only pulls in Shiny and this module, so
+# the server accepts connections almost at once; a background thread then
+# imports the numeric and plotting stacks, loads the panel (modules.screener)
+# and builds the structures the first sessions need. Until it finishes every
+# page request gets a loading page that polls /ready and reloads itself, and
+# the sessions of those pages do no work. /ready answers 200 once the app is
+# warm (503 before, or after a failed warm-up) with the per-phase timings.
+READY_POLL_MS = 1000
+# Longest wait for the per-stock statistics table before declaring ready; it
+# keeps building in the background either way
+STATS_WAIT_SECS = 30
+
+
+class Startup:
+    def __init__(self):
+        self.phases = []
+        self.phase = None
+        self.error = None
+        self._started = time.perf_counter()
+        self._ready = threading.Event()
+        self._thread = None
+
+    def ready(self):
+        return self._ready.is_set()
+
+    @contextmanager
+    def timed(self, name):
+        self.phase = name
+        start = time.perf_counter()
+        yield
+        self.phases.append((name, time.perf_counter() - start))
+
+    def start(self, warm_up):
+        """Run warm_up(self) in a background thread (once)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, args=(warm_up,), name='warm-up', daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self, warm_up):
+        try:
+            warm_up(self)
+        except Exception as exc:
+            self.error = f'{self.phase}: {exc}'
+            logger.exception('warm-up failed during %s', self.phase)
+            return
+        self.phase = None
+        self._ready.set()
+        logger.info('startup took %.2fs: %s', self.elapsed(), ', '.join(f'{n} {s:.2f}s' for n, s in self.phases))
+
+    def elapsed(self):
+        return time.perf_counter() - self._started
+
+    def report(self):
+        return {
+            'ready': self.ready(),
+            'phase': self.phase,
+            'error': self.error,
+            'elapsed_seconds': round(self.elapsed(), 3),
+            'phases': [{'name': name, 'seconds': round(seconds, 3)} for name, seconds in self.phases],
+        }
+
+
+def warm_up(startup):
+    """Everything the first session would otherwise wait for, phase by phase."""
+    with startup.timed('numerics'):
+        import numpy  # noqa: F401
+        import pandas  # noqa: F401
+    with startup.timed('panel'):
+        from . import screener
+    with startup.timed('panels'):
+        from . import portfolio_tracker, stock_analysis, stock_comparison  # noqa: F401
+    with startup.timed('derived'):
+        screener.warm_results()
+        stats_cache = stock_analysis.stats_cache
+        deadline = time.monotonic() + STATS_WAIT_SECS
+        while not stats_cache.ready() and stats_cache.error() is None and time.monotonic() < deadline:
+            stats_cache.get()
+            time.sleep(0.02)
+        if stats_cache.error() is not None:
+            # Sessions show the error in the stock analysis panel
+            logger.warning('stock statistics unavailable: %s', stats_cache.error())
+    with startup.timed('plotting'):
+        from . import client_plots, figures, offload
+        figures.to_png(figures.new_figure(100, 100))
+        if not client_plots.use_plotly():
+            # Starts a render worker (and its matplotlib import) before the
+            # first offloaded plot needs one
+            offload.render_in_process(figures.top_n_png, [0], [0.0], '', 100, 100)
+
+
+startup = Startup()
+
+
+def loading_page(*head):
+    """Page served before warm-up is done: polls /ready and reloads."""
+    return ui.page_fluid(
+        ui.tags.head(*head),
+        ui.tags.div(
+            ui.h1("Volatility Explorer is starting", class_="display-6"),
+            ui.p("Loading market data, this usually takes a few seconds."),
+            ui.tags.p(id="vx-startup-phase", class_="text-muted"),
+            class_="welcome-section",
+            style="margin-top:3rem;",
+        ),
+        ui.tags.script(f"""
+            (function poll() {{
+                fetch('ready', {{cache: 'no-store'}}).then(function (r) {{
+                    if (r.ok) {{ location.reload(); return; }}
+                    return r.json().then(function (s) {{
+                        var el = document.getElementById('vx-startup-phase');
+                        el.textContent = s.error ? 'Startup failed: ' + s.error : (s.phase || '');
+                        if (!s.error) setTimeout(poll, {READY_POLL_MS});
+                    }});
+                }}).catch(function () {{ setTimeout(poll, {READY_POLL_MS}); }});
+            }})();
+        """),
+    )
+
+
+async def _ready_route(request):
+    return JSONResponse(startup.report(), status_code=200 if startup.ready() else 503)
+
+
+def mount_ready(app):
+    """Add the /ready route to a Shiny App's Starlette router."""
+    app.starlette_app.router.routes.insert(0, Route('/ready', _ready_route, methods=['GET']))
+    return app
@@ -0,0 +1,167 @@
+import pandas as pd
+from shiny import ui, render, reactive
+from faicons import icon_svg
+
+from . import client_plots, figures
+from .figure_cache import cached_image
+from .screener import figure_cache, image_data, panel_store, panel_version, plot_size, stat_tiles
+from .stock_stats import EWMA_HALFLIFE, QUANTILES, ROLLING_WINDOW, StatsCache
+
+# Per-stock statistics for every stock, rebuilt in the background whenever the
+# panel changes; the first build starts as soon as the data is loaded
+stats_cache = StatsCache(panel_store)
+stats_cache.get()
+
+# UI for the individual stock analysis panel
+def ui_stock_analysis():
+    return ui.nav_panel(
+        "Individual Stock Analysis",
+        ui.layout_sidebar(
+            ui.sidebar(
+                ui.tags.div(
+                    icon_svg("chart-line"),
+                    ui.h2("Stock"),
+                    style="display:flex;align-items:center;gap:10px;margin-bottom:1.5rem;"
+                ),
+                ui.input_select("sa_stock", "Stock ID:", choices=list(panel_store.stock_cols)),
+                ui.tags.p(
+                    f"Rolling mean over {ROLLING_WINDOW} time_ids, EWMA half-life {EWMA_HALFLIFE} time_ids. "
+                    "Ranks are percentiles among all stocks (100 = highest)."
+                ),
+                width=270,
+                position="left",
+                class_="portfolio-sidebar"
+            ),
+            ui.tags.div(
+                ui.tags.div(
+                    ui.tags.div(
+                        icon_svg("chart-line"),
+                        ui.h2("Summary", class_="card-title"),
+                        style="display:flex;align-items:center;gap:10px;"
+                    ),
+                    ui.output_ui("sa_summary"),
+                    class_="portfolio-card"
+                ),
+                ui.tags.div(
+                    client_plots.plot_output("sa_plot", height="560px") if client_plots.use_plotly()
+                    else ui.output_image("sa_plot", height="560px"),
+                    class_="portfolio-card ts-card"
+                ),
+                ui.tags.div(
+                    ui.output_data_frame("sa_table"),
+                    class_="portfolio-card"
+                ),
+                class_="main-content"
+            )
+        ),
+        icon=icon_svg("chart-line"),
+        value="individual"
+    )
+
+# Server logic for individual stock analysis
+def server_stock_analysis(input, output, session):
+    @reactive.Effect
+    def _sync_stocks():
+        panel_version()
+        with reactive.isolate():
+            ui.update_select("sa_stock", choices=list(panel_store.stock_cols), selected=input.sa_stock())
+
+    @reactive.Calc
+    def stats():
+        # Poll until the table for the current panel version is built or its
+        # build failed; a stale table is shown meanwhile
+        panel_version()
+        table = stats_cache.get()
+        if not stats_cache.ready() and stats_cache.error() is None:
+            reactive.invalidate_later(0.5)
+        return table
+
+    @reactive.Calc
+    def selected():
+        table = stats()
+        stock = input.sa_stock()
+        if table is None or stock not in table.stock_cols:
+            return None
+        return table, int(stock), table.stock(stock)
+
+    def _series(profile):
+        return {
+            'Realized Volatility': profile['rv'],
+            f'Rolling Mean ({ROLLING_WINDOW})': profile['rolling'],
+            f'EWMA (half-life {EWMA_HALFLIFE})': profile['ewma'],
+        }
+
+    @output
+    @render.ui
+    def sa_summary():
+        current = selected()
+        error = stats_cache.error()
+        if current is None:
+            if error:
+                return ui.p(f"Stock statistics could not be computed: {error}", class_="text-danger")
+            return ui.p("Computing stock statistics...")
+        _, _, profile = current
+        row = profile['summary']
+        tiles = stat_tiles([
+            ("Latest RV", f"{row['latest']:.5f}"),
+            (f"Rolling Mean ({ROLLING_WINDOW})", f"{row['rolling']:.5f}"),
+            ("EWMA RV", f"{row['ewma']:.5f}"),
+            ("Average RV", f"{row['mean']:.5f}"),
+            ("Lag-1 Autocorrelation", f"{row['acf1']:.3f}"),
+            ("Average RV Rank", f"{row['mean_rank']:.0f} / 100"),
+        ])
+        if error:
+            return ui.TagList(
+                ui.p(f"Showing statistics for earlier data; updating them failed: {error}", class_="text-warning"),
+                tiles,
+            )
+        return tiles
+
+    if client_plots.use_plotly():
+        @reactive.Effect
+        async def _send_plot():
+            current = selected()
+            if current is None:
+                return
+            table, stock, profile = current
+            await client_plots.send(session, client_plots.analysis_message(
+                'sa_plot', table.times, _series(profile), profile['acf'], stock
+            ))
+    else:
+        @output
+        @cached_image
+        def sa_plot():
+            current = selected()
+            if current is None:
+                return None
+            table, stock, profile = current
+            width, height, pixelratio = plot_size(session, 'sa_plot')
+            src = figure_cache.get_or_render(
+                ('analysis', stock, table.data_key, width, height, pixelratio),
+                lambda: figures.analysis_png(
+                    table.times, _series(profile), profile['acf'], stock, width, height, pixelratio
+                ),
+                version=panel_store.data_key,
+            )
+            return image_data(src, f'Stock {stock} Volatility Profile')
+
+    @output
+    @render.data_frame
+    def sa_table():
+        current = selected()
+        if current is None:
+            return pd.DataFrame(columns=['Statistic', 'Value', 'Universe Rank'])
+        _, _, profile = current
+        row = profile['summary']
+        # (summary column, label, rank column)
+        labels = [
+            ('mean', 'Average RV', 'mean_rank'),
+            ('std', 'RV Std', 'std_rank'),
+            ('latest', 'Latest RV', 'latest_rank'),
+            ('ewma', 'EWMA RV', 'ewma_rank'),
+        ] + [(f'q{int(round(q * 100)):02d}', f'{int(round(q * 100))}th Percentile RV', None) for q in QUANTILES]
+        return pd.DataFrame({
+            'Statistic': [label for _, label, _ in labels],
+            'Value': [row[key] for key, _, _ in labels],
+            'Universe Rank': [row[rank] if rank else None for _, _, rank in labels],
+        })
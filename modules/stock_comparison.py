@@ -0,0 +1,183 @@
+import numpy as np
+from shiny import ui, render, reactive
+from faicons import icon_svg
+
+from . import client_plots, figures
+from .cross_index import CrossPrefix, cluster_order
+from .figure_cache import cached_image
+from .screener import figure_cache, image_data, panel_store, panel_version, plot_size, result_cache
+from .similarity import similar_stocks
+
+# Most stocks that can be compared at once
+MAX_COMPARE = 50
+# Stocks selected when a session opens (the first ones by column order)
+DEFAULT_COMPARE = 5
+
+
+def default_selection():
+    return list(panel_store.stock_cols[:DEFAULT_COMPARE])
+
+# UI for the stock comparison panel
+def ui_stock_comparison():
+    return ui.nav_panel(
+        "Stock Comparison",
+        ui.layout_sidebar(
+            ui.sidebar(
+                ui.tags.div(
+                    icon_svg("scale-balanced"),
+                    ui.h2("Compare"),
+                    style="display:flex;align-items:center;gap:10px;margin-bottom:1.5rem;"
+                ),
+                ui.input_selectize(
+                    "sc_stocks", "Stocks:", choices=list(panel_store.stock_cols),
+                    selected=default_selection(), multiple=True,
+                    options={'maxItems': MAX_COMPARE}
+                ),
+                ui.input_slider(
+                    "sc_time_range", "Time ID Range:",
+                    min=panel_store.min_time, max=panel_store.max_time,
+                    value=(panel_store.min_time, panel_store.max_time), step=1
+                ),
+                ui.input_checkbox("sc_cluster", "Order by correlation clusters", value=True),
+                ui.tags.hr(),
+                ui.input_numeric("sc_similar_k", "Similar stocks to add:", value=5, min=1, max=MAX_COMPARE),
+                ui.input_action_button("sc_add_similar", "Add Most Similar to First Stock"),
+                width=270,
+                position="left",
+                class_="portfolio-sidebar"
+            ),
+            ui.tags.div(
+                ui.tags.div(
+                    client_plots.plot_output("sc_corr", height="500px") if client_plots.use_plotly()
+                    else ui.output_image("sc_corr", height="500px"),
+                    class_="portfolio-card"
+                ),
+                ui.tags.div(
+                    client_plots.plot_output("sc_series") if client_plots.use_plotly()
+                    else ui.output_image("sc_series", height="400px"),
+                    class_="portfolio-card ts-card"
+                ),
+                class_="main-content"
+            )
+        ),
+        icon=icon_svg("scale-balanced"),
+        value="compare"
+    )
+
+# Server logic for stock comparison
+def server_stock_comparison(input, output, session):
+    @reactive.Effect
+    def _sync_panel():
+        panel_version()
+        with reactive.isolate():
+            start_time, end_time = input.sc_time_range()
+            selected = input.sc_stocks()
+        ui.update_selectize("sc_stocks", choices=list(panel_store.stock_cols), selected=list(selected))
+        ui.update_slider(
+            "sc_time_range", min=panel_store.min_time, max=panel_store.max_time,
+            value=(max(start_time, panel_store.min_time), min(end_time, panel_store.max_time))
+        )
+
+    @reactive.Effect
+    @reactive.event(input.sc_add_similar)
+    def _add_similar():
+        # Extend the selection with the stocks whose RV over the window is
+        # most correlated with the first selected stock
+        selected = list(input.sc_stocks())
+        if not selected:
+            ui.notification_show("Select a stock first.", type="warning")
+            return
+        start_time, end_time = input.sc_time_range()
+        index = panel_store.index
+        lo, hi = index.bounds(start_time, end_time)
+        k = min(int(input.sc_similar_k() or 5), MAX_COMPARE - len(selected))
+        similar, _ = similar_stocks(index, selected[0], lo, hi, k + len(selected))
+        extra = [str(s) for s in similar['stock_id'] if str(s) not in selected][:max(k, 0)]
+        ui.update_selectize("sc_stocks", selected=selected + extra)
+
+    @reactive.Calc
+    def selection():
+        stocks = [s for s in input.sc_stocks() if s in panel_store.stock_cols]
+        return sorted(stocks, key=int)
+
+    @reactive.Calc
+    def corr_data():
+        panel_version()
+        stocks = selection()
+        if len(stocks) < 2:
+            return None
+        start_time, end_time = input.sc_time_range()
+        index = panel_store.index
+        lo, hi = index.bounds(start_time, end_time)
+        cols = index.panel.columns(stocks)
+
+        def compute():
+            # The selection's prefix cross-products are shared by every
+            # window (and session) on it, so a slider move costs O(k²)
+            prefix = result_cache.get_or_compute(
+                ('cross_prefix', tuple(stocks)), lambda: CrossPrefix(index.values[:, cols]),
+                version=panel_store.version
+            )
+            corr = prefix.corr(lo, hi)
+            return corr, cluster_order(corr)
+
+        corr, order = result_cache.get_or_compute(
+            ('corr', tuple(stocks), lo, hi), compute, version=panel_store.version
+        )
+        if not input.sc_cluster():
+            order = np.arange(len(stocks))
+        labels = [stocks[i] for i in order]
+        return corr[np.ix_(order, order)], labels, (lo, hi)
+
+    @reactive.Calc
+    def series_data():
+        panel_version()
+        stocks = selection()
+        start_time, end_time = input.sc_time_range()
+        index = panel_store.index
+        lo, hi = index.bounds(start_time, end_time)
+        cols = index.panel.columns(stocks)
+        return index.times[lo:hi], {int(s): index.values[lo:hi, c] for s, c in zip(stocks, cols)}, (lo, hi)
+
+    if client_plots.use_plotly():
+        @reactive.Effect
+        async def _send_corr():
+            data = corr_data()
+            if data is None:
+                return
+            corr, labels, _ = data
+            await client_plots.send(session, client_plots.corr_message('sc_corr', corr, labels, 'corr'))
+
+        @reactive.Effect
+        async def _send_series():
+            time_ids, series, _ = series_data()
+            await client_plots.send(session, client_plots.overlay_message('sc_series', time_ids, series, 'compare'))
+    else:
+        @output
+        @cached_image
+        def sc_corr():
+            data = corr_data()
+            if data is None:
+                return None
+            corr, labels, rows = data
+            width, height, pixelratio = plot_size(session, 'sc_corr')
+            src = figure_cache.get_or_render(
+                ('corr', tuple(labels), rows, width, height, pixelratio),
+                lambda: figures.corr_png(corr, labels, width, height, pixelratio),
+                version=panel_store.data_key,
+            )
+            return image_data(src, 'RV Correlation')
+
+        @output
+        @cached_image
+        def sc_series():
+            time_ids, series, rows = series_data()
+            if not series:
+                return None
+            width, height, pixelratio = plot_size(session, 'sc_series')
+            src = figure_cache.get_or_render(
+                ('overlay', tuple(series), rows, width, height, pixelratio),
+                lambda: figures.overlay_png(time_ids, series, width, height, pixelratio),
+                version=panel_store.data_key,
+            )
+            return image_data(src, 'Realized Volatility Comparison')
@@ -0,0 +1,155 @@
+import logging
+import threading
+import warnings
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Window (time_ids) of the rolling mean, half-life of the EWMA, autocorrelation
+# lags and distribution quantiles kept for every stock
+ROLLING_WINDOW = 50
+EWMA_HALFLIFE = 20
+ACF_LAGS = 50
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+def rolling_mean(csum_c, ccount, shift, window):
+    """NaN-aware trailing mean over `window` rows from RangeIndex prefix sums
+    (csum_c sums values minus `shift`)."""
+    lo = np.maximum(np.arange(1, len(csum_c)) - window, 0)
+    total = csum_c[1:] - csum_c[lo]
+    count = ccount[1:] - ccount[lo]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(count > 0, total / count + shift, np.nan)
+
+
+def fft_autocorrelation(values, max_lag):
+    """(max_lag + 1, n_stocks) autocorrelation of each column.
+
+    Lagged products of the demeaned series and of its validity mask are both
+    taken through one real FFT along time, so missing rows drop out of every
+    lag's average instead of biasing it towards zero.
+    """
+    valid = ~np.isnan(values)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        mean = np.nanmean(values, axis=0)
+    x = np.where(valid, values - mean, 0.0)
+    size = 1 << int(2 * len(values) - 1).bit_length()
+
+    def lagged_sums(a):
+        spectrum = np.fft.rfft(a, n=size, axis=0)
+        return np.fft.irfft(spectrum * spectrum.conj(), n=size, axis=0)[:max_lag + 1]
+
+    products = lagged_sums(x)
+    counts = np.rint(lagged_sums(valid.astype(np.float64)))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = np.where(counts > 0, products / counts, np.nan)
+        return cov / cov[0]
+
+
+# Per-stock statistics over the whole panel, computed for every stock at
+# once so the analysis panel only looks up one column when the stock changes.
+# Time-indexed tables share row order with RangeIndex.times.
+class StockStats:
+    def __init__(self, rv_index, version=None, data_key=None):
+        self.version = version
+        self.data_key = data_key
+        # Rows may be appended to the index while this runs; every table is
+        # cut to the rows `values` had when it was read
+        values = rv_index.values
+        n = len(values)
+        self.stock_cols = list(rv_index.stock_cols)
+        self.times = rv_index.times[:n]
+        self.values = values
+        self.rolling = rolling_mean(rv_index.csum_c[:n + 1], rv_index.ccount[:n + 1], rv_index.shift, ROLLING_WINDOW)
+        self.ewma = pd.DataFrame(values).ewm(halflife=EWMA_HALFLIFE, ignore_na=True).mean().to_numpy()
+        self.acf = fft_autocorrelation(values, ACF_LAGS)
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            quantiles = np.nanquantile(values, QUANTILES, axis=0)
+            summary = pd.DataFrame({
+                'mean': np.nanmean(values, axis=0),
+                'std': np.nanstd(values, axis=0, ddof=1),
+                'latest': _last_valid(values),
+                'rolling': _last_valid(self.rolling),
+                'ewma': _last_valid(self.ewma),
+                'acf1': self.acf[1] if ACF_LAGS >= 1 else np.nan,
+            }, index=self.stock_cols)
+        for q, row in zip(QUANTILES, quantiles):
+            summary[f'q{int(round(q * 100)):02d}'] = row
+        # Percentile rank of each stock among all stocks (100 = highest)
+        for col in ('mean', 'std', 'latest', 'ewma'):
+            summary[f'{col}_rank'] = summary[col].rank(pct=True) * 100
+        self.summary = summary
+
+    def column(self, stock):
+        return self.stock_cols.index(str(stock))
+
+    def stock(self, stock):
+        """Views of one stock's series plus its summary row."""
+        col = self.column(stock)
+        return {
+            'rv': self.values[:, col],
+            'rolling': self.rolling[:, col],
+            'ewma': self.ewma[:, col],
+            'acf': self.acf[:, col],
+            'summary': self.summary.iloc[col],
+        }
+
+
+def _last_valid(table):
+    # Last non-NaN value of each column
+    valid = ~np.isnan(table)
+    last = len(table) - 1 - np.argmax(valid[::-1], axis=0)
+    out = table[last, np.arange(table.shape[1])]
+    return np.where(valid.any(axis=0), out, np.nan)
+
+
+# Stats table with the lifetime of the panel data. `get()` returns the table
+# for the current panel version, starting a background build when it is
+# missing or stale; while that build runs the previous table keeps serving.
+class StatsCache:
+    def __init__(self, panel_store):
+        self.panel_store = panel_store
+        self._stats = None
+        self._building = None
+        self._failed = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        version = self.panel_store.version
+        with self._lock:
+            stale = self._stats is None or self._stats.version != version
+            if stale and self._building != version:
+                self._building = version
+                threading.Thread(target=self._build, args=(version,), name='stock-stats', daemon=True).start()
+            return self._stats
+
+    def ready(self):
+        stats = self._stats
+        return stats is not None and stats.version == self.panel_store.version
+
+    def error(self):
+        """Why the build for the current panel version failed, or None."""
+        failed = self._failed
+        if failed is not None and failed[0] == self.panel_store.version:
+            return failed[1]
+        return None
+
+    def _build(self, version):
+        try:
+            stats = StockStats(self.panel_store.index, version, self.panel_store.data_key)
+        except Exception as exc:
+            # Not retried until the panel changes again
+            logger.exception('building stock statistics failed')
+            self._failed = (version, f'{type(exc).__name__}: {exc}')
+            return
+        with self._lock:
+            if self._stats is None or (self._stats.version or 0) < version:
+                self._stats = stats
+            if self._building == version:
+                self._building = None
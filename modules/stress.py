@@ -0,0 +1,183 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+# Block-bootstrap stress test of a portfolio RV series.
+# Each path strings together random contiguous blocks of historical time_ids,
+# which keeps the volatility clustering inside a block. Paths are drawn in
+# fixed-size chunks, each with its own child of one SeedSequence, so the
+# result depends only on the seed and path count, not on how many workers
+# ran it or in which order chunks finished.
+STRESS_PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+CHUNK_PATHS = 5000
+# Worker processes shared by every stress run in the server process
+STRESS_WORKERS = int(os.environ.get('VX_STRESS_WORKERS', str(os.cpu_count() or 1)))
+# Minimum time between two summaries of a run in progress
+SUMMARY_SECS = 0.25
+# Hard limits on a run, checked by the server whatever the inputs allow. A
+# run keeps paths x horizon float32 running means, so MAX_CELLS bounds its
+# memory (80 MB by default).
+MAX_PATHS = 200000
+MAX_HORIZON = 500
+MAX_BLOCK = 200
+MAX_CELLS = int(os.environ.get('VX_STRESS_MAX_CELLS', str(20_000_000)))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def stress_pool():
+    """The shared process pool, started on first use.
+
+    Workers are spawned rather than forked: the server process runs threads
+    (event loop, offload pool) whose locks a fork would copy mid-use.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=STRESS_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _discard_pool(pool):
+    # A worker died; the next run starts a fresh pool
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def block_bootstrap(series, rng, n_paths, horizon, block):
+    """(n_paths, horizon) array of series values resampled in blocks."""
+    n_blocks = -(-horizon // block)
+    starts = rng.integers(0, len(series) - block + 1, size=(n_paths, n_blocks))
+    rows = (starts[:, :, None] + np.arange(block)).reshape(n_paths, -1)[:, :horizon]
+    return series[rows]
+
+
+def simulate_chunk(series, seed, n_paths, horizon, block):
+    """Running mean and peak of portfolio RV along n_paths bootstrap paths."""
+    paths = block_bootstrap(series, np.random.default_rng(seed), n_paths, horizon, block)
+    running_mean = np.cumsum(paths, axis=1) / np.arange(1, horizon + 1)
+    return running_mean.astype(np.float32), paths.max(axis=1)
+
+
+def summarize(running_mean, peak, overwrite=False):
+    """Percentile bands of the running mean and tail numbers of the final one.
+
+    With `overwrite` the percentiles partially sort running_mean in place
+    (each column on its own) instead of copying it.
+    """
+    bands = np.percentile(running_mean, STRESS_PERCENTILES, axis=0, overwrite_input=overwrite)
+    final = running_mean[:, -1].astype(np.float64)
+    p95, p99 = np.percentile(final, [95, 99])
+    return {
+        'paths': len(final),
+        'bands': bands,
+        'tail': {
+            'Median Avg RV': float(np.median(final)),
+            '95th Pct Avg RV': float(p95),
+            '99th Pct Avg RV': float(p99),
+            'Expected Shortfall 95% (Avg RV)': float(final[final >= p95].mean()),
+            '99th Pct Peak RV': float(np.percentile(peak, 99)),
+        },
+    }
+
+
+# A stress run in a background thread. The first chunk is drawn in the
+# thread itself so early bands are ready at once; the rest go to the shared
+# process pool and are folded in as they finish. Finished chunks are packed
+# in completion order at the front of the preallocated arrays, so the thread
+# summarizes a view of the finished paths (at most every SUMMARY_SECS, and
+# once at the end) without gathering them, and `snapshot()` only hands over
+# the latest summary. Bands and tails do not depend on the order of paths.
+class StressRun:
+    def __init__(self, series, n_paths, horizon, block, seed=0):
+        self.n_paths = int(n_paths)
+        self.horizon = int(horizon)
+        self.block = int(block)
+        for name, value, limit in (('paths', self.n_paths, MAX_PATHS), ('horizon', self.horizon, MAX_HORIZON),
+                                   ('block length', self.block, MAX_BLOCK)):
+            if not 1 <= value <= limit:
+                raise ValueError(f"The {name} must be between 1 and {limit}")
+        if self.n_paths * self.horizon > MAX_CELLS:
+            raise ValueError(f"Paths x horizon must be at most {MAX_CELLS:,}")
+        series = np.asarray(series, dtype=np.float64)
+        self.series = series[~np.isnan(series)]
+        if len(self.series) < self.block:
+            raise ValueError(f"Need at least {self.block} time_ids with data for blocks of {self.block}")
+        self.chunks = [(lo, min(lo + CHUNK_PATHS, self.n_paths)) for lo in range(0, self.n_paths, CHUNK_PATHS)]
+        self.seeds = np.random.SeedSequence(seed).spawn(len(self.chunks))
+        self.running_mean = np.empty((self.n_paths, self.horizon), dtype=np.float32)
+        self.peak = np.empty(self.n_paths)
+        self.finished = np.zeros(len(self.chunks), dtype=bool)
+        self.paths_done = 0
+        self.summary = None
+        self.done = False
+        self.error = None
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        threading.Thread(target=self._run, name='stress-run', daemon=True).start()
+        return self
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def _args(self, i):
+        lo, hi = self.chunks[i]
+        return self.series, self.seeds[i], hi - lo, self.horizon, self.block
+
+    def _store(self, i, result):
+        lo, hi = self.chunks[i]
+        rows = slice(self.paths_done, self.paths_done + hi - lo)
+        self.running_mean[rows], self.peak[rows] = result
+        self.finished[i] = True
+        self.paths_done += hi - lo
+
+    def _summarize(self):
+        # Only this thread touches the arrays, and only the columns' order changes
+        done = self.paths_done
+        summary = summarize(self.running_mean[:done], self.peak[:done], overwrite=True)
+        with self._lock:
+            self.summary = summary
+        self._summarized = time.monotonic()
+
+    def _run(self):
+        futures = {}
+        try:
+            self._store(0, simulate_chunk(*self._args(0)))
+            self._summarize()
+            if len(self.chunks) > 1 and not self._cancelled.is_set():
+                pool = stress_pool()
+                try:
+                    futures = {pool.submit(simulate_chunk, *self._args(i)): i for i in range(1, len(self.chunks))}
+                    for future in as_completed(futures):
+                        if self._cancelled.is_set():
+                            break
+                        self._store(futures[future], future.result())
+                        if time.monotonic() - self._summarized >= SUMMARY_SECS:
+                            self._summarize()
+                except BrokenProcessPool:
+                    _discard_pool(pool)
+                    raise
+                if self.finished.all():
+                    self._summarize()
+        except Exception as exc:  # surfaced through snapshot()
+            self.error = exc
+        finally:
+            for pending in futures:
+                pending.cancel()
+            self.done = True
+
+    def snapshot(self):
+        """Latest summary of the finished paths (see summarize()), or None."""
+        with self._lock:
+            return self.summary
@@ -0,0 +1,213 @@
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .panel_cache import DEFAULT_CSV, build_cache
+
+# Builds the wide `time_id x stock` realized volatility panel (data/vol_df.csv)
+# from raw order-book and trade snapshots partitioned per stock, e.g.
+#
+#   <raw>/book_train.parquet/stock_id=0/<part>.parquet
+#   <raw>/trade_train.parquet/stock_id=0/<part>.parquet
+#
+# (CSV partitions are read the same way). Each stock is reduced in a worker
+# process with grouped NumPy reductions; per-stock results are kept in a
+# state directory so incremental runs only reprocess changed partitions.
+BOOK_COLUMNS = ['time_id', 'seconds_in_bucket', 'bid_price1', 'ask_price1', 'bid_size1', 'ask_size1']
+TRADE_COLUMNS = ['time_id', 'seconds_in_bucket', 'price']
+STATE_VERSION = 1
+
+_PARTITION = re.compile(r'stock_id=(\d+)$')
+
+
+def _read_partition(files, columns):
+    frames = []
+    for path in files:
+        if path.endswith('.csv'):
+            frames.append(pd.read_csv(path, usecols=columns))
+        else:
+            frames.append(pd.read_parquet(path, columns=columns))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+
+
+def realized_volatility(time_id, seconds, price):
+    """sqrt(sum of squared log-returns) of price within each time_id.
+
+    Returns (time_ids, rv); rows are sorted here, so input order is free.
+    """
+    order = np.lexsort((seconds, time_id))
+    time_id = np.asarray(time_id)[order]
+    log_price = np.log(np.asarray(price, dtype=np.float64)[order])
+    time_ids, group = np.unique(time_id, return_inverse=True)
+    # Returns across a time_id boundary are not returns, mask them out
+    returns = np.diff(log_price)
+    same_bucket = group[1:] == group[:-1]
+    sq = np.where(same_bucket & np.isfinite(returns), returns * returns, 0.0)
+    rv = np.sqrt(np.bincount(group[1:], weights=sq, minlength=len(time_ids)))
+    return time_ids, rv
+
+
+def book_wap(book):
+    bid_size = book['bid_size1'].to_numpy(dtype=np.float64)
+    ask_size = book['ask_size1'].to_numpy(dtype=np.float64)
+    return (
+        book['bid_price1'].to_numpy(dtype=np.float64) * ask_size
+        + book['ask_price1'].to_numpy(dtype=np.float64) * bid_size
+    ) / (bid_size + ask_size)
+
+
+def process_stock(stock_id, book_files, trade_files):
+    """Reduce one stock's raw snapshots to per-time_id WAP and trade RV."""
+    book = _read_partition(book_files, BOOK_COLUMNS)
+    time_ids, rv = realized_volatility(
+        book['time_id'].to_numpy(), book['seconds_in_bucket'].to_numpy(), book_wap(book)
+    )
+    result = {'stock_id': stock_id, 'time_id': time_ids, 'rv': rv}
+    if trade_files:
+        trade = _read_partition(trade_files, TRADE_COLUMNS)
+        trade_ids, trade_rv = realized_volatility(
+            trade['time_id'].to_numpy(), trade['seconds_in_bucket'].to_numpy(), trade['price'].to_numpy()
+        )
+        result['trade_time_id'] = trade_ids
+        result['trade_rv'] = trade_rv
+    return result
+
+
+def discover_partitions(source_dir):
+    """Map stock_id -> sorted data files under a stock_id=<n> partitioned directory."""
+    partitions = {}
+    if not source_dir or not os.path.isdir(source_dir):
+        return partitions
+    for entry in os.scandir(source_dir):
+        match = _PARTITION.match(entry.name)
+        if entry.is_dir() and match:
+            files = sorted(
+                glob.glob(os.path.join(entry.path, '*.parquet'))
+                + glob.glob(os.path.join(entry.path, '*.csv'))
+            )
+            if files:
+                partitions[int(match.group(1))] = files
+    return partitions
+
+
+def _fingerprint(files):
+    return [[os.path.basename(p), os.stat(p).st_mtime_ns, os.stat(p).st_size] for p in files]
+
+
+def _load_manifest(state_dir):
+    try:
+        with open(os.path.join(state_dir, 'manifest.json')) as fh:
+            manifest = json.load(fh)
+    except (OSError, ValueError):
+        return {}
+    return manifest.get('stocks', {}) if manifest.get('version') == STATE_VERSION else {}
+
+
+def _save_manifest(state_dir, stocks):
+    path = os.path.join(state_dir, 'manifest.json')
+    with open(f'{path}.tmp', 'w') as fh:
+        json.dump({'version': STATE_VERSION, 'stocks': stocks}, fh)
+    os.replace(f'{path}.tmp', path)
+
+
+def _result_path(state_dir, stock_id):
+    return os.path.join(state_dir, f'stock_{stock_id}.npz')
+
+
+def wide_panel(results, time_key='time_id', value_key='rv'):
+    """Scatter per-stock (time_id, value) results into the wide panel layout."""
+    results = sorted((r for r in results if time_key in r), key=lambda r: r['stock_id'])
+    all_times = np.unique(np.concatenate([r[time_key] for r in results])) if results else np.array([], dtype=np.int64)
+    values = np.full((len(all_times), len(results)), np.nan)
+    for col, r in enumerate(results):
+        values[np.searchsorted(all_times, r[time_key]), col] = r[value_key]
+    df = pd.DataFrame(values, columns=[str(r['stock_id']) for r in results])
+    df.insert(0, 'time_id', all_times)
+    return df
+
+
+def run(raw_dir, output=DEFAULT_CSV, trade_output=None, state_dir=None, jobs=None,
+        full=False, book_dir='book_train.parquet', trade_dir='trade_train.parquet', log=print):
+    """Build the panel(s); returns the list of stock_ids that were reprocessed."""
+    state_dir = state_dir or os.path.join(os.path.dirname(os.path.abspath(output)), '.pipeline')
+    os.makedirs(state_dir, exist_ok=True)
+    book_parts = discover_partitions(os.path.join(raw_dir, book_dir))
+    trade_parts = discover_partitions(os.path.join(raw_dir, trade_dir)) if trade_output else {}
+    if not book_parts:
+        raise FileNotFoundError(f'no stock_id=<n> partitions under {os.path.join(raw_dir, book_dir)}')
+
+    previous = {} if full else _load_manifest(state_dir)
+    manifest, todo = {}, []
+    for stock_id, book_files in sorted(book_parts.items()):
+        trade_files = trade_parts.get(stock_id, [])
+        fingerprint = {'book': _fingerprint(book_files), 'trade': _fingerprint(trade_files)}
+        manifest[str(stock_id)] = fingerprint
+        if previous.get(str(stock_id)) != fingerprint or not os.path.exists(_result_path(state_dir, stock_id)):
+            todo.append((stock_id, book_files, trade_files))
+
+    # Stocks whose partitions disappeared leave the panel even when nothing
+    # else needs processing
+    removed = sorted(set(previous) - set(manifest), key=int)
+    for stock_id in removed:
+        try:
+            os.remove(_result_path(state_dir, stock_id))
+        except OSError:
+            pass
+    changed = bool(todo or removed)
+
+    log(f'{len(todo)} of {len(book_parts)} stocks to process, {len(removed)} removed')
+    if todo:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(process_stock, *task) for task in todo]
+            for future in futures:
+                result = future.result()
+                np.savez(_result_path(state_dir, result['stock_id']),
+                         **{k: v for k, v in result.items() if k != 'stock_id'})
+    _save_manifest(state_dir, manifest)
+
+    results = []
+    for stock_id in sorted(book_parts):
+        with np.load(_result_path(state_dir, stock_id)) as stored:
+            results.append({'stock_id': stock_id, **{k: stored[k] for k in stored.files}})
+
+    if changed or not os.path.exists(output):
+        wide_panel(results).to_csv(output, index=False)
+        log(f'wrote {output}')
+        try:
+            build_cache(output)
+        except OSError as exc:
+            log(f'could not refresh the binary cache: {exc}')
+    if trade_output and (changed or not os.path.exists(trade_output)):
+        wide_panel(results, 'trade_time_id', 'trade_rv').to_csv(trade_output, index=False)
+        log(f'wrote {trade_output}')
+    return [task[0] for task in todo]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m modules.vol_pipeline',
+        description='Build the realized volatility panel from raw order-book snapshots.',
+    )
+    parser.add_argument('raw_dir', help='directory holding the partitioned book/trade data')
+    parser.add_argument('--output', default=DEFAULT_CSV, help='wide panel CSV (default: %(default)s)')
+    parser.add_argument('--trade-output', help='also write a trade-price RV panel to this CSV')
+    parser.add_argument('--book-dir', default='book_train.parquet')
+    parser.add_argument('--trade-dir', default='trade_train.parquet')
+    parser.add_argument('--state-dir', help='per-stock results and manifest (default: next to --output)')
+    parser.add_argument('--jobs', type=int, help='worker processes (default: CPU count)')
+    parser.add_argument('--full', action='store_true', help='ignore previous results and reprocess everything')
+    args = parser.parse_args(argv)
+    run(args.raw_dir, output=args.output, trade_output=args.trade_output, state_dir=args.state_dir,
+        jobs=args.jobs, full=args.full, book_dir=args.book_dir, trade_dir=args.trade_dir)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,79 @@
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+
+import uvicorn
+
+from modules.panel_cache import DEFAULT_CSV, load_panel
+from modules.range_index import RangeIndex
+from modules.shared_panel import MANIFEST_ENV, memory_report, publish_panel, release
+
+# Multi-worker launcher for the app in home.py.
+# The panel and its range index are loaded once here and published in shared
+# memory; every uvicorn worker attaches to that segment read-only instead of
+# holding a private copy (see modules/shared_panel.py).
+logger = logging.getLogger('serve')
+
+
+def _worker_pids():
+    pids = []
+    for task in os.listdir('/proc/self/task'):
+        try:
+            with open(f'/proc/self/task/{task}/children') as fh:
+                pids.extend(int(pid) for pid in fh.read().split())
+        except OSError:
+            continue
+    return pids
+
+
+def _report_memory(interval):
+    while True:
+        time.sleep(interval)
+        for pid in _worker_pids():
+            report = memory_report(pid)
+            if report:
+                logger.info(
+                    'worker pid=%s rss=%sMiB private=%sMiB shared=%sMiB',
+                    pid, report.get('rss'), report.get('anon'),
+                    round(report.get('file', 0) + report.get('shmem', 0), 1),
+                )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve Volatility Explorer with a shared data panel.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--csv', default=DEFAULT_CSV)
+    parser.add_argument('--no-share', action='store_true',
+                        help='let every worker load its own copy of the panel')
+    parser.add_argument('--memory-report', type=float, default=60.0, metavar='SECONDS',
+                        help='interval of the per-worker resident memory report, 0 to disable')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s:     %(name)s %(message)s')
+
+    segment = None
+    if not args.no_share:
+        panel = load_panel(args.csv)
+        segment, manifest = publish_panel(RangeIndex(panel, panel.stock_cols))
+        del panel
+        os.environ[MANIFEST_ENV] = json.dumps(manifest)
+        logger.info('published panel in shared memory segment %s (%.1f MiB)',
+                    segment.name, segment.size / 2**20)
+
+    if args.memory_report > 0:
+        threading.Thread(target=_report_memory, args=(args.memory_report,), daemon=True).start()
+
+    try:
+        uvicorn.run('home:app', host=args.host, port=args.port, workers=args.workers,
+                    app_dir=os.path.dirname(os.path.abspath(__file__)))
+    finally:
+        if segment is not None:
+            release(segment)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,22 @@
+from benchmarks.suite import regressions
+
+
+def report(**cases):
+    return {'results': {'current': {'cases': {
+        name: {'p50_ms': p50, 'peak_mib': peak} for name, (p50, peak) in cases.items()
+    }}}}
+
+
+def test_regressions_flag_slower_and_bigger_cases():
+    baseline = report(screen=(10.0, 5.0), plot=(100.0, 2.0), table=(0.2, 0.1))
+    found = regressions(report(screen=(13.0, 5.0), plot=(101.0, 3.0), table=(0.2, 0.1)), baseline)
+    assert found == ['current/screen: p50_ms 13.00 > 12.50 (baseline 10.00)',
+                     'current/plot: peak_mib 3.00 > 2.50 (baseline 2.00)']
+
+
+def test_regressions_skip_noise_and_new_cases():
+    baseline = report(table=(0.2, 0.1))
+    # Five times slower but still under a millisecond; a case the baseline lacks
+    assert regressions(report(table=(0.9, 0.5), upload=(50.0, 9.0)), baseline) == []
+    assert regressions(report(table=(0.2, 0.1)), {'results': {}}) == []
+    assert regressions(report(table=(0.2, 0.1)), baseline, tolerance=0.0) == []
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from modules.cross_index import CrossPrefix, blocked_corr
+
+N_ROWS = 1000
+K = 6
+
+
+@pytest.fixture(scope='module')
+def values():
+    rng = np.random.default_rng(0)
+    common = rng.standard_normal((N_ROWS, 1))
+    values = 0.003 + 0.001 * (common * rng.uniform(0, 1, K) + rng.standard_normal((N_ROWS, K)))
+    values[rng.random(values.shape) < 0.15] = np.nan
+    values[:300, 4] = np.nan                    # a stock that starts late
+    return values.astype(np.float32)
+
+
+def pairwise_corrcoef(window):
+    # Reference: np.corrcoef on the rows where both stocks have data
+    k = window.shape[1]
+    expected = np.full((k, k), np.nan)
+    for i in range(k):
+        for j in range(k):
+            both = ~np.isnan(window[:, i]) & ~np.isnan(window[:, j])
+            if both.sum() >= 2:
+                expected[i, j] = np.corrcoef(window[both, i].astype(np.float64), window[both, j])[0, 1]
+    return expected
+
+
+# Windows inside one block, across block edges, aligned, overlapping the
+# late stock's start, and the whole panel
+WINDOWS = [(0, N_ROWS), (10, 200), (100, 600), (256, 768), (255, 769), (290, 310), (700, 999), (500, 501), (7, 7)]
+
+
+@pytest.mark.parametrize('lo, hi', WINDOWS)
+def test_prefix_and_blocked_match_corrcoef(values, lo, hi):
+    expected = pairwise_corrcoef(values[lo:hi])
+    prefix = CrossPrefix(values)
+    np.testing.assert_allclose(prefix.corr(lo, hi), expected, atol=1e-9, equal_nan=True)
+    np.testing.assert_allclose(blocked_corr(values[lo:hi], block_rows=128), expected, atol=1e-9, equal_nan=True)
+
+
+def test_prefix_memory_is_per_block(values):
+    prefix = CrossPrefix(values, block_rows=100)
+    assert prefix.sums.shape == (N_ROWS // 100 + 1, 4, K, K)
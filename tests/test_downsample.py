@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+from modules.downsample import downsample
+
+
+@pytest.mark.parametrize('method', ['minmax', 'lttb'])
+def test_gaps_survive(method):
+    x = np.arange(50000)
+    y = np.sin(x / 300.0) + 2
+    y[20000:26000] = np.nan
+    xs, ys = downsample(x, y, 400, method=method)
+    assert len(xs) <= 3 * 400 + 2
+    assert np.all(np.diff(xs) > 0)
+    # The gap is still a break in the line, and nothing is drawn across it
+    inside = (xs >= 20000) & (xs < 26000)
+    assert inside.any() and np.isnan(ys[inside]).all()
+    assert not np.isnan(ys[~inside]).any()
+
+
+def test_spikes_kept():
+    x = np.arange(10000)
+    y = np.zeros(10000)
+    y[1234] = 5.0
+    y[::97] = np.nan
+    xs, ys = downsample(x, y, 100)
+    assert 1234 in xs and np.nanmax(ys) == 5.0
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.forecast import (HAR_LAGS, _backtest_chunk, backtest, ewma, fit_har, forecast_frame, har_features,
+                              predict_har)
+from modules.range_index import RangeIndex
+from modules.stock_stats import EWMA_HALFLIFE
+
+N_TIMES = 600
+N_STOCKS = 5
+
+
+def make_index(seed=0, nan_share=0.05):
+    # A HAR process per stock, so the fitted coefficients are known
+    rng = np.random.default_rng(seed)
+    coef = np.array([0.0005, 0.35, 0.3, 0.2])
+    values = np.full((N_TIMES, N_STOCKS), 0.003)
+    for t in range(max(HAR_LAGS), N_TIMES):
+        lags = [values[t - lag:t].mean(axis=0) for lag in HAR_LAGS]
+        values[t] = coef[0] + sum(c * lag for c, lag in zip(coef[1:], lags)) + 0.0002 * rng.standard_normal(N_STOCKS)
+    values[rng.random(values.shape) < nan_share] = np.nan
+    df = pd.DataFrame(values, columns=[str(s) for s in range(N_STOCKS)])
+    df.insert(0, 'time_id', np.arange(N_TIMES) * 2)
+    return RangeIndex(df, list(df.columns[1:]), dtype=np.float64)
+
+
+def test_features_are_trailing_means():
+    index = make_index()
+    features = har_features(index.csum_c, index.ccount, index.shift)
+    frame = pd.DataFrame(index.values)
+    assert (features[:, :, 0] == 1).all()
+    for i, lag in enumerate(HAR_LAGS, start=1):
+        expected = frame.rolling(lag, min_periods=1).mean().to_numpy()
+        np.testing.assert_allclose(features[:, :, i], expected, rtol=1e-9, equal_nan=True)
+
+
+def test_fit_matches_lstsq_per_stock():
+    index = make_index()
+    features = har_features(index.csum_c, index.ccount, index.shift)
+    x, y = features[:-1], index.values[1:]
+    coef = fit_har(x, y)
+    for s in range(N_STOCKS):
+        usable = ~np.isnan(y[:, s]) & ~np.isnan(x[:, s]).any(axis=1)
+        expected, *_ = np.linalg.lstsq(x[usable, s], y[usable, s], rcond=None)
+        # The lags are nearly collinear, so fit_har's tiny ridge moves single
+        # coefficients slightly; the fitted values agree
+        np.testing.assert_allclose(x[usable, s] @ coef[s], x[usable, s] @ expected, rtol=1e-6)
+    # Too few usable rows: no fit
+    y_short = np.full_like(y, np.nan)
+    y_short[:10] = y[:10]
+    assert np.isnan(fit_har(x, y_short)).all()
+
+
+def test_forecast_frame():
+    index = make_index()
+    df = forecast_frame(index)
+    features = har_features(index.csum_c, index.ccount, index.shift)
+    coef = fit_har(features[:-1], index.values[1:])
+    np.testing.assert_allclose(df['har_forecast'], predict_har(coef, features[-1]), rtol=1e-12)
+    expected_ewma = pd.DataFrame(index.values).ewm(halflife=EWMA_HALFLIFE, ignore_na=True).mean().ffill().iloc[-1]
+    np.testing.assert_allclose(df['ewma_forecast'], expected_ewma, rtol=1e-12)
+    # The HAR process is what the HAR forecast should predict well
+    assert (df['har_forecast'] - index.values[-1]).abs().max() < 0.005
+
+
+@pytest.mark.parametrize('train', [200, None])
+def test_backtest_independent_of_chunks(train):
+    index = make_index(seed=1)
+    features = har_features(index.csum_c, index.ccount, index.shift)
+    values = index.values
+    first = (train or max(HAR_LAGS) * 5) + 1
+    totals = _backtest_chunk(features, values, ewma(values), np.arange(first, N_TIMES, 40), train, 40)
+    df = backtest(index, train=train, step=40, jobs=3)
+    np.testing.assert_array_equal(df['n_forecasts'], totals['count'])
+    np.testing.assert_allclose(df['har_rmse'], np.sqrt(totals['har_sq'] / totals['count']), rtol=1e-9)
+    np.testing.assert_allclose(df['ewma_mae'], totals['ewma_abs'] / totals['count'], rtol=1e-9)
+    assert (df['n_forecasts'] > 0).all()
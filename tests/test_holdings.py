@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.holdings import HoldingsStore, read_book
+
+
+def test_upsert_keeps_total_and_order():
+    store = HoldingsStore([5, 1, 3])
+    store.upsert(3, 10, 2.0)
+    store.upsert(1, 5, 4.0)
+    store.upsert(3, 10, 3.0)                    # adds volume, reprices
+    assert store.total_value == pytest.approx(20 * 3.0 + 5 * 4.0)
+    df = store.to_frame()
+    assert list(df['stock_id']) == [3, 1]
+    np.testing.assert_allclose(df['proportion'], [0.75, 0.25])
+    np.testing.assert_allclose(store.weights(), [0.0, 0.25, 0.75])
+
+
+def test_load_sums_repeats_and_adds_new_stocks():
+    store = HoldingsStore([1, 2, 3])
+    store.upsert(2, 1, 1.0)
+    book = pd.DataFrame({'stock_id': [3, 9, 3, 2], 'volume': [1.0, 2.0, 4.0, 1.0], 'price': [1.0, 2.0, 5.0, 1.0]})
+    store.load(book, replace=False)
+    df = store.to_frame().set_index('stock_id')
+    # Stock 2 was already held; 3 sums its rows and keeps the last price; 9 is new
+    assert list(df.index) == [2, 3, 9]
+    assert df.loc[2, 'volume'] == 2.0 and df.loc[3, 'volume'] == 5.0 and df.loc[3, 'price'] == 5.0
+    assert store.total_value == pytest.approx(2.0 + 25.0 + 4.0)
+    store.load(book.iloc[:1], replace=True)
+    assert list(store.to_frame()['stock_id']) == [3] and len(store) == 1
+
+
+def test_read_book_normalizes_columns(tmp_path):
+    path = tmp_path / 'book.csv'
+    pd.DataFrame({'Stock ID': ['7', '8.0'], ' Volume': [1, 2], 'PRICE': [3.5, 4.5], 'note': ['a', 'b']}).to_csv(path, index=False)
+    book = read_book(str(path))
+    assert list(book.columns) == ['stock_id', 'volume', 'price']
+    assert book['stock_id'].tolist() == [7, 8] and book['stock_id'].dtype == np.int64
+
+
+@pytest.mark.parametrize('stock_id, volume', [('12.5', 1), ('abc', 1), ('inf', 1), ('3', -1)])
+def test_read_book_rejects_bad_rows(tmp_path, stock_id, volume):
+    path = tmp_path / 'book.csv'
+    pd.DataFrame({'stock_id': ['1', stock_id], 'volume': [1, volume], 'price': [1.0, 1.0]}).to_csv(path, index=False)
+    with pytest.raises(ValueError):
+        read_book(str(path))
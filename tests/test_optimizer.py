@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from modules.optimizer import min_variance, optimize, project_capped_simplex, risk_parity
+
+
+def bisect_projection(v, cap):
+    # Reference: sum(clip(v - tau, 0, cap)) = 1 solved by bisection on tau
+    lo, hi = v.min() - cap - 1, v.max() + 1
+    for _ in range(200):
+        tau = (lo + hi) / 2
+        if np.clip(v - tau, 0, cap).sum() > 1:
+            lo = tau
+        else:
+            hi = tau
+    return np.clip(v - (lo + hi) / 2, 0, cap)
+
+
+def make_cov(k, seed=0):
+    rng = np.random.default_rng(seed)
+    factors = rng.standard_normal((200, 3))
+    returns = factors @ rng.standard_normal((3, k)) + rng.standard_normal((200, k)) * rng.uniform(0.5, 2, k)
+    return np.cov(returns, rowvar=False)
+
+
+@pytest.mark.parametrize('cap', [1.0, 0.3, 0.1, 0.05])
+def test_projection_matches_bisection(cap):
+    rng = np.random.default_rng(1)
+    for _ in range(20):
+        v = rng.standard_normal(20) * rng.uniform(0.01, 3)
+        w = project_capped_simplex(v, cap)
+        np.testing.assert_allclose(w, bisect_projection(v, cap), atol=1e-9)
+        assert w.sum() == pytest.approx(1.0) and w.min() >= 0 and w.max() <= cap + 1e-12
+
+
+def test_projection_infeasible_cap():
+    np.testing.assert_allclose(project_capped_simplex(np.arange(4.0), 0.25), 0.25)
+    with pytest.raises(ValueError):
+        project_capped_simplex(np.arange(4.0), 0.2)
+
+
+def test_min_variance_matches_closed_form():
+    # Well diversified stocks: the unconstrained minimum is long-only
+    rng = np.random.default_rng(2)
+    cov = np.diag(rng.uniform(1, 2, 8)) + 0.1
+    w, _ = min_variance(cov)
+    inv = np.linalg.solve(cov, np.ones(8))
+    np.testing.assert_allclose(w, inv / inv.sum(), atol=1e-7)
+
+
+def test_min_variance_capped_beats_feasible_points():
+    cov = make_cov(12)
+    w, _ = min_variance(cov, cap=0.15)
+    assert w.sum() == pytest.approx(1.0) and w.max() <= 0.15 + 1e-12
+    rng = np.random.default_rng(3)
+    others = [project_capped_simplex(rng.random(12), 0.15) for _ in range(500)]
+    assert w @ cov @ w <= min(o @ cov @ o for o in others) + 1e-12
+
+
+def test_warm_start_converges_faster():
+    cov = make_cov(30)
+    w, _ = min_variance(cov, cap=0.1)
+    nudged = cov.copy()
+    nudged[0, 0] *= 1.05
+    _, warm = min_variance(nudged, cap=0.1, w0=w)
+    _, cold_again = min_variance(nudged, cap=0.1)
+    assert warm < cold_again
+
+
+def test_risk_parity_equal_contributions():
+    cov = make_cov(10, seed=4)
+    w, _ = risk_parity(cov)
+    contributions = w * (cov @ w)
+    np.testing.assert_allclose(contributions, contributions.mean(), rtol=1e-6)
+    # Warm-started from its own answer it stays put
+    w_again, iterations = risk_parity(cov, w0=w)
+    np.testing.assert_allclose(w_again, w, atol=1e-9)
+    assert iterations <= 2
+
+
+def test_optimize_zero_variance_stocks():
+    cov = make_cov(5)
+    cov[2, :] = cov[:, 2] = 0.0
+    w, _ = optimize(cov, 'risk_parity')
+    assert w[2] == 0 and w.sum() == pytest.approx(1.0)
+    with pytest.raises(ValueError):
+        optimize(cov, 'nope')
@@ -0,0 +1,72 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules import panel_cache
+from modules.panel import PANEL_DTYPE
+
+
+@pytest.fixture
+def csv(tmp_path):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.random((50, 3)), columns=['0', '1', '5'])
+    df.iloc[::7, 1] = np.nan
+    # Rows in file order are not time-sorted
+    df.insert(0, 'time_id', rng.permutation(50) * 3 + 5)
+    path = tmp_path / 'vol_df.csv'
+    df.to_csv(path, index=False)
+    return str(path)
+
+
+def test_missing_then_fresh(csv):
+    assert panel_cache.cache_status(csv) == 'missing'
+    panel = panel_cache.load_panel(csv)
+    assert isinstance(panel.values, np.memmap) and panel.values.dtype == PANEL_DTYPE
+    assert panel.times.dtype == np.int32 and np.all(np.diff(panel.times) > 0)
+    assert panel.stock_cols == ['0', '1', '5']
+    assert panel_cache.cache_status(csv) == 'fresh'
+    assert panel_cache.verify_cache(csv)
+
+
+def test_touched_keeps_cache(csv):
+    panel_cache.build_cache(csv)
+    values = panel_cache.cache_paths(csv)['values']
+    built = os.stat(values).st_mtime_ns
+    os.utime(csv, ns=(built + 10**9, built + 10**9))
+    assert panel_cache.cache_status(csv) == 'touched'
+    panel_cache.load_panel(csv)
+    assert panel_cache.cache_status(csv) == 'fresh'
+    assert os.stat(values).st_mtime_ns == built
+
+
+def test_stale_rebuilds(csv):
+    panel_cache.build_cache(csv)
+    df = pd.read_csv(csv)
+    df.loc[0, '0'] = 9.0
+    df.to_csv(csv, index=False)
+    assert panel_cache.cache_status(csv) == 'stale'
+    panel = panel_cache.load_panel(csv)
+    assert panel.values[panel.times == df.loc[0, 'time_id'], 0][0] == PANEL_DTYPE.type(9.0)
+    assert panel_cache.cache_status(csv) == 'fresh'
+
+
+def test_read_only_directory(csv, monkeypatch):
+    panel_cache.build_cache(csv)
+    stat = os.stat(csv)
+    os.utime(csv, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    def read_only(path, write):
+        raise PermissionError(path)
+
+    monkeypatch.setattr(panel_cache, '_write_atomic', read_only)
+    # Touched: served from the cache without recording the new mtime
+    assert panel_cache.load_panel(csv).values.shape == (50, 3)
+    assert panel_cache.cache_status(csv) == 'touched'
+    # Stale: parsed from the CSV
+    df = pd.read_csv(csv)
+    df.loc[0, '0'] = 9.0
+    df.to_csv(csv, index=False)
+    panel = panel_cache.load_panel(csv)
+    assert not isinstance(panel.values, np.memmap) and np.nanmax(panel.values) == PANEL_DTYPE.type(9.0)
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+from modules.panel_store import PanelStore
+from modules.range_index import RangeIndex
+
+
+def make_rows(times, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(rng.random((len(times), 3)), columns=['0', '1', '2'])
+    df.insert(0, 'time_id', times)
+    return df
+
+
+def test_drop_file_read_again(tmp_path):
+    store = PanelStore(RangeIndex(make_rows(np.arange(10)), ['0', '1', '2']))
+    drop = tmp_path / 'feed.csv'
+    rows = make_rows(np.arange(10, 20), seed=1)
+    rows.iloc[:5].to_csv(drop, index=False)
+    assert store.poll_drop_dir(tmp_path) == 1
+    index = store.index
+
+    # The file grows: only the new rows are ingested, by extending the index
+    rows.to_csv(drop, index=False)
+    assert store.poll_drop_dir(tmp_path) == 2
+    assert store.index is not index and store.index.build_id == index.build_id
+    assert len(store.index.times) == 20 and len(index.times) == 15
+
+    # Rewritten with the same rows: nothing to ingest
+    rows.to_csv(drop, index=False)
+    drop.touch()
+    assert store.poll_drop_dir(tmp_path) == 2
+
+
+def test_corrected_rows_rebuild():
+    store = PanelStore(RangeIndex(make_rows(np.arange(10)), ['0', '1', '2']))
+    build_id = store.index.build_id
+    correction = pd.DataFrame({'time_id': [4], '1': [0.5]})
+    assert store.append(correction) == 1
+    assert store.index.build_id != build_id
+    assert store.series('1')[1][4] == np.float32(0.5)
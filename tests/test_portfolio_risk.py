@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.holdings import HoldingsStore
+from modules.portfolio_risk import PortfolioRisk, RiskModel, nan_cov, with_risk_share
+from modules.range_index import RangeIndex
+
+N_TIMES = 400
+N_STOCKS = 20
+
+
+@pytest.fixture(scope='module')
+def model():
+    rng = np.random.default_rng(0)
+    values = 0.003 + 0.001 * rng.standard_normal((N_TIMES, N_STOCKS))
+    values[rng.random(values.shape) < 0.1] = np.nan
+    df = pd.DataFrame(values, columns=[str(s * 2) for s in range(N_STOCKS)])
+    df.insert(0, 'time_id', np.arange(N_TIMES))
+    return RiskModel(RangeIndex(df, list(df.columns[1:]), dtype=np.float64))
+
+
+def test_nan_cov_matches_np_cov():
+    rng = np.random.default_rng(1)
+    values = rng.standard_normal((200, 4))
+    np.testing.assert_allclose(nan_cov(values), np.cov(values, rowvar=False), rtol=1e-12)
+    # Gaps in one stock leave the other pairs alone
+    gappy = values.copy()
+    gappy[::3, 2] = np.nan
+    np.testing.assert_allclose(nan_cov(gappy)[np.ix_([0, 1, 3], [0, 1, 3])],
+                               np.cov(values[:, [0, 1, 3]], rowvar=False), rtol=1e-12)
+
+
+def test_series_renormalizes_over_present_holdings(model):
+    weights = np.zeros(N_STOCKS)
+    weights[[1, 4, 7]] = [0.5, 0.3, 0.2]
+    held = model.values[:, [1, 4, 7]]
+    w = np.where(np.isnan(held), 0.0, weights[[1, 4, 7]])
+    with np.errstate(invalid='ignore'):
+        expected = np.nansum(held * w, axis=1) / w.sum(axis=1)
+    np.testing.assert_allclose(model.series(weights), expected, rtol=1e-12, equal_nan=True)
+
+
+def test_incremental_sync_matches_full_product(model):
+    holdings = HoldingsStore(model.stock_ids)
+    risk = PortfolioRisk(model)
+    rng = np.random.default_rng(2)
+    # One holding at a time (column updates), then a bulk load (full product)
+    for stock in rng.choice(model.stock_ids, 6, replace=False):
+        holdings.upsert(int(stock), float(rng.integers(1, 100)), float(rng.uniform(1, 50)))
+        risk.sync(holdings)
+        np.testing.assert_allclose(risk.cov_value, model.cov @ risk.value, rtol=1e-10)
+    book = pd.DataFrame({'stock_id': model.stock_ids[:15], 'volume': 1.0, 'price': rng.uniform(1, 5, 15)})
+    holdings.load(book, replace=False)
+    risk.sync(holdings)
+    np.testing.assert_allclose(risk.cov_value, model.cov @ risk.value, rtol=1e-10)
+
+    w = risk.weights()
+    assert risk.variance() == pytest.approx(w @ model.cov @ w, rel=1e-10)
+    assert risk.risk_contributions().sum() == pytest.approx(1.0)
+
+
+def test_risk_share_unknown_stock(model):
+    holdings = HoldingsStore(model.stock_ids)
+    holdings.upsert(2, 10, 1.0)
+    holdings.upsert(999, 10, 1.0)               # not in the panel
+    risk = PortfolioRisk(model).sync(holdings)
+    df = with_risk_share(holdings.to_frame(), risk)
+    assert df['risk_share'].tolist()[0] == pytest.approx(1.0) and np.isnan(df['risk_share'].iloc[1])
+    assert 'risk_share' not in holdings.to_frame()
@@ -0,0 +1,201 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.range_index import BLOCK_ROWS, RangeIndex
+
+# The screener's original pandas path (boolean mask, melt, groupby) is the
+# reference every RangeIndex metric and the top-N ranking must reproduce.
+N_TIMES = 700
+N_STOCKS = 12
+N_WINDOWS = 60
+AGGREGATES = {
+    'mean': lambda g: g.mean(),
+    'max': lambda g: g.max(),
+    'min': lambda g: g.min(),
+    'std': lambda g: g.std(),
+    'median': lambda g: g.median(),
+}
+
+
+def make_panel(seed=0):
+    rng = np.random.default_rng(seed)
+    values = np.exp(np.log(0.003) + 0.5 * rng.standard_normal((N_TIMES, N_STOCKS)))
+    values[rng.random(values.shape) < 0.1] = np.nan
+    values[:, 3] = np.nan                           # a stock with no data at all
+    values[N_TIMES // 2:, 7] = np.nan               # one that stops halfway
+    times = np.cumsum(rng.integers(1, 4, N_TIMES)) + 4
+    df = pd.DataFrame(values, columns=[str(s) for s in range(N_STOCKS)])
+    df.insert(0, 'time_id', times)
+    # Rows in file order are not time-sorted
+    return df.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+def pandas_window(vol_df, stock_cols, start_time, end_time, agg):
+    subset = vol_df[(vol_df['time_id'] >= start_time) & (vol_df['time_id'] <= end_time)]
+    df_long = subset.melt(id_vars=['time_id'], value_vars=stock_cols, var_name='stock_id', value_name='rv')
+    df_long['stock_id'] = df_long['stock_id'].astype(int)
+    result = AGGREGATES[agg](df_long.groupby('stock_id')['rv'])
+    # Empty windows produce no groups at all; the index reports NaN for them
+    return result.reindex([int(c) for c in stock_cols])
+
+
+def windows(vol_df, seed=1):
+    rng = np.random.default_rng(seed)
+    times = np.sort(vol_df['time_id'].to_numpy())
+    picked = [tuple(int(t) for t in np.sort(rng.choice(times, 2))) for _ in range(N_WINDOWS)]
+    picked += [
+        (int(times[0]), int(times[-1])),                # everything
+        (int(times[5]), int(times[5])),                 # one row
+        (int(times[-1]) + 1, int(times[-1]) + 50),      # after the panel
+        (int(times[0]) - 50, int(times[0]) - 1),        # before the panel
+        (int(times[10]), int(times[9])),                # reversed
+    ]
+    # Between two gapped time_ids, so no row falls inside
+    gap = int(np.flatnonzero(np.diff(times) > 1)[0])
+    picked.append((int(times[gap]) + 1, int(times[gap + 1]) - 1))
+    return picked
+
+
+@pytest.fixture(scope='module')
+def panel():
+    vol_df = make_panel()
+    stock_cols = [c for c in vol_df.columns if c != 'time_id']
+    return vol_df, stock_cols, RangeIndex(vol_df, stock_cols, dtype=np.float64)
+
+
+@pytest.mark.parametrize('agg', list(AGGREGATES))
+def test_metrics_match_pandas(panel, agg):
+    vol_df, stock_cols, index = panel
+    for start_time, end_time in windows(vol_df):
+        expected = pandas_window(vol_df, stock_cols, start_time, end_time, agg).to_numpy()
+        got = index.metric(agg, start_time, end_time, exact=True)
+        np.testing.assert_allclose(got, expected, rtol=1e-9, atol=0, equal_nan=True,
+                                   err_msg=f'{agg} over [{start_time}, {end_time}]')
+
+
+def test_float32_panel_matches_pandas(panel):
+    vol_df, stock_cols, _ = panel
+    index = RangeIndex(vol_df, stock_cols)
+    assert index.values.dtype == np.float32
+    for agg in AGGREGATES:
+        for start_time, end_time in windows(vol_df):
+            expected = pandas_window(vol_df, stock_cols, start_time, end_time, agg).to_numpy()
+            got = index.metric(agg, start_time, end_time, exact=True)
+            np.testing.assert_allclose(got, expected, rtol=1e-5, equal_nan=True)
+
+
+@pytest.mark.parametrize('top_n', [1, 5, N_STOCKS - 2, N_STOCKS, 50])
+def test_top_n_matches_pandas(panel, top_n):
+    vol_df, stock_cols, index = panel
+    for start_time, end_time in windows(vol_df):
+        df_mean = pandas_window(vol_df, stock_cols, start_time, end_time, 'mean').rename_axis('stock_id')
+        expected = df_mean.reset_index(name='rv').sort_values('rv', ascending=False).head(top_n)
+        got = index.top_frame(index.mean(start_time, end_time), top_n, 'rv')
+        assert len(got) == len(expected)
+        # Ranked stocks in the same order; stocks without data (NaN) come
+        # last in both, in no particular order
+        ranked = expected['rv'].notna().to_numpy()
+        np.testing.assert_array_equal(got['stock_id'].to_numpy()[ranked], expected['stock_id'].to_numpy()[ranked])
+        np.testing.assert_allclose(got['rv'].to_numpy()[ranked], expected['rv'].to_numpy()[ranked], rtol=1e-9)
+        assert set(got['stock_id'][~ranked]) == set(expected['stock_id'][~ranked])
+        assert got['rv'][~ranked].isna().all()
+
+
+def test_top_n_mask(panel):
+    vol_df, stock_cols, index = panel
+    start_time, end_time = windows(vol_df)[0]
+    scores = index.mean(start_time, end_time)
+    mask = index.stock_ids % 2 == 0
+    got = index.top_frame(scores, 3, 'rv', mask)
+    assert (got['stock_id'] % 2 == 0).all()
+    best = sorted((s, i) for s, i in zip(scores[mask], index.stock_ids[mask]) if not np.isnan(s))[::-1][:3]
+    assert list(got['stock_id']) == [i for _, i in best]
+
+
+def test_block_extremes_on_long_panel():
+    # Enough rows for several blocks, so whole blocks come from the tables
+    rng = np.random.default_rng(3)
+    n_rows = 5 * BLOCK_ROWS + 17
+    values = rng.random((n_rows, 4))
+    values[rng.random(values.shape) < 0.2] = np.nan
+    values[:3 * BLOCK_ROWS, 2] = np.nan
+    df = pd.DataFrame(values, columns=['0', '1', '2', '3'])
+    df.insert(0, 'time_id', np.arange(n_rows))
+    index = RangeIndex(df, ['0', '1', '2', '3'], dtype=np.float64)
+    for lo, hi in [(0, n_rows), (1, n_rows - 1), (BLOCK_ROWS, 3 * BLOCK_ROWS), (10, 40), (300, 1100)]:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            np.testing.assert_array_equal(index.max(lo, hi - 1), np.nanmax(values[lo:hi], axis=0))
+            np.testing.assert_array_equal(index.min(lo, hi - 1), np.nanmin(values[lo:hi], axis=0))
+
+
+def test_sketch_quantile_within_one_bucket(panel):
+    vol_df, stock_cols, _ = panel
+    index = RangeIndex(vol_df, stock_cols, dtype=np.float64)
+    times = index.times
+    checked = 0
+    for lo in range(0, N_TIMES - 2 * BLOCK_ROWS, 37):
+        # Window ends on and off block boundaries; shorter windows are exact
+        for hi in sorted({lo + 2 * BLOCK_ROWS, lo + 2 * BLOCK_ROWS + 45, N_TIMES - 13, N_TIMES}):
+            if hi - lo < 2 * BLOCK_ROWS or hi > N_TIMES:
+                continue
+            start_time, end_time = int(times[lo]), int(times[hi - 1])
+            window = np.sort(index.values[lo:hi], axis=0)
+            for q in (0.5, 0.9, 0.95):
+                exact = index.quantile(q, start_time, end_time, exact=True)
+                approx = index.quantile(q, start_time, end_time, exact=False)
+                assert np.all(np.isnan(exact) == np.isnan(approx))
+                for col in np.flatnonzero(~np.isnan(exact)):
+                    # The exact quantile interpolates between two order
+                    # statistics; the sketch answers within the buckets that
+                    # hold them (usually one bucket)
+                    rank = q * (np.count_nonzero(~np.isnan(window[:, col])) - 1)
+                    below, above = window[int(np.floor(rank)), col], window[int(np.ceil(rank)), col]
+                    first, last = index._bucket(col, np.array([below, above]))
+                    edges = index.edges[col]
+                    assert edges[first] <= exact[col] <= edges[last + 1]
+                    assert edges[first] <= approx[col] <= edges[last + 1]
+            checked += 1
+    assert checked >= 15
+
+
+def test_extended_matches_rebuild(panel):
+    vol_df, stock_cols, full = panel
+    ordered = vol_df.sort_values('time_id')
+    times, values = ordered['time_id'].to_numpy(), ordered[stock_cols].to_numpy()
+    index = RangeIndex(ordered.iloc[:N_TIMES - 37], stock_cols, dtype=np.float64)
+    extended = index.extended(times[N_TIMES - 37:], values[N_TIMES - 37:])
+    assert extended.build_id == index.build_id
+    # The original index still answers over its own rows
+    assert len(index.times) == N_TIMES - 37 and len(index.csum_c) == N_TIMES - 36
+    for agg in AGGREGATES:
+        for start_time, end_time in windows(vol_df):
+            np.testing.assert_allclose(extended.metric(agg, start_time, end_time, exact=True),
+                                       full.metric(agg, start_time, end_time, exact=True),
+                                       rtol=1e-9, equal_nan=True)
+
+
+def test_extended_block_tables():
+    # Appends in small steps complete blocks and grow the sparse tables
+    rng = np.random.default_rng(4)
+    n_rows = 5 * BLOCK_ROWS + 17
+    values = rng.random((n_rows, 3))
+    values[rng.random(values.shape) < 0.2] = np.nan
+    df = pd.DataFrame(values, columns=['0', '1', '2'])
+    df.insert(0, 'time_id', np.arange(n_rows))
+    index = RangeIndex(df.iloc[:40], ['0', '1', '2'], dtype=np.float64)
+    for start in range(40, n_rows, 150):
+        index = index.extended(np.arange(start, min(start + 150, n_rows)), values[start:start + 150])
+    full = RangeIndex(df, ['0', '1', '2'], dtype=np.float64)
+    for level, table in enumerate(full.max_table):
+        np.testing.assert_array_equal(index.max_table[level], table)
+        np.testing.assert_array_equal(index.min_table[level], full.min_table[level])
+    # Cumulative bucket counts cover every valid cell of the whole blocks
+    blocks = np.arange(len(index.block_hist)) * BLOCK_ROWS
+    np.testing.assert_array_equal(index.block_hist.sum(axis=2), index.ccount[blocks])
+    for lo, hi in [(0, n_rows), (BLOCK_ROWS, 4 * BLOCK_ROWS), (300, 1100)]:
+        np.testing.assert_array_equal(index.max(lo, hi - 1), full.max(lo, hi - 1))
+        np.testing.assert_array_equal(index.min(lo, hi - 1), full.min(lo, hi - 1))
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.range_index import RangeIndex
+from modules.regime import BASELINE_ROWS, CUSUM_H, CUSUM_K, MIN_BASELINE_ROWS, SPIKE_Z, RegimeScanner
+
+N_TIMES = 900
+N_STOCKS = 6
+
+
+@pytest.fixture(scope='module')
+def panel():
+    rng = np.random.default_rng(0)
+    values = 0.003 * np.exp(0.2 * rng.standard_normal((N_TIMES, N_STOCKS)))
+    values[400:, 1] *= 2.5                          # shifts up
+    values[500:, 2] *= 0.3                          # shifts down
+    values[rng.random(values.shape) < 0.01] *= 6    # spikes
+    values[rng.random(values.shape) < 0.1] = np.nan
+    values[:, 4] = np.nan                           # never scored
+    df = pd.DataFrame(values, columns=[str(s) for s in range(N_STOCKS)])
+    df.insert(0, 'time_id', np.arange(N_TIMES) * 3 + 5)
+    return df, list(df.columns[1:])
+
+
+def reference_events(values):
+    # Row-by-row: trailing baseline from pandas, then the textbook CUSUM
+    # recursions C = max(0, C + x - k)
+    frame = pd.DataFrame(values)
+    baseline = frame.shift(1).rolling(BASELINE_ROWS, min_periods=1)
+    mean, std, count = baseline.mean().to_numpy(), baseline.std().to_numpy(), baseline.count().to_numpy()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z = (values - mean) / std
+    z[(count < MIN_BASELINE_ROWS) | ~(std > 0)] = np.nan
+    events = {'spike': z > SPIKE_Z, 'up': np.zeros(z.shape, bool), 'down': np.zeros(z.shape, bool)}
+    for kind, sign in (('up', 1.0), ('down', -1.0)):
+        stat = np.zeros(z.shape[1])
+        for t in range(len(z)):
+            scored = ~np.isnan(z[t])
+            new = np.where(scored, np.maximum(0.0, stat + sign * np.nan_to_num(z[t]) - CUSUM_K), stat)
+            events[kind][t] = (new > CUSUM_H) & (stat <= CUSUM_H)
+            stat = new
+    return events
+
+
+def expected_frame(events, times, stock_ids, lo, hi):
+    counts = {kind: flags[lo:hi].sum(axis=0) for kind, flags in events.items()}
+    any_event = (events['spike'] | events['up'] | events['down'])[lo:hi]
+    rows = [np.flatnonzero(any_event[:, s]) for s in range(any_event.shape[1])]
+    flagged = (counts['spike'] + counts['up'] + counts['down']) > 0
+    return pd.DataFrame({
+        'stock_id': stock_ids[flagged],
+        'spikes': counts['spike'][flagged],
+        'up_shifts': counts['up'][flagged],
+        'down_shifts': counts['down'][flagged],
+        'last_event': [times[lo + r[-1]] for r, f in zip(rows, flagged) if f],
+    }).sort_values(['up_shifts', 'spikes', 'down_shifts'], ascending=False, kind='stable')
+
+
+def assert_same(actual, expected):
+    pd.testing.assert_frame_equal(actual.reset_index(drop=True), expected.reset_index(drop=True), check_dtype=False)
+
+
+def test_scan_matches_reference(panel):
+    df, stock_cols = panel
+    index = RangeIndex(df, stock_cols, dtype=np.float64)
+    scanner = RegimeScanner().sync(index)
+    events = reference_events(index.values)
+    assert events['up'][:, 1].any() and events['down'][:, 2].any()
+    for lo, hi in [(0, N_TIMES), (0, 450), (420, 700), (650, N_TIMES), (300, 301)]:
+        assert_same(scanner.events(lo, hi), expected_frame(events, index.times, index.stock_ids, lo, hi))
+    assert events['spike'].any() and 4 not in scanner.events(0, N_TIMES)['stock_id'].tolist()
+
+
+def test_incremental_sync_matches_full_scan(panel):
+    df, stock_cols = panel
+    full = RegimeScanner().sync(RangeIndex(df, stock_cols, dtype=np.float64))
+    times, values = df['time_id'].to_numpy(), df[stock_cols].to_numpy()
+    index = RangeIndex(df.iloc[:300], stock_cols, dtype=np.float64)
+    scanner = RegimeScanner().sync(index)
+    for start in range(300, N_TIMES, 170):
+        index = index.extended(times[start:start + 170], values[start:start + 170])
+        scanner.sync(index)
+        assert scanner.n_rows == len(index.values)
+    for kind, counts in full.counts.items():
+        np.testing.assert_array_equal(scanner.counts[kind], counts)
+    np.testing.assert_array_equal(scanner.last_event, full.last_event)
+    assert_same(scanner.events(200, 800), full.events(200, 800))
+
+
+def test_rebuild_resets(panel):
+    df, stock_cols = panel
+    scanner = RegimeScanner().sync(RangeIndex(df, stock_cols, dtype=np.float64))
+    # A rebuilt index over fewer rows has a new build_id and is scanned afresh
+    rebuilt = RangeIndex(df.iloc[:500], stock_cols, dtype=np.float64)
+    scanner.sync(rebuilt)
+    assert scanner.n_rows == 500 and scanner.index is rebuilt
+    assert_same(scanner.events(0, N_TIMES), RegimeScanner().sync(rebuilt).events(0, 500))
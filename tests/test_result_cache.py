@@ -0,0 +1,40 @@
+import numpy as np
+
+from modules.result_cache import LRUCache
+
+
+def test_older_version_does_not_clear():
+    cache = LRUCache()
+    assert cache.get_or_compute('a', lambda: 1, version=2) == 1
+    # A late query on the previous version computes its own value
+    assert cache.get_or_compute('a', lambda: 0, version=1) == 0
+    assert cache.get_or_compute('b', lambda: 0, version=1) == 0
+    assert cache.version == 2
+    assert cache.get_or_compute('a', lambda: 3, version=2) == 1
+    assert 'b' not in cache._entries
+
+
+def test_newer_version_clears():
+    cache = LRUCache()
+    cache.get_or_compute('a', lambda: 1, version=1)
+    assert cache.get_or_compute('a', lambda: 2, version=2) == 2
+    assert cache.stats()['entries'] == 1 and cache.version == 2
+
+
+def test_bounded_by_bytes():
+    cache = LRUCache(max_bytes=10000)
+    for key in range(5):
+        cache.get_or_compute(key, lambda: np.zeros(400), version=1)     # 3200 bytes each
+    assert list(cache._entries) == [2, 3, 4] and cache.nbytes == 9600
+    # Too large to keep at all
+    cache.get_or_compute('big', lambda: np.zeros(2000), version=1)
+    assert 'big' not in cache._entries and cache.evictions == 2
+
+
+def test_get_does_not_compute():
+    cache = LRUCache()
+    assert cache.get('a', version=1) is None
+    cache.get_or_compute('a', lambda: 1, version=1)
+    assert cache.get('a', version=1) == 1
+    assert cache.get('a', version=2) is None and cache.stats()['entries'] == 0
+    assert (cache.hits, cache.misses) == (1, 1)
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from modules.screen_expr import MAX_DEPTH, MAX_LENGTH, compile_filter
+
+FIELDS = {'mean_rv': np.array([0.001, np.nan, 0.003]), 'stock_id': np.array([1, 2, 3])}
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('mean_rv != 0.001', [False, False, True]),
+    ('mean_rv not in {0.001}', [False, False, True]),
+    ('0 < mean_rv < 0.002', [True, False, False]),
+    ('not mean_rv > 0.002', [True, True, False]),
+    ('stock_id in {1, 2}', [True, True, False]),
+])
+def test_missing_metric_never_matches(text, expected):
+    assert compile_filter(text).mask(FIELDS, 3).tolist() == expected
+
+
+@pytest.mark.parametrize('text', [
+    '(' * (MAX_DEPTH + 1) + 'mean_rv > 0' + ')' * (MAX_DEPTH + 1),
+    '-' * 2000 + '1 < mean_rv',
+    'not ' * (MAX_DEPTH + 1) + 'mean_rv > 0',
+    ' and '.join(['mean_rv > 0'] * (MAX_LENGTH // 10)),
+])
+def test_oversized_expressions_are_invalid(text):
+    with pytest.raises(ValueError):
+        compile_filter(text)
+
+
+def test_nesting_up_to_the_limit():
+    text = '(' * MAX_DEPTH + 'mean_rv > 0.002' + ')' * MAX_DEPTH
+    assert compile_filter(text).mask(FIELDS, 3).tolist() == [False, False, True]
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+from modules import shared_panel
+from modules.panel_store import PanelStore
+from modules.range_index import RangeIndex
+
+
+def in_segment(arr, segment):
+    view = np.frombuffer(segment.buf, dtype=np.uint8)
+    start = view.__array_interface__['data'][0]
+    del view
+    return start <= arr.__array_interface__['data'][0] < start + segment.size
+
+
+def test_sharing_ends_at_first_ingest():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.random((300, 3)), columns=['0', '1', '2'])
+    df.insert(0, 'time_id', np.arange(300))
+    segment, manifest = shared_panel.publish_panel(RangeIndex(df.iloc[:280], ['0', '1', '2']))
+    try:
+        arrays, meta = shared_panel.attach(manifest)
+        attached = shared_panel._attached[-1]
+        index = RangeIndex.from_state(arrays, meta)
+        assert in_segment(index.values, attached) and in_segment(index.csum_c, attached)
+
+        # Appending copies the per-row arrays out of the segment into this
+        # process; the attached index still reads the shared rows
+        store = PanelStore(index)
+        store.append(df.iloc[280:])
+        for name in ('times', 'values', 'ccount', 'csum_c', 'csum_sq', 'buckets'):
+            assert not in_segment(getattr(store.index, name), attached), name
+        assert in_segment(index.values, attached)
+        full = RangeIndex(df, ['0', '1', '2'])
+        np.testing.assert_allclose(store.index.mean(0, 299), full.mean(0, 299), rtol=1e-9)
+        del index, store, arrays
+    finally:
+        shared_panel.release(segment)
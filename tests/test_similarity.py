@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.range_index import RangeIndex
+from modules.similarity import ProjectionIndex, correlations, similar_stocks
+
+N_TIMES = 300
+N_STOCKS = 10
+
+
+@pytest.fixture(scope='module')
+def index():
+    rng = np.random.default_rng(0)
+    base = rng.standard_normal((N_TIMES, 1))
+    values = 0.003 + 0.001 * (base * np.linspace(1, 0, N_STOCKS) + rng.standard_normal((N_TIMES, N_STOCKS)) * 0.3)
+    values[:, 4] = np.nan                           # no data at all
+    values[:100, 0] = np.nan                        # the query stock starts late
+    df = pd.DataFrame(values, columns=[str(s) for s in range(N_STOCKS)])
+    df.insert(0, 'time_id', np.arange(N_TIMES) * 5)
+    return RangeIndex(df, list(df.columns[1:]), dtype=np.float64)
+
+
+def test_correlations_match_corrcoef(index):
+    values = index.values[100:]
+    complete = [c for c in range(N_STOCKS) if c != 4]
+    expected = np.corrcoef(values[:, complete], rowvar=False)[0]
+    np.testing.assert_allclose(correlations(values, 0)[complete], expected, rtol=1e-9)
+
+
+@pytest.mark.parametrize('metric', ['corr', 'dtw'])
+def test_ranks_others_with_data(index, metric):
+    df, recall = similar_stocks(index, '0', 0, N_TIMES, k=20, metric=metric)
+    assert recall is None
+    assert len(df) == N_STOCKS - 2
+    assert not set(df['stock_id']) & {0, 4}
+    assert np.isfinite(df.iloc[:, 1]).all()
+    if metric == 'corr':
+        # Stock 1 follows the common factor most closely
+        assert df['stock_id'].iloc[0] == 1
+
+
+@pytest.mark.parametrize('metric', ['corr', 'dtw'])
+@pytest.mark.parametrize('lo, hi', [(50, 50), (0, 100)])
+def test_no_data_in_window(index, metric, lo, hi):
+    # An empty window, and one where the query stock is all NaN
+    df, _ = similar_stocks(index, '0', lo, hi, k=5, metric=metric)
+    assert df.empty and list(df.columns) == ['stock_id', 'Correlation' if metric == 'corr' else 'DTW Distance']
+
+
+def test_approximate_skips_empty_stocks(index):
+    projection = ProjectionIndex(index.values[100:])
+    df, recall = similar_stocks(index, '0', 100, N_TIMES, k=20, approximate=projection, recall=True)
+    assert not set(df['stock_id']) & {0, 4}
+    assert np.isfinite(df['Correlation']).all()
+    assert recall == 1.0
@@ -0,0 +1,33 @@
+import time
+
+import numpy as np
+import pytest
+
+from modules.stress import CHUNK_PATHS, MAX_CELLS, StressRun, simulate_chunk, summarize
+
+SERIES = 0.003 + 0.001 * np.abs(np.sin(np.arange(400) / 7.0))
+
+
+@pytest.mark.parametrize('n_paths, horizon, block', [
+    (0, 50, 10), (100, 0, 10), (100, 50, 0), (100, 50, -3),
+    (10 ** 9, 500, 10), (MAX_CELLS // 10 + 1, 10, 5), (100, 50, 401),
+])
+def test_rejects_bad_sizes(n_paths, horizon, block):
+    with pytest.raises(ValueError):
+        StressRun(SERIES, n_paths, horizon, block)
+
+
+def test_summary_matches_sequential_chunks():
+    n_paths, horizon, block = 2 * CHUNK_PATHS + 700, 30, 5
+    run = StressRun(SERIES, n_paths, horizon, block, seed=7).start()
+    deadline = time.monotonic() + 120
+    while not run.done and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert run.done and run.error is None
+    # The same chunks drawn in order, whatever order the pool finished them in
+    results = [simulate_chunk(*run._args(i)) for i in range(len(run.chunks))]
+    expected = summarize(np.concatenate([r[0] for r in results]), np.concatenate([r[1] for r in results]))
+    got = run.snapshot()
+    assert got['paths'] == n_paths
+    np.testing.assert_allclose(got['bands'], expected['bands'], rtol=1e-6)
+    assert got['tail'] == pytest.approx(expected['tail'], rel=1e-6)
@@ -0,0 +1,103 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.vol_pipeline import BOOK_COLUMNS, TRADE_COLUMNS, realized_volatility, run
+
+N_TIME_IDS = 4
+N_SNAPSHOTS = 30
+
+
+def write_stock(raw_dir, stock_id, seed, time_ids=range(N_TIME_IDS)):
+    rng = np.random.default_rng(seed)
+    n = len(time_ids) * N_SNAPSHOTS
+    mid = 100 * np.exp(np.cumsum(0.001 * rng.standard_normal(n)))
+    book = pd.DataFrame({
+        'time_id': np.repeat(list(time_ids), N_SNAPSHOTS),
+        'seconds_in_bucket': np.tile(np.arange(N_SNAPSHOTS) * 20, len(time_ids)),
+        'bid_price1': mid - 0.01,
+        'ask_price1': mid + 0.01,
+        'bid_size1': rng.integers(1, 100, n),
+        'ask_size1': rng.integers(1, 100, n),
+    })[BOOK_COLUMNS]
+    trade = book.iloc[::3].assign(price=mid[::3])[TRADE_COLUMNS]
+    for name, frame in (('book_train.parquet', book), ('trade_train.parquet', trade)):
+        part = os.path.join(raw_dir, name, f'stock_id={stock_id}')
+        os.makedirs(part, exist_ok=True)
+        frame.sample(frac=1, random_state=seed).to_csv(os.path.join(part, 'part-0.csv'), index=False)
+    return book
+
+
+@pytest.fixture
+def raw(tmp_path):
+    raw_dir = tmp_path / 'raw'
+    books = {stock_id: write_stock(raw_dir, stock_id, seed=stock_id) for stock_id in (0, 1, 5)}
+    return str(raw_dir), str(tmp_path / 'vol_df.csv'), books
+
+
+def run_quiet(raw_dir, output, **kwargs):
+    return run(raw_dir, output=output, jobs=1, log=lambda message: None, **kwargs)
+
+
+def test_realized_volatility_ignores_order_and_boundaries():
+    time_id = np.array([1, 0, 1, 0, 1])
+    seconds = np.array([5, 2, 0, 0, 9])
+    price = np.array([2.0, 3.0, 1.0, 1.0, 4.0])
+    time_ids, rv = realized_volatility(time_id, seconds, price)
+    np.testing.assert_array_equal(time_ids, [0, 1])
+    np.testing.assert_allclose(rv, [abs(np.log(3.0)), np.sqrt(np.log(2.0) ** 2 + np.log(2.0) ** 2)])
+
+
+def test_panel_layout(raw):
+    raw_dir, output, books = raw
+    trade_output = output.replace('vol_df', 'trade_vol_df')
+    assert run_quiet(raw_dir, output, trade_output=trade_output) == [0, 1, 5]
+    df = pd.read_csv(output)
+    assert list(df.columns) == ['time_id', '0', '1', '5']
+    np.testing.assert_array_equal(df['time_id'], range(N_TIME_IDS))
+    book = books[5]
+    wap = (book['bid_price1'] * book['ask_size1'] + book['ask_price1'] * book['bid_size1']) / (
+        book['bid_size1'] + book['ask_size1'])
+    expected = np.log(wap).groupby(book['time_id']).apply(lambda x: np.sqrt((x.diff() ** 2).sum()))
+    np.testing.assert_allclose(df['5'], expected)
+    assert list(pd.read_csv(trade_output).columns) == ['time_id', '0', '1', '5']
+
+
+def test_incremental_runs(raw):
+    raw_dir, output, _ = raw
+    run_quiet(raw_dir, output)
+    written = os.stat(output).st_mtime_ns
+    # Nothing changed: nothing reprocessed and the panel is left alone
+    assert run_quiet(raw_dir, output) == []
+    assert os.stat(output).st_mtime_ns == written
+
+    # A changed partition is the only one reprocessed
+    write_stock(raw_dir, 1, seed=11, time_ids=range(N_TIME_IDS + 2))
+    assert run_quiet(raw_dir, output) == [1]
+    df = pd.read_csv(output)
+    assert len(df) == N_TIME_IDS + 2 and df['0'].iloc[N_TIME_IDS:].isna().all()
+
+    # A new one is added
+    write_stock(raw_dir, 3, seed=3)
+    assert run_quiet(raw_dir, output) == [3]
+    assert list(pd.read_csv(output).columns) == ['time_id', '0', '1', '3', '5']
+
+    # A removed one leaves the panel although nothing is reprocessed
+    for name in ('book_train.parquet', 'trade_train.parquet'):
+        part = os.path.join(raw_dir, name, 'stock_id=0')
+        os.remove(os.path.join(part, 'part-0.csv'))
+        os.rmdir(part)
+    assert run_quiet(raw_dir, output) == []
+    assert list(pd.read_csv(output).columns) == ['time_id', '1', '3', '5']
+    state = os.path.join(os.path.dirname(output), '.pipeline')
+    assert not os.path.exists(os.path.join(state, 'stock_0.npz'))
+
+    # --full reprocesses everything
+    assert run_quiet(raw_dir, output, full=True) == [1, 3, 5]
+
+
+def test_missing_partitions(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        run_quiet(str(tmp_path), str(tmp_path / 'vol_df.csv'))
@@ -0,0 +1,28 @@
+// Client side of modules/client_plots.py: draws the charts the server
+// describes in 'vx-plot' messages. Plotly.react diffs against the chart
+// already in the container, so repeated messages update traces in place.
+(function () {
+  var config = { responsive: true, displaylogo: false };
+
+  function draw(msg) {
+    var el = document.getElementById(msg.id);
+    if (!el || typeof Plotly === 'undefined') {
+      return;
+    }
+    Plotly.react(el, msg.traces, msg.layout, config);
+  }
+
+  // Loaded from <head>, so wait for Shiny's own scripts before registering
+  document.addEventListener('DOMContentLoaded', function () {
+    Shiny.addCustomMessageHandler('vx-plot', draw);
+  });
+
+  // Charts drawn inside a hidden nav panel have no width yet
+  document.addEventListener('shown.bs.tab', function () {
+    document.querySelectorAll('.vx-plotly').forEach(function (el) {
+      if (el.data) {
+        Plotly.Plots.resize(el);
+      }
+    });
+  });
+})();